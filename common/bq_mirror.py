@@ -0,0 +1,181 @@
+"""
+This module contains the local Parquet mirror of BigQuery tables.
+A table is downloaded once, then each sync only fetches the rows whose aud_modification_date
+is newer than the last sync (the watermark) and replaces the mirrored rows of those gameIds.
+Every write of the pipeline (delete + append, MERGE, truncate) stamps the rows it writes, so only
+games deleted from BigQuery without being written again need a scan of the remote gameIds:
+it runs every bq_mirror_reconcile_seconds.
+"""
+import json
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from common import bq_storage, parquet_store
+from common.constants import bq_mirror_overlap_seconds, bq_mirror_reconcile_seconds
+from common.singleton_meta import SingletonMeta
+from common.utils import normalize_game_ids
+
+
+class BigQueryMirror(metaclass=SingletonMeta):
+    """
+    Incrementally synced local copies of BigQuery tables, enabled by the NBA_BQ_MIRROR_DIR env var.
+    Game tables (partitioned by game date) are synced incrementally, the other (small, truncated
+    on every write) tables are downloaded again whenever one of their rows changed.
+    """
+
+    def __init__(self, mirror_dir: Optional[str] = None,
+                 overlap_seconds: int = bq_mirror_overlap_seconds,
+                 reconcile_seconds: int = bq_mirror_reconcile_seconds) -> None:
+        """
+        Args:
+            mirror_dir (str, optional): Folder of the mirror (default: NBA_BQ_MIRROR_DIR, unset = disabled).
+            overlap_seconds (int): The watermark is moved back by this much on each sync, so rows
+                stamped just before a sync but committed after it are not missed.
+            reconcile_seconds (int): Minimum time between two scans of the remote gameIds of a game
+                table (deleted games are dropped from the mirror then; 0 = on every sync).
+        """
+        self.mirror_dir: Optional[str] = mirror_dir or os.getenv("NBA_BQ_MIRROR_DIR") or None
+        self.overlap_seconds: int = overlap_seconds
+        self.reconcile_seconds: int = reconcile_seconds
+        self._synced: set = set()  # tables already synced by this process
+        self._locks: dict = {}
+        self._locks_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mirror_dir is not None
+
+    def _lock(self, table_name: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(table_name, threading.Lock())
+
+    def _meta_path(self, table_name: str) -> str:
+        return os.path.join(self.mirror_dir, f"{table_name}.sync.json")
+
+    def _read_meta(self, table_name: str) -> Optional[dict]:
+        try:
+            with open(self._meta_path(table_name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, table_name: str, watermark: Optional[pd.Timestamp],
+                    reconciled_at: Optional[float] = None) -> None:
+        now = time.time()
+        meta = {"watermark": None if watermark is None or pd.isna(watermark) else watermark.isoformat(),
+                "synced_at": now,
+                "reconciled_at": now if reconciled_at is None else reconciled_at}
+        with open(f"{self._meta_path(table_name)}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{self._meta_path(table_name)}.tmp", self._meta_path(table_name))
+
+    @staticmethod
+    def _max_watermark(df: pd.DataFrame, previous: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+        if "aud_modification_date" not in df.columns or df.empty:
+            return previous
+        latest = pd.to_datetime(df["aud_modification_date"], utc=True).max()
+        return latest if previous is None or pd.isna(previous) or latest > previous else previous
+
+    def _full_sync(self, project_id: str, dataset_id: str, table_name: str,
+                   date_column: Optional[str]) -> None:
+        df: pd.DataFrame = bq_storage.read_table(project_id, dataset_id, table_name).to_pandas()
+        parquet_store.drop_table(self.mirror_dir, table_name)
+        if not df.empty:
+            parquet_store.write_table(df, self.mirror_dir, table_name,
+                                      date_column=date_column, write_disposition="WRITE_TRUNCATE")
+        self._write_meta(table_name, self._max_watermark(df))
+        print(f"🪞 Mirror {table_name}: full download ({len(df):,} rows)")
+
+    def sync(self, project_id: str, dataset_id: str, table_name: str,
+             date_column: Optional[str] = None) -> None:
+        """
+        Bring the mirror of a table up to date (at most once per process).
+        Args:
+            project_id (str): The GCP project.
+            dataset_id (str): The dataset.
+            table_name (str): The table to mirror.
+            date_column (str, optional): Game date column of a partitioned game table
+                (None = small table, downloaded again when it changed).
+        """
+        with self._lock(table_name):
+            if table_name in self._synced:
+                return
+            os.makedirs(self.mirror_dir, exist_ok=True)
+            meta = self._read_meta(table_name)
+            if (meta is None or meta.get("watermark") is None
+                    or not parquet_store.table_exists(self.mirror_dir, table_name)):
+                self._full_sync(project_id, dataset_id, table_name, date_column)
+                self._synced.add(table_name)
+                return
+
+            watermark = pd.Timestamp(meta["watermark"])
+            since = watermark - pd.Timedelta(seconds=self.overlap_seconds)
+            changed_df: pd.DataFrame = bq_storage.read_table(
+                project_id, dataset_id, table_name,
+                row_restriction=bq_storage.filters_to_row_restriction(
+                    [("aud_modification_date", ">", since.isoformat())])
+            ).to_pandas()
+
+            if date_column is None:
+                if self._has_new_rows(table_name, changed_df, since, watermark):
+                    self._full_sync(project_id, dataset_id, table_name, date_column)
+                else:
+                    print(f"🪞 Mirror {table_name}: up to date")
+                self._synced.add(table_name)
+                return
+
+            # Changed games replace their mirrored rows (write_table deletes by gameId first)
+            if not changed_df.empty:
+                parquet_store.write_table(changed_df, self.mirror_dir, table_name,
+                                          date_column=date_column, write_disposition="WRITE_APPEND")
+
+            # Games deleted from BigQuery are deleted from the mirror (full gameId scan, periodic)
+            reconciled_at: Optional[float] = meta.get("reconciled_at") or meta.get("synced_at") or 0.0
+            message: str = f"🪞 Mirror {table_name}: {len(changed_df):,} changed row(s)"
+            if time.time() - reconciled_at >= self.reconcile_seconds:
+                removed_ids: set = self._deleted_game_ids(project_id, dataset_id, table_name)
+                deleted: int = parquet_store.delete_game_ids(self.mirror_dir, table_name, removed_ids)
+                message += f", {deleted:,} deleted row(s) ({len(removed_ids)} game(s))"
+                reconciled_at = None  # now
+
+            self._write_meta(table_name, self._max_watermark(changed_df, watermark), reconciled_at)
+            print(message)
+            self._synced.add(table_name)
+
+    def _has_new_rows(self, table_name: str, changed_df: pd.DataFrame,
+                      since: pd.Timestamp, watermark: pd.Timestamp) -> bool:
+        """
+        Tell whether the rows read since the watermark minus the overlap hold rows the mirror
+        does not have: a row stamped after the watermark, or more rows of the overlap than mirrored
+        (the overlap always reads the rows of the last sync again).
+        """
+        if changed_df.empty:
+            return False
+        changed_dates = pd.to_datetime(changed_df["aud_modification_date"], utc=True)
+        if (changed_dates > watermark).any():
+            return True
+        mirrored_df = parquet_store.read_table(self.mirror_dir, table_name, columns=["aud_modification_date"])
+        mirrored_dates = pd.to_datetime(mirrored_df["aud_modification_date"], utc=True)
+        return len(changed_dates) != int((mirrored_dates > since).sum())
+
+    def _deleted_game_ids(self, project_id: str, dataset_id: str, table_name: str) -> set:
+        """
+        The mirrored gameIds no longer in the BigQuery table (reads its whole gameId column).
+        """
+        remote_ids = set(normalize_game_ids(
+            bq_storage.read_table(project_id, dataset_id, table_name, columns=["gameId"])
+            .column("gameId").to_pandas()))
+        local_df = parquet_store.read_table(self.mirror_dir, table_name, columns=["gameId"])
+        return set(local_df["gameId"]) - remote_ids if local_df is not None else set()
+
+    def read(self, table_name: str, columns: Optional[list] = None,
+             filters: Optional[Iterable[tuple]] = None) -> pd.DataFrame:
+        """
+        Read a mirrored table from disk (same columns / filters as load_data).
+        """
+        df = parquet_store.read_table(self.mirror_dir, table_name, columns=columns, filters=filters)
+        return df if df is not None else pd.DataFrame()
@@ -0,0 +1,132 @@
+"""
+This module contains the BigQuery Storage Read API loader.
+Only the selected columns and the rows matching the filters leave BigQuery; the Arrow record
+batches of the read session streams are downloaded in parallel.
+"""
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+import pyarrow as pa
+from google.cloud import bigquery_storage_v1
+from google.cloud.bigquery_storage_v1 import types
+
+from common.constants import bq_read_max_streams
+from common.singleton_meta import SingletonMeta
+
+
+class StorageReadClient(metaclass=SingletonMeta):
+    """
+    Process-wide BigQuery Storage Read client (its gRPC channel is reused by every read).
+    """
+
+    def __init__(self) -> None:
+        self.client = bigquery_storage_v1.BigQueryReadClient()
+
+
+def _literal(value) -> str:
+    """
+    Render a Python value as a GoogleSQL literal for a row restriction.
+    """
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.isoformat()
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
+
+
+def _season_conditions(op: str, value, date_column: str) -> list[str]:
+    """
+    A season S runs from S-07-01 to (S+1)-07-01, so a season filter becomes a date range
+    (it then also prunes the date partitions of the table).
+    """
+    column = f"`{date_column}`"
+    if op in ("in", "not in"):
+        ranges = [f"({column} >= '{s}-07-01' AND {column} < '{s + 1}-07-01')" for s in sorted(value)]
+        condition = f"({' OR '.join(ranges)})" if ranges else "FALSE"
+        return [f"NOT {condition}" if op == "not in" else condition]
+    season = int(value)
+    start, end = f"'{season}-07-01'", f"'{season + 1}-07-01'"
+    if op in ("=", "=="):
+        return [f"{column} >= {start}", f"{column} < {end}"]
+    if op == "!=":
+        return [f"({column} < {start} OR {column} >= {end})"]
+    if op == ">=":
+        return [f"{column} >= {start}"]
+    if op == ">":
+        return [f"{column} >= {end}"]
+    if op == "<=":
+        return [f"{column} < {end}"]
+    if op == "<":
+        return [f"{column} < {start}"]
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def filters_to_row_restriction(filters: Optional[Iterable[tuple]],
+                               date_column: Optional[str] = None) -> str:
+    """
+    Convert [(column, op, value), ...] (AND-ed) into a Storage Read API row restriction.
+    Args:
+        filters (Iterable[tuple], optional): The filters. 'season' needs the table date column.
+        date_column (str, optional): The date column of the table (used for season filters).
+    Returns:
+        str: The row restriction ("" when there is no filter).
+    """
+    conditions: list[str] = []
+    for column, op, value in filters or []:
+        if column == "season":
+            if date_column is None:
+                raise ValueError("A season filter needs a table with a game date column")
+            conditions.extend(_season_conditions(op, value, date_column))
+        elif op in ("in", "not in"):
+            values = ", ".join(_literal(v) for v in value)
+            condition = f"`{column}` IN ({values})" if values else "FALSE"
+            conditions.append(f"NOT {condition}" if op == "not in" else condition)
+        elif op in ("=", "==", "!=", "<", "<=", ">", ">="):
+            conditions.append(f"`{column}` {'=' if op == '==' else op} {_literal(value)}")
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return " AND ".join(conditions)
+
+
+def read_table(project_id: str, dataset_id: str, table_name: str,
+               columns: Optional[list] = None,
+               row_restriction: str = "",
+               max_streams: int = bq_read_max_streams) -> pa.Table:
+    """
+    Read a BigQuery table through the Storage Read API as an Arrow table.
+    Args:
+        project_id (str): The GCP project (also billed for the read session).
+        dataset_id (str): The dataset.
+        table_name (str): The table.
+        columns (list, optional): Columns to read (default: all).
+        row_restriction (str): SQL filter evaluated by BigQuery (default: no filter).
+        max_streams (int): Maximum number of streams read in parallel.
+    Returns:
+        pa.Table: The selected rows and columns.
+    """
+    client = StorageReadClient().client
+    read_options = types.ReadSession.TableReadOptions(selected_fields=columns or [],
+                                                      row_restriction=row_restriction)
+    session = client.create_read_session(
+        parent=f"projects/{project_id}",
+        read_session=types.ReadSession(
+            table=f"projects/{project_id}/datasets/{dataset_id}/tables/{table_name}",
+            data_format=types.DataFormat.ARROW,
+            read_options=read_options,
+        ),
+        max_stream_count=max_streams,
+    )
+    schema = pa.ipc.read_schema(pa.py_buffer(session.arrow_schema.serialized_schema))
+    if not session.streams:
+        return schema.empty_table()
+
+    def read_stream(stream_name: str) -> pa.Table:
+        return client.read_rows(stream_name).to_arrow(session)
+
+    with ThreadPoolExecutor(max_workers=len(session.streams)) as executor:
+        tables = list(executor.map(read_stream, [stream.name for stream in session.streams]))
+    return pa.concat_tables(tables, promote_options="permissive")
@@ -0,0 +1,137 @@
+"""
+This module contains the explicit BigQuery schemas of the game level tables (derived from
+common.schemas) and the helpers used by save_database to create them partitioned by game date
+and clustered by gameId / personId.
+"""
+import pandas as pd
+from google.cloud import bigquery
+from google.api_core.exceptions import NotFound
+
+from common import schemas
+from common.utils import normalize_game_ids
+
+
+def _schema(columns: dict) -> list[bigquery.SchemaField]:
+    return [bigquery.SchemaField(name, schemas.bigquery_type(column_type), mode="NULLABLE")
+            for name, column_type in columns.items()]
+
+
+# Table schemas derived from the schema registry
+BoxscoreSchema: list = _schema(schemas.BoxscoreColumns)
+AdvancedBoxscoreSchema: list = _schema(schemas.AdvancedBoxscoreColumns)
+PredictionsSchema: list = _schema(schemas.PredictionsColumns)
+
+
+def ensure_table(client: bigquery.Client, table_id: str, spec: dict) -> None:
+    """
+    Create the table with its explicit schema, day partitioning and clustering if it does not exist.
+    A table created earlier by autodetect (not partitioned) is migrated once, in place, with the
+    columns cast to the schema types.
+    Raises:
+        ValueError: If some values of the table do not convert to the schema types.
+    Args:
+        client (bigquery.Client): The BigQuery client.
+        table_id (str): The full table id.
+        spec (dict): {"schema": [SchemaField], "partition_field": str, "clustering_fields": [str]}
+    """
+    try:
+        table = client.get_table(table_id)
+    except NotFound:
+        table = bigquery.Table(table_id, schema=spec["schema"])
+        table.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY,
+                                                            field=spec["partition_field"])
+        table.clustering_fields = spec["clustering_fields"]
+        client.create_table(table)
+        print(f"🆕 Created {table_id} (partitioned by {spec['partition_field']}, "
+              f"clustered by {', '.join(spec['clustering_fields'])})")
+        return
+
+    partitioning = table.time_partitioning
+    if (partitioning is not None and partitioning.field == spec["partition_field"]
+            and list(table.clustering_fields or []) == spec["clustering_fields"]):
+        return
+
+    # Partitioning cannot be changed in place: the table is rebuilt from itself by one
+    # CREATE OR REPLACE statement (atomic: the old table stays until the new one is complete)
+    existing_columns = {field.name for field in table.schema}
+    cast_columns = [field for field in spec["schema"]
+                    if field.name in existing_columns and field.field_type != _field_type(table, field.name)]
+    if cast_columns:
+        counts = client.query("SELECT " + ", ".join(
+            f"COUNTIF(`{field.name}` IS NOT NULL AND SAFE_CAST(`{field.name}` AS {field.field_type}) IS NULL) "
+            f"AS `{field.name}`" for field in cast_columns) + f" FROM `{table_id}`").to_dataframe()
+        failed = {column: int(count) for column, count in counts.iloc[0].items() if count}
+        if failed:
+            raise ValueError(f"Cannot migrate {table_id}: values that do not convert to the schema types "
+                             f"(non-null values per column) {failed}")
+    dropped_columns = sorted(existing_columns - {field.name for field in spec["schema"]})
+    if dropped_columns:
+        print(f"⚠️ Migrating {table_id} drops the columns not in the table schema: {dropped_columns}")
+
+    select = ",\n        ".join(
+        f"CAST(`{field.name}` AS {field.field_type}) AS `{field.name}`"
+        if field.name in existing_columns else f"CAST(NULL AS {field.field_type}) AS `{field.name}`"
+        for field in spec["schema"]
+    )
+    client.query(f"""
+    CREATE OR REPLACE TABLE `{table_id}`
+    PARTITION BY `{spec['partition_field']}`
+    CLUSTER BY {', '.join(f'`{c}`' for c in spec['clustering_fields'])}
+    AS SELECT
+        {select}
+    FROM `{table_id}`
+    """).result()
+    print(f"🔁 Migrated {table_id} to a table partitioned by {spec['partition_field']}")
+
+
+def _field_type(table: bigquery.Table, name: str) -> str:
+    """
+    The standard SQL type of a column of an existing table (legacy names mapped, e.g. INTEGER -> INT64).
+    """
+    legacy_types: dict = {"INTEGER": "INT64", "FLOAT": "FLOAT64", "BOOLEAN": "BOOL"}
+    field_type: str = next(field.field_type for field in table.schema if field.name == name)
+    return legacy_types.get(field_type, field_type)
+
+
+def coerce_to_schema(df: pd.DataFrame, schema: list) -> pd.DataFrame:
+    """
+    Return the DataFrame with exactly the schema columns, cast to the schema types
+    (missing columns are filled with nulls, extra columns are dropped and reported).
+    Args:
+        df (pd.DataFrame): The rows to load.
+        schema (list): The BigQuery SchemaFields of the table.
+    Returns:
+        pd.DataFrame: The rows ready for an explicit schema load job.
+    Raises:
+        ValueError: If some values do not convert to the schema types (they would be loaded as nulls).
+    """
+    extra_columns = sorted(set(df.columns) - {field.name for field in schema})
+    if extra_columns:
+        dropped = {column: int(df[column].notna().sum()) for column in extra_columns}
+        print(f"⚠️ Dropping columns not in the table schema (non-null values per column): {dropped}")
+
+    out = pd.DataFrame(index=df.index)
+    for field in schema:
+        values = df[field.name] if field.name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if field.name == "gameId":
+            out[field.name] = normalize_game_ids(values).astype("string")
+        elif field.field_type == "INT64":
+            out[field.name] = pd.to_numeric(values, errors="coerce").round().astype("Int64")
+        elif field.field_type == "FLOAT64":
+            out[field.name] = pd.to_numeric(values, errors="coerce").astype("float64")
+        elif field.field_type == "BOOL":
+            out[field.name] = values.astype("boolean")
+        elif field.field_type == "DATE":
+            out[field.name] = pd.to_datetime(values).dt.date
+        elif field.field_type == "TIMESTAMP":
+            out[field.name] = pd.to_datetime(values, utc=True)
+        else:
+            out[field.name] = values.astype("string")
+
+    # Values the casts turned into nulls
+    nulled = {field.name: int((df[field.name].notna() & out[field.name].isna()).sum())
+              for field in schema if field.name in df.columns}
+    nulled = {column: count for column, count in nulled.items() if count}
+    if nulled:
+        raise ValueError(f"Values that do not convert to the table schema types (rows per column): {nulled}")
+    return out
@@ -7,4 +7,54 @@ nba_api_timeout: int = 20
 # Number of retries for nba api requests
 max_retries: int = 3
 # Delay between retries in seconds
-retry_delay: int = 5
\ No newline at end of file
+retry_delay: int = 5
+# Upper bound of a single backoff delay in seconds
+max_retry_delay: int = 60
+# Number of worker threads used to fetch boxscores concurrently
+fetch_max_workers: int = 8
+# Sustained number of nba api requests allowed per second (shared by all workers)
+fetch_rate_per_sec: float = 4.0
+# Maximum number of requests that can be sent in a burst
+fetch_burst: int = 8
+# Flush fetched boxscores to storage every N games ...
+checkpoint_every_games: int = 50
+# ... or every T seconds, whichever comes first
+checkpoint_every_seconds: int = 300
+# Consecutive failed runs after which a game of the dead-letter queue is no longer fetched
+dead_letter_max_failed_runs: int = 5
+# Folder of the raw NBA API response cache (finished games only)
+raw_cache_path: str = "databases/raw_cache/"
+# Maximum size of the raw response cache in bytes
+raw_cache_max_bytes: int = 2 * 1024 ** 3
+# Folder of the cached league schedule shared by every stage
+schedule_cache_path: str = "databases/schedule_cache/"
+# Age in seconds under which the cached schedule is used without revalidation
+schedule_cache_ttl_seconds: int = 3600
+# Number of per-host connection pools kept by the shared http session
+http_pool_connections: int = 4
+# Maximum number of kept-alive connections per host (>= fetch_max_workers)
+http_pool_maxsize: int = 16
+# Proxy endpoints (host:port) requests are spread over (override with NBA_PROXY_ENDPOINTS)
+proxy_endpoints: list = ["gate.decodo.com:10001"]
+# Number of recent requests used to compute a proxy endpoint error rate
+proxy_health_window: int = 20
+# Minimum number of recent requests before a proxy endpoint can be ejected
+proxy_min_samples: int = 5
+# Error rate above which a proxy endpoint is ejected
+proxy_max_error_rate: float = 0.5
+# How long an unhealthy proxy endpoint is ejected, in seconds
+proxy_eject_seconds: int = 60
+# Number of files a local Parquet partition may hold before an append compacts it
+local_compaction_max_files: int = 8
+# Maximum number of BigQuery Storage Read API streams downloaded in parallel
+bq_read_max_streams: int = 4
+# The local BigQuery mirror re-fetches rows stamped up to N seconds before the last sync
+bq_mirror_overlap_seconds: int = 600
+# How often the local BigQuery mirror scans the remote gameIds to drop games deleted from BigQuery, in seconds
+bq_mirror_reconcile_seconds: int = 24 * 3600
+# Database file of the embedded DuckDB storage mode (save_mode 'duckdb')
+duckdb_path: str = "databases/nba.duckdb"
+# Folder of the downloaded (per GCS generation) and native LightGBM models
+model_cache_path: str = "databases/model_cache/"
+# The player feature state re-reads the games stamped up to N seconds before its last update
+feature_state_overlap_seconds: int = 600
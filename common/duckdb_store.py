@@ -0,0 +1,140 @@
+"""
+This module contains the embedded DuckDB storage backend (save_mode 'duckdb'): a single local
+database file with the same semantics as BigQuery (delete-by-gameId appends, SQL pushdown).
+"""
+import os
+import threading
+from typing import Iterable, Optional
+
+import duckdb
+import pandas as pd
+
+from common.constants import duckdb_path
+from common.singleton_meta import SingletonMeta
+from common.utils import normalize_game_ids
+
+# SQL expression of the season encoded in a gameId (e.g. "0022400123" -> 2024)
+SEASON_EXPRESSION: str = "CAST(substr(gameId, 4, 2) AS INTEGER) + 2000"
+
+
+def filters_to_where(filters: Optional[Iterable[tuple]]) -> tuple[str, list]:
+    """
+    Convert [(column, op, value), ...] (AND-ed) into a DuckDB WHERE clause and its parameters.
+    'season' is computed from the gameId.
+    Returns:
+        tuple[str, list]: The condition ("" without filters) and the positional parameters.
+    """
+    conditions: list[str] = []
+    params: list = []
+    for column, op, value in filters or []:
+        expression = SEASON_EXPRESSION if column == "season" else f'"{column}"'
+        if op in ("in", "not in"):
+            values = list(value)
+            if not values:
+                conditions.append("TRUE" if op == "not in" else "FALSE")
+                continue
+            placeholders = ", ".join("?" for _ in values)
+            conditions.append(f"{expression} {'NOT IN' if op == 'not in' else 'IN'} ({placeholders})")
+            params.extend(values)
+        elif op in ("=", "==", "!=", "<", "<=", ">", ">="):
+            conditions.append(f"{expression} {'=' if op == '==' else op} ?")
+            params.append(value)
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return " AND ".join(conditions), params
+
+
+class DuckDBStore(metaclass=SingletonMeta):
+    """
+    Process-wide connection to the DuckDB database file.
+    Every call uses its own cursor, so the store can be used from several threads.
+    """
+
+    def __init__(self, path: str = duckdb_path) -> None:
+        """
+        Args:
+            path (str): The database file.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path: str = path
+        self.connection = duckdb.connect(path)
+        self._write_lock = threading.Lock()
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        return self.connection.cursor()
+
+    def table_columns(self, table_name: str) -> Optional[list]:
+        """
+        The columns of a table, or None if it does not exist.
+        """
+        rows = self.cursor().execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [table_name]).fetchall()
+        return [row[0] for row in rows] or None
+
+    def write_table(self, df: pd.DataFrame, table_name: str, write_disposition: str) -> int:
+        """
+        Write a DataFrame in a single transaction.
+        - WRITE_APPEND / WRITE_UPSERT with a gameId column: rows of the incoming gameIds are
+          deleted, then the new rows are inserted (new columns are added to the table).
+        - WRITE_APPEND without gameId: plain insert.
+        - Otherwise the table is replaced.
+        Returns:
+            int: The number of rows deleted.
+        """
+        df = df.copy()
+        if "gameId" in df.columns:
+            df["gameId"] = normalize_game_ids(df["gameId"])
+
+        with self._write_lock:
+            cursor = self.cursor()
+            cursor.register("incoming_df", df)
+            existing_columns = self.table_columns(table_name)
+            deleted = 0
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                if write_disposition not in ("WRITE_APPEND", "WRITE_UPSERT") or existing_columns is None:
+                    cursor.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM incoming_df')
+                else:
+                    incoming_types = cursor.execute("DESCRIBE SELECT * FROM incoming_df").fetchall()
+                    for column, column_type, *_ in incoming_types:
+                        if column not in existing_columns:
+                            cursor.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{column}" {column_type}')
+                    if "gameId" in df.columns:
+                        deleted = cursor.execute(
+                            f'DELETE FROM "{table_name}" WHERE gameId IN (SELECT DISTINCT gameId FROM incoming_df)'
+                        ).fetchone()[0]
+                    cursor.execute(f'INSERT INTO "{table_name}" BY NAME SELECT * FROM incoming_df')
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.unregister("incoming_df")
+        return deleted
+
+    def read_table(self, table_name: str, columns: Optional[list] = None,
+                   filters: Optional[Iterable[tuple]] = None) -> Optional[pd.DataFrame]:
+        """
+        Read a table with column projection and filters evaluated by DuckDB.
+        Returns:
+            pd.DataFrame: The rows, or None if the table does not exist.
+        """
+        existing_columns = self.table_columns(table_name)
+        if existing_columns is None:
+            return None
+        if columns is not None:
+            columns = [c for c in columns if c in existing_columns]
+        select = ", ".join(f'"{c}"' for c in columns) if columns is not None else "*"
+        where, params = filters_to_where(filters)
+        return self.query(f'SELECT {select} FROM "{table_name}"' + (f" WHERE {where}" if where else ""), params)
+
+    def query(self, sql: str, params: Optional[list] = None) -> pd.DataFrame:
+        """
+        Run a SQL query (joins / aggregations pushed down to DuckDB) and return a DataFrame.
+        """
+        return self.cursor().execute(sql, params or []).df()
+
+    def drop_table(self, table_name: str) -> None:
+        with self._write_lock:
+            self.cursor().execute(f'DROP TABLE IF EXISTS "{table_name}"')
@@ -0,0 +1,245 @@
+"""
+This module contains the concurrent fetch engine used to download boxscores from the NBA API.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import pandas as pd
+import requests
+
+from common.constants import (fetch_max_workers, fetch_rate_per_sec, fetch_burst,
+                              max_retries, retry_delay, max_retry_delay)
+from common.singleton_meta import SingletonMeta
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket rate limiter.
+    Tokens are refilled continuously at `rate` per second up to `burst` tokens.
+    """
+
+    def __init__(self, rate: float = fetch_rate_per_sec, burst: int = fetch_burst) -> None:
+        """
+        Args:
+            rate (float): Sustained number of tokens added per second.
+            burst (int): Maximum number of tokens the bucket can hold.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("TokenBucket needs rate > 0 and burst >= 1")
+        self.rate: float = float(rate)
+        self.burst: int = int(burst)
+        self._tokens: float = float(burst)
+        self._last_refill: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self) -> None:
+        """
+        Block until one token is available and consume it.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class SharedRateLimiter(TokenBucket, metaclass=SingletonMeta):
+    """
+    Process-wide token bucket shared by every ingestion class hitting the NBA API.
+    The first instantiation fixes the rate and burst.
+    """
+
+
+class NbaApiError(Exception):
+    """
+    Raised when an NBA API endpoint returns an unusable response.
+    Keeps the HTTP status code so callers can decide whether to retry
+    (`retryable` overrides it, e.g. for a status-200 response that is still empty).
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retryable: Optional[bool] = None) -> None:
+        super().__init__(message)
+        self.status_code: Optional[int] = status_code
+        self.retryable: Optional[bool] = retryable
+
+
+def is_retryable_error(exc: Exception) -> bool:
+    """
+    Tell transient errors (timeouts, dropped connections, 429, 5xx) from permanent ones.
+    Args:
+        exc (Exception): The exception raised by a request.
+    Returns:
+        bool: True if the request should be retried.
+    """
+    if isinstance(exc, (requests.exceptions.Timeout,
+                        requests.exceptions.ConnectionError,
+                        requests.exceptions.ChunkedEncodingError)):
+        return True
+    if getattr(exc, "retryable", None) is not None:
+        return exc.retryable
+    status_code = getattr(exc, "status_code", None)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def backoff_delay(attempt: int, base_delay: float = retry_delay,
+                  max_delay: float = max_retry_delay) -> float:
+    """
+    Exponential backoff with full jitter: uniform(0, min(max_delay, base_delay * 2 ** attempt)).
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_retry(fn: Callable, *args,
+                    retries: int = max_retries,
+                    base_delay: float = retry_delay,
+                    before_attempt: Optional[Callable[[], None]] = None) -> Any:
+    """
+    Call `fn(*args)` and retry retryable errors with exponential backoff and jitter.
+    Permanent errors, and retryable ones once `retries` is exhausted, are re-raised.
+    Args:
+        fn (Callable): The function to call.
+        retries (int): Maximum number of retries after the first attempt.
+        base_delay (float): Base delay in seconds for the backoff.
+        before_attempt (Callable, optional): Called before every attempt (e.g. rate limiter acquire).
+    Returns:
+        Any: The value returned by `fn`.
+    """
+    attempt = 0
+    while True:
+        if before_attempt is not None:
+            before_attempt()
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt >= retries or not is_retryable_error(e):
+                raise
+            delay = backoff_delay(attempt, base_delay)
+            attempt += 1
+            print(f"⚠️ Retryable error ({e}); retry {attempt}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def request_endpoint(endpoint_cls, **kwargs):
+    """
+    Call an nba_api endpoint and raise NbaApiError (with the HTTP status) on a bad response.
+    nba_api does not check status codes itself, so a 429 or 5xx only surfaces as a parse error.
+    Args:
+        endpoint_cls: The nba_api endpoint class, e.g. BoxScoreTraditionalV3.
+        **kwargs: Arguments passed to the endpoint.
+    Returns:
+        The loaded endpoint instance.
+    """
+    endpoint = endpoint_cls(get_request=False, **kwargs)
+    try:
+        endpoint.get_request()
+    except requests.exceptions.RequestException:
+        raise
+    except Exception as e:
+        nba_response = getattr(endpoint, "nba_response", None)
+        status_code = getattr(nba_response, "_status_code", None)
+        raise NbaApiError(f"{endpoint_cls.__name__} failed (status={status_code}): {e}",
+                          status_code=status_code) from e
+    return endpoint
+
+
+def check_boxscore(boxscore_df: pd.DataFrame, game_id: str) -> pd.DataFrame:
+    """
+    Check that a boxscore holds the player rows of both teams of the game.
+    The NBA API can answer 200 with an empty or partial player set (e.g. right after the final),
+    which must neither be saved nor cached.
+    Args:
+        boxscore_df (pd.DataFrame): The player stats returned for the game.
+        game_id (str): The requested game ID.
+    Returns:
+        pd.DataFrame: The boxscore, unchanged.
+    Raises:
+        NbaApiError: If the boxscore is empty, belongs to another game or misses a team (retryable).
+    """
+    if boxscore_df.empty:
+        raise NbaApiError(f"empty boxscore for game {game_id}", retryable=True)
+    if not (boxscore_df["gameId"].astype(str) == str(game_id)).all():
+        raise NbaApiError(f"boxscore of game {game_id} holds rows of another game", retryable=True)
+    players_df: pd.DataFrame = boxscore_df[boxscore_df["personId"].notna()]
+    if players_df["teamId"].nunique() < 2:
+        raise NbaApiError(f"partial boxscore for game {game_id}: "
+                          f"{players_df['teamId'].nunique()} team(s) with players", retryable=True)
+    return boxscore_df
+
+
+def fetch_games(game_ids: Iterable[str],
+                fetch_fn: Callable[[str], pd.DataFrame],
+                max_workers: int = fetch_max_workers,
+                rate_limiter: Optional[TokenBucket] = None,
+                retries: int = max_retries,
+                on_error: Optional[Callable[[str, Exception], None]] = None,
+                cache_fn: Optional[Callable[[str], Optional[pd.DataFrame]]] = None
+                ) -> Iterator[tuple[str, pd.DataFrame]]:
+    """
+    Fetch games concurrently with a bounded worker pool and a token bucket rate limiter.
+    Retryable errors are retried with backoff (every attempt takes a token from the limiter).
+    Results are yielded as soon as they complete, so callers can process (or persist) them
+    without holding the whole season in memory.
+    Args:
+        game_ids (Iterable[str]): The game IDs to fetch.
+        fetch_fn (Callable[[str], pd.DataFrame]): Function fetching a single game,
+            e.g. `request_boxscore`. It should raise on error.
+        max_workers (int): Maximum number of concurrent requests.
+        rate_limiter (TokenBucket, optional): Rate limiter to use. Defaults to the shared one.
+        retries (int): Maximum number of retries per game for retryable errors.
+        on_error (Callable, optional): Called with (game_id, exception) for games that failed.
+        cache_fn (Callable, optional): Returns the game from a local cache (or None on a miss).
+            Cache hits skip the rate limiter.
+    Returns:
+        Iterator[tuple[str, pd.DataFrame]]: (game_id, boxscore DataFrame) in completion order,
+            with an empty DataFrame for failed games.
+    """
+    limiter: TokenBucket = rate_limiter or SharedRateLimiter()
+
+    def _limited_fetch(game_id: str) -> pd.DataFrame:
+        if cache_fn is not None:
+            cached_df = cache_fn(game_id)
+            if cached_df is not None:
+                return cached_df
+        return call_with_retry(fetch_fn, game_id, retries=retries, before_attempt=limiter.acquire)
+
+    pending_ids = iter(game_ids)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight: dict = {}
+
+        # Keep at most 2 x max_workers games in flight to bound memory
+        def _submit_next() -> bool:
+            game_id = next(pending_ids, None)
+            if game_id is None:
+                return False
+            in_flight[executor.submit(_limited_fetch, game_id)] = game_id
+            return True
+
+        for _ in range(max_workers * 2):
+            if not _submit_next():
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                game_id = in_flight.pop(future)
+                try:
+                    result_df: pd.DataFrame = future.result()
+                except Exception as e:
+                    print(f"Error fetching game ID {game_id}: {e}")
+                    if on_error is not None:
+                        on_error(game_id, e)
+                    result_df = pd.DataFrame()
+                _submit_next()
+                yield game_id, result_df
@@ -0,0 +1,86 @@
+"""
+This module contains the shared, pooled HTTP session used by every nba_api call.
+Connections (and TLS sessions through the proxy) are kept alive and reused across requests.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from nba_api.stats.library.http import NBAStatsHTTP
+
+from common.constants import http_pool_connections, http_pool_maxsize
+from common.singleton_meta import SingletonMeta
+
+try:  # urllib3 only decodes brotli responses when a brotli package is installed
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING: str = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING: str = "gzip, deflate"
+
+
+class PooledSession(metaclass=SingletonMeta):
+    """
+    Process-wide requests.Session with tuned connection pools and keep-alive.
+    """
+
+    def __init__(self, pool_connections: int = http_pool_connections,
+                 pool_maxsize: int = http_pool_maxsize) -> None:
+        """
+        Args:
+            pool_connections (int): Number of per-host pools to keep.
+            pool_maxsize (int): Maximum number of kept-alive connections per host.
+        """
+        self.adapter = HTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize,
+                                   pool_block=False,
+                                   max_retries=0)  # retries are handled by the fetch engine
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update({"Connection": "keep-alive",
+                                     "Accept-Encoding": ACCEPT_ENCODING})
+        self._lock = threading.Lock()
+
+    def connection_stats(self) -> dict:
+        """
+        Per-host connection reuse counters from the urllib3 pools (direct and through proxies).
+        Returns:
+            dict: {host: {"requests": n, "connections": n, "reused": n}}
+        """
+        managers = [self.adapter.poolmanager] + list(self.adapter.proxy_manager.values())
+        stats: dict = {}
+        with self._lock:
+            for manager in managers:
+                for key in list(manager.pools.keys()):
+                    pool = manager.pools.get(key)
+                    if pool is None:
+                        continue
+                    host = f"{key.key_host}:{key.key_port or ''}".rstrip(":")
+                    host_stats = stats.setdefault(host, {"requests": 0, "connections": 0, "reused": 0})
+                    host_stats["requests"] += pool.num_requests
+                    host_stats["connections"] += pool.num_connections
+        for host_stats in stats.values():
+            host_stats["reused"] = max(0, host_stats["requests"] - host_stats["connections"])
+        return stats
+
+
+def install_http_session() -> requests.Session:
+    """
+    Make every nba_api endpoint (and the schedule provider) use the shared pooled session.
+    Safe to call several times.
+    Returns:
+        requests.Session: The shared session.
+    """
+    session: requests.Session = PooledSession().session
+    if NBAStatsHTTP.get_session() is not session:
+        NBAStatsHTTP.set_session(session)
+    return session
+
+
+def print_connection_stats() -> None:
+    """
+    Print the per-host connection reuse counters of the shared session.
+    """
+    for host, host_stats in PooledSession().connection_stats().items():
+        print(f"🔌 {host}: {host_stats['requests']} request(s) over "
+              f"{host_stats['connections']} connection(s), {host_stats['reused']} reused")
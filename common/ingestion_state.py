@@ -0,0 +1,180 @@
+"""
+This module contains the helpers used to track the ingestion state of the boxscore processes
+(index of ingested game IDs, dead-letter queue of game IDs that failed to be fetched,
+periodic checkpoints).
+"""
+import time
+from typing import Callable, Optional
+
+import pandas as pd
+
+from common.io_utils import save_database, load_data, drop_table, load_distinct_values
+from common.fetch_engine import is_retryable_error
+from common.utils import normalize_game_ids
+from common.constants import checkpoint_every_games, checkpoint_every_seconds, dead_letter_max_failed_runs
+
+# Suffix of the table holding the failed game IDs of an ingestion table
+DeadLetterSuffix: str = "_dead_letter"
+
+
+def load_processed_game_ids(table_name: str, mode: str, season: Optional[int] = None) -> set:
+    """
+    Load the set of game IDs already ingested in a table.
+    Only the gameId column is read, so the cost scales with the number of games
+    rather than with the number of player rows times columns.
+    Args:
+        table_name (str): The ingestion table, e.g. BoxscoreFileName.
+        mode (str): 'local', 'duckdb' or 'bq'
+        season (int, optional): Only look at the games of this season (e.g. 2024 for 2024-25).
+    Returns:
+        set: The zero padded game IDs already stored.
+    """
+    filters: list = [("season", "=", season)] if season is not None else []
+    game_ids: pd.Series = load_distinct_values(table_name, "gameId", mode=mode, filters=filters)
+    return set(normalize_game_ids(game_ids))
+
+
+def load_dead_letter(table_name: str, mode: str) -> pd.DataFrame:
+    """
+    Load the dead-letter queue of an ingestion table.
+    Args:
+        table_name (str): The ingestion table, e.g. BoxscoreFileName.
+        mode (str): 'local', 'duckdb' or 'bq'
+    Returns:
+        pd.DataFrame: Columns gameId, error, retryable, failed_runs (empty if none).
+    """
+    dead_letter_df = load_data(f"{table_name}{DeadLetterSuffix}", mode=mode)
+    if dead_letter_df is None or dead_letter_df.empty or "gameId" not in dead_letter_df.columns:
+        return pd.DataFrame(columns=["gameId", "error", "retryable", "failed_runs"])
+    dead_letter_df["gameId"] = normalize_game_ids(dead_letter_df["gameId"])
+    return dead_letter_df
+
+
+def parked_game_ids(dead_letter_df: pd.DataFrame) -> set:
+    """
+    The game IDs of the dead-letter queue that are no longer fetched: permanent errors
+    (4xx, unusable payloads) and games that failed dead_letter_max_failed_runs runs in a row.
+    They stay in the queue for inspection (drop the queue table to fetch them again).
+    Args:
+        dead_letter_df (pd.DataFrame): The dead-letter queue.
+    Returns:
+        set: The parked game IDs.
+    """
+    if dead_letter_df is None or dead_letter_df.empty:
+        return set()
+    retryable: pd.Series = dead_letter_df["retryable"].fillna(True).astype(bool)
+    failed_runs: pd.Series = pd.to_numeric(dead_letter_df["failed_runs"], errors="coerce").fillna(0)
+    parked: pd.Series = ~retryable | (failed_runs >= dead_letter_max_failed_runs)
+    return set(dead_letter_df.loc[parked, "gameId"])
+
+
+def save_dead_letter(table_name: str, failures: dict, previous_df: pd.DataFrame, mode: str) -> None:
+    """
+    Persist the game IDs that failed in this run, plus the parked ones of the previous queue
+    (not fetched in this run, see parked_game_ids), replacing the previous queue.
+    Args:
+        table_name (str): The ingestion table, e.g. BoxscoreFileName.
+        failures (dict): {game_id: exception} for games that failed in this run.
+        previous_df (pd.DataFrame): The queue loaded at the start of the run.
+        mode (str): 'local', 'duckdb' or 'bq'
+    """
+    dead_letter_table: str = f"{table_name}{DeadLetterSuffix}"
+    parked_df: pd.DataFrame = pd.DataFrame()
+    if previous_df is not None and not previous_df.empty:
+        parked_df = previous_df[previous_df["gameId"].isin(parked_game_ids(previous_df))
+                                & ~previous_df["gameId"].isin(failures.keys())]
+    if not failures:
+        if previous_df is not None and len(parked_df) < len(previous_df):
+            if parked_df.empty:
+                drop_table(dead_letter_table, mode=mode)
+            else:
+                save_database(df=parked_df.reset_index(drop=True), table_name=dead_letter_table,
+                              mode=mode, write_disposition="WRITE_TRUNCATE")
+        return
+
+    # Count how many consecutive runs each game has failed
+    previous_runs: dict = {}
+    if previous_df is not None and not previous_df.empty:
+        previous_runs = dict(zip(previous_df["gameId"], previous_df["failed_runs"].astype(int)))
+
+    dead_letter_df = pd.DataFrame({
+        "gameId": list(failures.keys()),
+        "error": [str(e)[:500] for e in failures.values()],
+        "retryable": [is_retryable_error(e) for e in failures.values()],
+        "failed_runs": [previous_runs.get(gid, 0) + 1 for gid in failures.keys()],
+    })
+    print(f"📮 {len(dead_letter_df)} game(s) added to the dead-letter queue {dead_letter_table}")
+    if not parked_df.empty:
+        dead_letter_df = pd.concat([dead_letter_df, parked_df[dead_letter_df.columns]], ignore_index=True)
+    save_database(df=dead_letter_df,
+                  table_name=dead_letter_table,
+                  mode=mode,
+                  write_disposition="WRITE_TRUNCATE")
+
+
+def order_with_dead_letter_first(new_game_ids: list, dead_letter_df: pd.DataFrame) -> list:
+    """
+    Put the game IDs from the dead-letter queue at the front of the list to fetch
+    and leave out the parked ones (see parked_game_ids).
+    Args:
+        new_game_ids (list): Game IDs not yet ingested.
+        dead_letter_df (pd.DataFrame): The dead-letter queue.
+    Returns:
+        list: The game IDs to fetch, dead-letter ones first.
+    """
+    if dead_letter_df is None or dead_letter_df.empty:
+        return new_game_ids
+    parked_ids: set = parked_game_ids(dead_letter_df)
+    skipped: int = sum(gid in parked_ids for gid in new_game_ids)
+    if skipped:
+        print(f"⏭️ Skipping {skipped} game(s) of the dead-letter queue (permanent errors or "
+              f"{dead_letter_max_failed_runs} failed runs)")
+    dead_ids: set = set(dead_letter_df["gameId"]) - parked_ids
+    retry_first = [gid for gid in new_game_ids if gid in dead_ids]
+    if retry_first:
+        print(f"🔁 Retrying {len(retry_first)} game(s) from the dead-letter queue first")
+    return retry_first + [gid for gid in new_game_ids if gid not in dead_ids and gid not in parked_ids]
+
+
+class CheckpointWriter:
+    """
+    Buffer fetched boxscores and flush them to storage every N games or T seconds,
+    so a crash only loses the games fetched since the last checkpoint.
+    """
+
+    def __init__(self, flush_fn: Callable[[pd.DataFrame], None],
+                 every_games: int = checkpoint_every_games,
+                 every_seconds: float = checkpoint_every_seconds) -> None:
+        """
+        Args:
+            flush_fn (Callable[[pd.DataFrame], None]): Persists a batch of raw boxscores.
+            every_games (int): Flush after this many buffered games.
+            every_seconds (float): Flush when the oldest buffered game is older than this.
+        """
+        self.flush_fn: Callable[[pd.DataFrame], None] = flush_fn
+        self.every_games: int = every_games
+        self.every_seconds: float = every_seconds
+        self.games_flushed: int = 0
+        self._buffer: list = []
+        self._last_flush: float = time.monotonic()
+
+    def add(self, boxscore_df: pd.DataFrame) -> None:
+        """
+        Add one game's boxscore to the buffer and flush if a threshold is reached.
+        """
+        self._buffer.append(boxscore_df)
+        if (len(self._buffer) >= self.every_games
+                or time.monotonic() - self._last_flush >= self.every_seconds):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Persist the buffered games (no-op when the buffer is empty).
+        """
+        if self._buffer:
+            batch_df: pd.DataFrame = pd.concat(self._buffer, ignore_index=True)
+            self.flush_fn(batch_df)
+            self.games_flushed += len(self._buffer)
+            print(f"💾 Checkpoint: {len(self._buffer)} game(s) saved ({self.games_flushed} in total)")
+            self._buffer = []
+        self._last_flush = time.monotonic()
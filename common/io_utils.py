@@ -3,13 +3,23 @@ This module contains the common variables and functions used in the NBA Stats Da
 """
 import os
 import re
+import shutil
+import threading
+import numpy as np
 import pandas as pd
 from google.cloud import bigquery
 from google.cloud import storage
 import joblib
-import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, Iterable
-from google.api_core.exceptions import NotFound, BadRequest
+from google.api_core.exceptions import NotFound, BadRequest, GoogleAPICallError
+
+from common.constants import model_cache_path
+from common.utils import normalize_game_ids
+from common import parquet_store, bq_storage, bq_tables, schemas, duckdb_store
+from common.bq_mirror import BigQueryMirror
+from common.duckdb_store import DuckDBStore
 
 # Define the names of the files to be used in the databases folder.
 AdvancedBoxscoreFileName: str = "nba_boxscore_advanced" 
@@ -19,6 +29,49 @@ TeamsFileName: str = "nba_teams_df"
 FutureGamesFileName: str = "nba_future_games_df"
 PredictionsFileName: str = 'nba_points_predictions_df'
 ScheduleFileName: str = 'nba_schedule_df' 
+# Per-player feature state of the predictions (last games, latest features, watermark)
+PlayerFeatureWindowFileName: str = "nba_player_feature_window"
+PlayerFeaturesFileName: str = "nba_player_features"
+PlayerFeatureStateFileName: str = "nba_player_feature_state"
+# Opponent position defense tables (points allowed per date, latest aggregates)
+OpponentPositionDailyFileName: str = "nba_opponent_position_daily"
+OpponentPositionStatsFileName: str = "nba_opponent_position_stats"
+
+# Local tables stored partitioned by season / game date (table -> date column)
+PartitionedTables: dict = {
+    BoxscoreFileName: "game_date",
+    AdvancedBoxscoreFileName: "game_date",
+    PredictionsFileName: "gameDate",
+}
+
+# Canonical column dtypes of each table (common.schemas), applied on every load and save
+TableSchemas: dict = {
+    BoxscoreFileName: schemas.BoxscoreColumns,
+    AdvancedBoxscoreFileName: schemas.AdvancedBoxscoreColumns,
+    PlayersFileName: schemas.PlayersColumns,
+    ScheduleFileName: schemas.ScheduleColumns,
+    PredictionsFileName: schemas.PredictionsColumns,
+}
+
+# BigQuery tables created by save_database with an explicit schema, partitioning and clustering
+ManagedTables: dict = {
+    BoxscoreFileName: {"schema": bq_tables.BoxscoreSchema,
+                       "partition_field": "game_date",
+                       "clustering_fields": ["gameId", "personId"]},
+    AdvancedBoxscoreFileName: {"schema": bq_tables.AdvancedBoxscoreSchema,
+                               "partition_field": "game_date",
+                               "clustering_fields": ["gameId", "personId"]},
+    PredictionsFileName: {"schema": bq_tables.PredictionsSchema,
+                          "partition_field": "gameDate",
+                          "clustering_fields": ["gameId", "personId"]},
+}
+
+# BigQuery tables served from the local mirror when NBA_BQ_MIRROR_DIR is set
+MirroredTables: list = [BoxscoreFileName, AdvancedBoxscoreFileName, PlayersFileName,
+                        TeamsFileName, ScheduleFileName]
+
+# Default key columns of a WRITE_UPSERT (the ones present in the DataFrame are used)
+UpsertKeyColumns: list = ["gameId", "personId", "teamId"]
 
 # Define the path to the databases folder.
 databases_path: str = "databases/"
@@ -28,12 +81,100 @@ DATASET_ID = "nba_dataset"
 def _table_ref(table_name: str) -> str:
     return f"{PROJECT_ID}.{DATASET_ID}.{table_name}"
 
+# One lock per table: the concurrent loaders of the predictions may migrate the same CSV
+_migration_locks: dict = {}
+_migration_locks_guard = threading.Lock()
+
+def _migrate_local_csv(table_name: str) -> None:
+    """
+    Convert a legacy databases/{table}.csv to the Parquet store on first access.
+    The CSV is only deleted once the Parquet table is fully written and in place.
+    """
+    csv_path: str = f"{databases_path}{table_name}.csv"
+    if not os.path.exists(csv_path):
+        return
+    with _migration_locks_guard:
+        lock = _migration_locks.setdefault(table_name, threading.Lock())
+    with lock:
+        # Another thread may have migrated it while we were waiting
+        if not os.path.exists(csv_path):
+            return
+        if parquet_store.table_exists(databases_path, table_name):
+            return
+        csv_df: pd.DataFrame = pd.read_csv(csv_path, low_memory=False)
+        if not csv_df.empty:
+            parquet_store.write_table(csv_df, databases_path, table_name,
+                                      date_column=PartitionedTables.get(table_name),
+                                      write_disposition="WRITE_TRUNCATE")
+        os.remove(csv_path)
+        print(f"📦 Migrated {csv_path} to Parquet ({len(csv_df):,} rows)")
+
 from google.cloud import bigquery
 from google.api_core.exceptions import NotFound
 import pandas as pd
 from typing import Iterable
 
-def _delete_rows_by_game_id(client: bigquery.Client, table_id: str, game_ids: Iterable) -> int:
+def _season_range_parameters(game_ids: list) -> list:
+    """
+    @first_day / @end_day query parameters covering the seasons of the gameIds
+    (a gameId encodes its season, which runs from July to July).
+    """
+    seasons = [int(gid[3:5]) + 2000 for gid in game_ids]
+    return [bigquery.ScalarQueryParameter("first_day", "DATE", f"{min(seasons)}-07-01"),
+            bigquery.ScalarQueryParameter("end_day", "DATE", f"{max(seasons) + 1}-07-01")]
+
+def _merge_upsert(client: bigquery.Client, df: pd.DataFrame, table_id: str,
+                  key_columns: list, load_config: bigquery.LoadJobConfig,
+                  partition_field: Optional[str] = None) -> int:
+    """
+    Upsert df into table_id with a single MERGE job: df is loaded into a staging table (Parquet),
+    then rows are updated / inserted on key_columns, and the rows of the same gameIds that are
+    not in df are deleted (same result as delete-by-gameId + append, but atomic).
+    Returns:
+        int: The number of rows affected by the MERGE.
+    """
+    staging_id = f"{table_id}_staging_{uuid.uuid4().hex[:12]}"
+    staging_config = bigquery.LoadJobConfig(
+        write_disposition="WRITE_TRUNCATE",
+        source_format=bigquery.SourceFormat.PARQUET,
+        schema=load_config.schema,
+        autodetect=load_config.autodetect,
+    )
+    try:
+        client.load_table_from_dataframe(df, staging_id, job_config=staging_config).result()
+
+        columns = list(df.columns)
+        on = " AND ".join(f"T.`{c}` = S.`{c}`" for c in key_columns)
+        update = ", ".join(f"`{c}` = S.`{c}`" for c in columns if c not in key_columns)
+        insert = ", ".join(f"`{c}`" for c in columns)
+        game_ids: list = normalize_game_ids(df["gameId"].dropna()).unique().tolist()
+        query_parameters = [bigquery.ArrayQueryParameter("game_ids", "STRING", game_ids)]
+        same_games = "T.gameId IN UNNEST(@game_ids)"
+        if partition_field:
+            # Let BigQuery prune the target to the partitions of the incoming seasons
+            pruning = f" AND T.`{partition_field}` >= @first_day AND T.`{partition_field}` < @end_day"
+            on += pruning
+            same_games += pruning
+            query_parameters += _season_range_parameters(game_ids)
+
+        job = client.query(
+            f"""
+            MERGE `{table_id}` T
+            USING `{staging_id}` S
+            ON {on}
+            WHEN MATCHED THEN UPDATE SET {update}
+            WHEN NOT MATCHED BY TARGET THEN INSERT ({insert}) VALUES ({insert})
+            WHEN NOT MATCHED BY SOURCE AND {same_games} THEN DELETE
+            """,
+            job_config=bigquery.QueryJobConfig(query_parameters=query_parameters),
+        )
+        job.result()
+        return getattr(job, "num_dml_affected_rows", 0) or 0
+    finally:
+        client.delete_table(staging_id, not_found_ok=True)
+
+def _delete_rows_by_game_id(client: bigquery.Client, table_id: str, game_ids: Iterable,
+                            partition_field: Optional[str] = None) -> int:
     game_ids = list({str(gid) for gid in game_ids if pd.notna(gid)})
     if not game_ids:
         return 0
@@ -50,13 +191,16 @@ def _delete_rows_by_game_id(client: bigquery.Client, table_id: str, game_ids: It
     DELETE FROM `{table_id}`
     WHERE gameId IN UNNEST(@game_ids)
     """
+    query_parameters = [bigquery.ArrayQueryParameter("game_ids", "STRING", game_ids)]
+
+    if partition_field:
+        # Only scan the partitions of the seasons of those gameIds
+        query += f"    AND `{partition_field}` >= @first_day AND `{partition_field}` < @end_day\n"
+        query_parameters += _season_range_parameters(game_ids)
+
     job = client.query(
         query,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ArrayQueryParameter("game_ids", "STRING", game_ids)
-            ]
-        ),
+        job_config=bigquery.QueryJobConfig(query_parameters=query_parameters),
     )
     job.result()
     return getattr(job, "num_dml_affected_rows", 0) or 0
@@ -68,11 +212,20 @@ def save_database(
     mode: str = "bq",
     write_disposition: str = "WRITE_TRUNCATE",
     autodetect_schema: bool = True,
+    key_columns: Optional[list] = None,
 ) -> None:
     """
-    Save a DataFrame either locally or to BigQuery.
-    - If df has gameId column: delete matching rows before append
+    Save a DataFrame either locally (Parquet), to the embedded DuckDB database or to BigQuery.
+    - If df has gameId column and WRITE_APPEND: delete matching rows before append (all modes)
+    - If df has gameId column and WRITE_UPSERT: same result in a single MERGE job on key_columns
+      (default UpsertKeyColumns present in df), through a Parquet staging table
     - Else: overwrite table (default WRITE_TRUNCATE)
+    Locally, the tables of PartitionedTables are partitioned by season / game date and an append
+    only rewrites the partitions holding the incoming gameIds.
+    On BigQuery, the tables of ManagedTables are created with an explicit schema, partitioned by
+    game date and clustered by gameId / personId; the delete-by-key only scans the seasons of the
+    incoming gameIds.
+    In DuckDB, the delete-by-gameId and the insert run in a single transaction.
     """
     if df is None or df.empty:
         print("⚠️ DataFrame empty; nothing to save.")
@@ -81,35 +234,76 @@ def save_database(
     # Add aud_modification_date column (datetime)
     df["aud_modification_date"] = pd.Timestamp.now(tz="Europe/Madrid")
 
+    # Canonical dtypes (plain strings instead of categoricals, so every write has the same types)
+    if table_name in TableSchemas:
+        df = schemas.apply_schema(df, TableSchemas[table_name], categorical=False)
+
+    has_game_id = "gameId" in df.columns
+
+    if write_disposition == "WRITE_UPSERT" and not has_game_id:
+        raise ValueError("WRITE_UPSERT needs a gameId column")
+
     if mode == "local":
-        path = f"databases/{table_name}.csv"
-        df.to_csv(path, index=False)
-        print(f"✅ Saved locally to: {path}")
+        _migrate_local_csv(table_name)
+        # Locally an upsert is the delete-by-gameId append (a single process owns the files)
+        parquet_store.write_table(df, databases_path, table_name,
+                                  date_column=PartitionedTables.get(table_name),
+                                  write_disposition="WRITE_APPEND" if write_disposition == "WRITE_UPSERT"
+                                  else write_disposition)
+        print(f"✅ Saved {len(df):,} row(s) locally to: {databases_path}{table_name}")
+        return
+
+    if mode == "duckdb":
+        store = DuckDBStore()
+        deleted: int = store.write_table(df, table_name, write_disposition)
+        if has_game_id and write_disposition in ("WRITE_APPEND", "WRITE_UPSERT"):
+            print(f"🧹 Deleted {deleted} rows in {table_name} for the incoming gameId(s).")
+        print(f"✅ Saved {len(df):,} row(s) to {store.path}:{table_name}")
         return
 
     if mode != "bq":
-        raise ValueError("Invalid mode: choose 'local' or 'bq'")
+        raise ValueError("Invalid mode: choose 'local', 'duckdb' or 'bq'")
 
     client = bigquery.Client()
     table_id = _table_ref(table_name)
+    spec: Optional[dict] = ManagedTables.get(table_name)
 
-    has_game_id = "gameId" in df.columns
-
-    if has_game_id and write_disposition == "WRITE_APPEND":
-        unique_ids = df["gameId"].astype(str).dropna().unique().tolist()
-        deleted = _delete_rows_by_game_id(client, table_id, unique_ids)
-        print(f"🧹 Deleted {deleted} rows in {table_id} for {len(unique_ids)} gameId(s).")
-
+    if spec is not None:
+        # Explicit schema, partitioned by game date and clustered by gameId / personId
+        bq_tables.ensure_table(client, table_id, spec)
+        df = bq_tables.coerce_to_schema(df, spec["schema"])
         load_config = bigquery.LoadJobConfig(
-            write_disposition="WRITE_APPEND",
-            autodetect=autodetect_schema,
+            write_disposition="WRITE_APPEND" if write_disposition == "WRITE_UPSERT" else write_disposition,
+            schema=spec["schema"],
+            time_partitioning=bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY,
+                                                        field=spec["partition_field"]),
+            clustering_fields=spec["clustering_fields"],
         )
     else:
         load_config = bigquery.LoadJobConfig(
-            write_disposition=write_disposition,
+            write_disposition="WRITE_APPEND" if write_disposition == "WRITE_UPSERT" else write_disposition,
             autodetect=autodetect_schema,
         )
 
+    if write_disposition == "WRITE_UPSERT":
+        try:
+            client.get_table(table_id)
+        except NotFound:
+            write_disposition = "WRITE_APPEND"  # nothing to merge into yet: plain load
+        else:
+            key_columns = key_columns or [c for c in UpsertKeyColumns if c in df.columns]
+            affected = _merge_upsert(client, df, table_id, key_columns, load_config,
+                                     partition_field=spec["partition_field"] if spec else None)
+            print(f"✅ Upserted {len(df):,} row(s) into {table_id} on {key_columns} "
+                  f"({affected:,} row(s) affected)")
+            return
+
+    if has_game_id and write_disposition == "WRITE_APPEND":
+        unique_ids = normalize_game_ids(df["gameId"].dropna()).unique().tolist()
+        deleted = _delete_rows_by_game_id(client, table_id, unique_ids,
+                                          partition_field=spec["partition_field"] if spec else None)
+        print(f"🧹 Deleted {deleted} rows in {table_id} for {len(unique_ids)} gameId(s).")
+
     job = client.load_table_from_dataframe(df, table_id, job_config=load_config)
     try:
         job.result()
@@ -122,71 +316,407 @@ def save_database(
     print(f"✅ Saved {len(df):,} row(s) to {table_id} "
           f"({'APPEND after delete-by-key' if has_game_id else load_config.write_disposition})")
 
-def load_data(FileName: str, mode: str ) -> pd.DataFrame:
+def save_databases(saves: list[dict], mode: str = "bq", max_workers: int = 4) -> None:
+    """
+    Run several save_database calls (e.g. the upserts of several tables) concurrently.
+    Each table must appear only once.
+    Args:
+        saves (list[dict]): save_database keyword arguments, e.g.
+            [{"df": boxscore_df, "table_name": BoxscoreFileName, "write_disposition": "WRITE_UPSERT"}, ...]
+        mode (str): 'local', 'duckdb' or 'bq'
+        max_workers (int): Maximum number of tables written at the same time.
+    """
+    table_names = [save["table_name"] for save in saves]
+    if len(set(table_names)) != len(table_names):
+        raise ValueError(f"save_databases needs distinct tables, got {table_names}")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(save_database, mode=mode, **save): save["table_name"] for save in saves}
+        errors = []
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Saving {futures[future]} failed: {e}")
+                errors.append(futures[future])
+    if errors:
+        raise RuntimeError(f"Failed to save table(s): {errors}")
+
+def load_data(FileName: str, mode: str, columns: Optional[list] = None,
+              filters: Optional[Iterable[tuple]] = None) -> pd.DataFrame:
     """
-    Load data either locally or to BigQuery, depending on mode
+    Load data either locally (Parquet), from the embedded DuckDB database or from BigQuery, depending on mode.
+    The columns of TableSchemas tables are returned with their canonical compact dtypes.
     Args:
         FileName (str): The name of the file to load.
-        mode (str): 'local' or 'bq' (default: 'bq')
+        mode (str): 'local', 'duckdb' or 'bq' (default: 'bq')
+        columns (list, optional): Only load these columns (default: all).
+        filters (Iterable[tuple], optional): [(column, op, value), ...] AND-ed together,
+            e.g. [("season", ">=", 2023), ("game_date", "<", "2025-01-01")].
+            Locally, season / game_date filters only read the matching partitions.
+            In DuckDB, columns and filters are evaluated by the database (SELECT ... WHERE).
+            On BigQuery, columns and filters are pushed down to the Storage Read API
+            (a season filter becomes a range on the table game date column).
+            With NBA_BQ_MIRROR_DIR set, MirroredTables are synced incrementally to a local
+            Parquet mirror and read from disk.
         Returns:
             pd.DataFrame: The loaded DataFrame.
     """
+    df: pd.DataFrame = _load_table(FileName, mode, columns=columns, filters=filters)
+    if FileName in TableSchemas and not df.empty:
+        df = schemas.apply_schema(df, TableSchemas[FileName])
+    return df
+
+def _load_table(FileName: str, mode: str, columns: Optional[list] = None,
+                filters: Optional[Iterable[tuple]] = None) -> pd.DataFrame:
+    """
+    Read a table from the backend of `mode`, with the stored dtypes (see load_data).
+    """
     if mode == "local":
-        path: str = f"{databases_path}{FileName}.csv"
-        if os.path.exists(path):
-            try:
-                df: pd.DataFrame = pd.read_csv(path,low_memory=False)
-                return df
-            except Exception as e:
-                print(f"Error loading local file {path}: {e}")
+        try:
+            _migrate_local_csv(FileName)
+            df = parquet_store.read_table(databases_path, FileName, columns=columns, filters=filters)
+        except Exception as e:
+            print(f"Error loading local table {databases_path}{FileName}: {e}")
+            return pd.DataFrame()
+        return df if df is not None else pd.DataFrame()
+    elif mode == "duckdb":
+        try:
+            df = DuckDBStore().read_table(FileName, columns=columns, filters=filters)
+        except Exception as e:
+            print(f"Error loading DuckDB table {FileName}: {e}")
             return pd.DataFrame()
+        return df if df is not None else pd.DataFrame()
     elif mode == "bq":
+        table_id = _table_ref(FileName)
         try:
-            client = bigquery.Client()
-            table_id = f"ml-nba-project.nba_dataset.{FileName}"
-            df_existing = client.list_rows(table_id).to_dataframe()
+            mirror = BigQueryMirror()
+            if mirror.enabled and FileName in MirroredTables:
+                mirror.sync(PROJECT_ID, DATASET_ID, FileName, date_column=PartitionedTables.get(FileName))
+                df_existing = mirror.read(FileName, columns=columns, filters=filters)
+                print(f"✅ Loaded {len(df_existing)} rows from the local mirror of {table_id}")
+                return df_existing
+
+            row_restriction: str = bq_storage.filters_to_row_restriction(
+                filters, date_column=PartitionedTables.get(FileName))
+            try:
+                table = bq_storage.read_table(PROJECT_ID, DATASET_ID, FileName,
+                                              columns=columns, row_restriction=row_restriction)
+                df_existing = table.to_pandas()
+            except GoogleAPICallError as e:
+                # e.g. missing bigquery.readsessions.create permission: same read as a query
+                print(f"⚠️ Storage Read API unavailable ({e}); falling back to a query")
+                select = ", ".join(f"`{c}`" for c in columns) if columns else "*"
+                query = f"SELECT {select} FROM `{table_id}`" + (f" WHERE {row_restriction}" if row_restriction else "")
+                df_existing = bigquery.Client().query(query).to_dataframe()
             print(f"✅ Loaded {len(df_existing)} rows from {table_id}")
             return df_existing
         except Exception as e:
             print(f"❌ Could not load existing data from BigQuery: {e}")
             return pd.DataFrame()
 
+def load_distinct_values(table_name: str, column: str, mode: str,
+                         filters: Optional[Iterable[tuple]] = None) -> pd.Series:
+    """
+    Load only the distinct values of one column (e.g. the ingested gameIds) of a table.
+    BigQuery and DuckDB run a `SELECT DISTINCT` projection, locally only that Parquet column is read.
+    Args:
+        table_name (str): The name of the table to read.
+        column (str): The column to project.
+        mode (str): 'local', 'duckdb' or 'bq'
+        filters (Iterable[tuple], optional): Same filters as load_data, e.g. [("season", "=", 2024)]
+            (on BigQuery it only scans the partitions of that season).
+    Returns:
+        pd.Series: The distinct values as strings (empty if the table does not exist).
+    """
+    if mode == "local":
+        _migrate_local_csv(table_name)
+        try:
+            values_df = parquet_store.read_table(databases_path, table_name, columns=[column], filters=filters)
+        except Exception as e:
+            print(f"Error loading column {column} from {databases_path}{table_name}: {e}")
+            return pd.Series([], dtype=str)
+        if values_df is None or column not in values_df.columns:
+            return pd.Series([], dtype=str)
+        return pd.Series(values_df[column].dropna().unique(), dtype=str)
+
+    if mode == "duckdb":
+        store = DuckDBStore()
+        if column not in (store.table_columns(table_name) or []):
+            return pd.Series([], dtype=str)
+        where, params = duckdb_store.filters_to_where(filters)
+        values_df = store.query(
+            f'SELECT DISTINCT CAST("{column}" AS VARCHAR) AS "{column}" FROM "{table_name}"'
+            + (f" WHERE {where}" if where else ""), params)
+        return values_df[column].dropna().astype(str)
+
+    if mode != "bq":
+        raise ValueError("Invalid mode: choose 'local', 'duckdb' or 'bq'")
+
+    mirror = BigQueryMirror()
+    if mirror.enabled and table_name in MirroredTables:
+        mirror.sync(PROJECT_ID, DATASET_ID, table_name, date_column=PartitionedTables.get(table_name))
+        values_df = mirror.read(table_name, columns=[column], filters=filters)
+        if column not in values_df.columns:
+            return pd.Series([], dtype=str)
+        return pd.Series(values_df[column].dropna().unique(), dtype=str)
+
+    client = bigquery.Client()
+    table_id = _table_ref(table_name)
+    where: str = bq_storage.filters_to_row_restriction(filters, date_column=PartitionedTables.get(table_name))
+    try:
+        values_df = client.query(
+            f"SELECT DISTINCT CAST({column} AS STRING) AS {column} FROM `{table_id}`"
+            + (f" WHERE {where}" if where else "")
+        ).to_dataframe()
+    except (NotFound, BadRequest) as e:
+        print(f"❌ Could not load {column} from {table_id}: {e}")
+        return pd.Series([], dtype=str)
+    print(f"✅ Loaded {len(values_df)} distinct {column} from {table_id}")
+    return values_df[column].dropna().astype(str)
+
+def load_last_rows(table_name: str, mode: str, limit: int, columns: Optional[list] = None,
+                   partition_column: str = "personId", order_column: str = "game_date",
+                   not_null_column: Optional[str] = None,
+                   filters: Optional[Iterable[tuple]] = None,
+                   since: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load only the last `limit` rows (by order_column) of each partition_column value,
+    e.g. the last 20 played games of each player (and, with `since`, also every row from that
+    value of order_column: the window of each value goes back to whichever comes first).
+    BigQuery and DuckDB run a window query (ROW_NUMBER() ... QUALIFY). Locally (and from the
+    BigQuery mirror) the partition_column / order_column projection gives the date of the
+    limit-th last row of each value, then only the date partitions from the earliest of these
+    dates are read.
+    Args:
+        table_name (str): The name of the table to read.
+        mode (str): 'local', 'duckdb' or 'bq'
+        limit (int): The number of rows kept for each partition_column value.
+        columns (list, optional): The columns to read (default: all).
+        partition_column (str): The column the rows are numbered by (e.g. the player).
+        order_column (str): The column ordering the rows (e.g. the game date, latest first).
+        not_null_column (str, optional): Only number the rows where this column is not null
+            (e.g. minutes: the played games).
+        filters (Iterable[tuple], optional): Same filters as load_data (e.g. [("personId", "in", ids)]).
+        since (str, optional): Also keep the rows where order_column >= since, a date (e.g. "2024-10-01").
+    Returns:
+        pd.DataFrame: The rows, in table order.
+    """
+    filters = list(filters or [])
+    read_columns: Optional[list] = None if columns is None else list(dict.fromkeys(
+        columns + [partition_column, order_column] + ([not_null_column] if not_null_column else [])))
+
+    mirrored: bool = mode == "bq" and BigQueryMirror().enabled and table_name in MirroredTables
+    if mode == "duckdb" or (mode == "bq" and not mirrored):
+        quote: str = '"' if mode == "duckdb" else "`"
+        select = ", ".join(f"{quote}{c}{quote}" for c in read_columns) if read_columns else "*"
+        not_null = [f"{quote}{not_null_column}{quote} IS NOT NULL"] if not_null_column else []
+        # since is passed as a query parameter (? for DuckDB, @since for BigQuery), never in the SQL text
+        window = (f"QUALIFY ROW_NUMBER() OVER (PARTITION BY {quote}{partition_column}{quote} "
+                  f"ORDER BY {quote}{order_column}{quote} DESC) <= {int(limit)}"
+                  + (f" OR {quote}{order_column}{quote} >= {'?' if mode == 'duckdb' else '@since'}"
+                     if since else ""))
+        if mode == "duckdb":
+            store = DuckDBStore()
+            if store.table_columns(table_name) is None:
+                return pd.DataFrame()
+            where, params = duckdb_store.filters_to_where(filters)
+            conditions = " AND ".join(([where] if where else []) + not_null) or "TRUE"
+            params = params + ([pd.Timestamp(since).date()] if since else [])
+            df = store.query(f'SELECT {select} FROM "{table_name}" WHERE {conditions} {window}', params)
+        else:
+            table_id = _table_ref(table_name)
+            where = bq_storage.filters_to_row_restriction(filters, date_column=PartitionedTables.get(table_name))
+            conditions = " AND ".join(([where] if where else []) + not_null) or "TRUE"
+            query_parameters: list = ([bigquery.ScalarQueryParameter(
+                "since", "DATE", pd.Timestamp(since).strftime("%Y-%m-%d"))] if since else [])
+            try:
+                df = bigquery.Client().query(
+                    f"SELECT {select} FROM `{table_id}` WHERE {conditions} {window}",
+                    job_config=bigquery.QueryJobConfig(query_parameters=query_parameters)).to_dataframe()
+            except (NotFound, BadRequest) as e:
+                print(f"❌ Could not load the last rows of {table_id}: {e}")
+                return pd.DataFrame()
+    else:
+        keys_df: pd.DataFrame = _load_table(table_name, mode, filters=filters, columns=list(dict.fromkeys(
+            [partition_column, order_column] + ([not_null_column] if not_null_column else []))))
+        if not_null_column and not keys_df.empty:
+            keys_df = keys_df[keys_df[not_null_column].notna()]
+        if keys_df.empty:
+            return pd.DataFrame()
+        # Earliest date among the limit-th last rows of every value: older partitions are not read
+        cutoff = (keys_df.sort_values(order_column, kind="mergesort")
+                  .groupby(partition_column).tail(limit)[order_column].min())
+        if not pd.isna(cutoff):
+            if since is not None:
+                cutoff = min(pd.Timestamp(cutoff), pd.Timestamp(since))
+            # The game_date filter of the partitioned tables compares "YYYY-MM-DD" partition names
+            if order_column == "game_date":
+                cutoff = pd.Timestamp(cutoff).strftime("%Y-%m-%d")
+            filters = filters + [(order_column, ">=", cutoff)]
+        df = _load_table(table_name, mode, columns=read_columns, filters=filters)
+        if not_null_column and not df.empty:
+            df = df[df[not_null_column].notna()]
+        if not df.empty:
+            # Same rows as the window query (ties aside), kept in table order
+            df = df.reset_index(drop=True)
+            last = df.sort_values(order_column, kind="mergesort").groupby(partition_column).tail(limit).index
+            if since is not None:
+                recent = df.index[pd.to_datetime(df[order_column]) >= pd.Timestamp(since)]
+                last = last.union(recent)
+            df = df.loc[np.sort(last)].reset_index(drop=True)
+
+    if columns is not None and not df.empty:
+        df = df[[c for c in columns if c in df.columns]]
+    if table_name in TableSchemas and not df.empty:
+        df = schemas.apply_schema(df, TableSchemas[table_name])
+    print(f"✅ Loaded the last {limit} rows of each {partition_column} from {table_name} ({len(df):,} rows)")
+    return df
+
+def drop_table(table_name: str, mode: str) -> None:
+    """
+    Delete a table (BigQuery / DuckDB) or its files (local) if it exists.
+    Args:
+        table_name (str): The name of the table to delete.
+        mode (str): 'local', 'duckdb' or 'bq'
+    """
+    if mode == "local":
+        csv_path: str = f"{databases_path}{table_name}.csv"
+        if os.path.exists(csv_path):
+            os.remove(csv_path)
+        if parquet_store.table_exists(databases_path, table_name):
+            parquet_store.drop_table(databases_path, table_name)
+            print(f"🧹 Removed local table: {databases_path}{table_name}")
+        return
+
+    if mode == "duckdb":
+        DuckDBStore().drop_table(table_name)
+        print(f"🧹 Dropped DuckDB table {table_name} (if it existed)")
+        return
+
+    if mode != "bq":
+        raise ValueError("Invalid mode: choose 'local', 'duckdb' or 'bq'")
+
+    client = bigquery.Client()
+    client.delete_table(_table_ref(table_name), not_found_ok=True)
+    print(f"🧹 Dropped table {_table_ref(table_name)} (if it existed)")
+
+def compact_local_tables() -> None:
+    """
+    Merge the small files written by the incremental appends of every local partitioned table
+    (one file per season / game date partition).
+    """
+    for table_name in PartitionedTables:
+        _migrate_local_csv(table_name)
+        compacted: int = parquet_store.compact_table(databases_path, table_name)
+        print(f"✅ {table_name}: {compacted} partition(s) compacted")
+
 def _parse_gcs_uri(uri: str) -> tuple[str, str]:
     m = re.match(r"^gs://([^/]+)/(.+)$", uri)
     if not m:
         raise ValueError(f"Invalid GCS URI: {uri}")
     return m.group(1), m.group(2)
 
-def load_model_artifact(model_path: str, mode: str):
+def _local_model_cache_dir(model_path: str) -> str:
+    """
+    Cache folder of a local model file, keyed by its size and modification time.
+    """
+    stat = os.stat(model_path)
+    return os.path.join(model_cache_path, "local", os.path.basename(model_path), f"{stat.st_size}-{stat.st_mtime_ns}")
+
+def _download_model(model_path: str) -> str:
+    """
+    Download a gs:// model into the local model cache, once per object generation
+    (an unchanged model is never downloaded again; older generations are removed).
+    Returns:
+        str: The path of the cached model file.
+    """
+    bucket_name, blob_name = _parse_gcs_uri(model_path)
+    client = storage.Client()  # uses default creds on Cloud Run Job
+    blob = client.bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        raise FileNotFoundError(f"Model not found: {model_path}")
+
+    # The generation changes on every overwrite of the object (the md5 is the fallback)
+    version: str = str(blob.generation) if blob.generation else blob.md5_hash.replace("/", "_")
+    object_dir: str = os.path.join(model_cache_path, bucket_name, blob_name)
+    local_path: str = os.path.join(object_dir, version, os.path.basename(blob_name))
+    if os.path.exists(local_path):
+        print(f"📦 Model {model_path} (version {version}) loaded from the local cache")
+        return local_path
+
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    tmp_path: str = f"{local_path}.{uuid.uuid4().hex[:12]}.part"
+    try:
+        blob.download_to_filename(tmp_path, if_generation_match=blob.generation)
+        os.replace(tmp_path, local_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"⬇️ Downloaded model {model_path} (version {version}) to {local_path}")
+
+    for entry in os.listdir(object_dir):
+        if entry != version:
+            shutil.rmtree(os.path.join(object_dir, entry), ignore_errors=True)
+    return local_path
+
+def _load_model_file(model_file: str, cache_dir: str, native: bool):
+    """
+    Load a model file: LightGBM text models (*.txt) as a native Booster, pickles with joblib.
+    With native, a pickled LightGBM model is converted once to the native format in cache_dir and
+    loaded as a lightgbm.Booster, on the first run as on the next ones (they skip the unpickling).
+    The native file is parsed by LightGBM's C++ loader from its path: it has to build the trees
+    in memory anyway, so a memory-mapped read would not save that parse and none is used.
+    """
+    if not native and not model_file.endswith(".txt"):
+        return joblib.load(model_file)
+
+    # Imported here: only the native models need LightGBM
+    import lightgbm as lgb
+
+    if model_file.endswith(".txt"):
+        return lgb.Booster(model_file=model_file)
+
+    native_file: str = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(model_file))[0]}.lgb.txt")
+    if os.path.exists(native_file):
+        print(f"📦 Native LightGBM model loaded from {native_file}")
+        return lgb.Booster(model_file=native_file)
+
+    model = joblib.load(model_file)
+    booster = getattr(model, "booster_", model)
+    if not isinstance(booster, lgb.Booster):
+        print(f"⚠️ {model_file} is not a LightGBM model; keeping the pickle")
+        return model
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file: str = f"{native_file}.{uuid.uuid4().hex[:12]}.part"
+    booster.save_model(tmp_file)
+    os.replace(tmp_file, native_file)
+    print(f"💾 Saved the native LightGBM model to {native_file}")
+    # The same type as the next runs, which load the native file
+    return lgb.Booster(model_file=native_file)
+
+def load_model_artifact(model_path: str, mode: str, native: bool = False):
     """
     Load a model artifact from either local disk or GCS.
+    gs:// models are cached in model_cache_path per object generation, so an unchanged
+    model is never downloaded again.
 
     Args:
-        model_path: local path or 'gs://bucket/obj'
-        mode: 'local' or 'bq' (if 'bq' and path is gs://, downloads from GCS)
+        model_path: local path or 'gs://bucket/obj' (a pickle, or a LightGBM text model *.txt)
+        mode: 'local', 'duckdb' or 'bq' (if 'bq' and path is gs://, downloads from GCS)
+        native: Load a pickled LightGBM model from its native Booster format, converted once
+            and cached (no unpickling on the next runs)
 
     Returns:
-        The deserialized model (e.g., a LightGBM/Sklearn object via joblib)
+        The deserialized model (e.g., a LightGBM/Sklearn object via joblib, or a lightgbm.Booster)
     """
     mode = (mode or "").lower()
     is_gcs = isinstance(model_path, str) and model_path.startswith("gs://")
 
     # Local mode (or any non-gs path) -> direct load
     if mode == "local" or not is_gcs:
-        return joblib.load(model_path)
-
-    # GCS mode: download to a temp file then load
-    bucket_name, blob_name = _parse_gcs_uri(model_path)
-    client = storage.Client()  # uses default creds on Cloud Run Job
-    blob = client.bucket(bucket_name).blob(blob_name)
+        cache_dir: str = _local_model_cache_dir(model_path) if native else ""
+        return _load_model_file(model_path, cache_dir, native)
 
-    with tempfile.NamedTemporaryFile(suffix=".pkl", delete=False) as tmp:
-        tmp_path = tmp.name
-    try:
-        blob.download_to_filename(tmp_path)
-        return joblib.load(tmp_path)
-    finally:
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
\ No newline at end of file
+    # GCS mode: download to the cache (once per generation) then load
+    local_path: str = _download_model(model_path)
+    return _load_model_file(local_path, os.path.dirname(local_path), native)
@@ -0,0 +1,360 @@
+"""
+This module contains the local Parquet (Arrow) storage backend.
+Game level tables are stored as datasets partitioned by season and game date:
+    databases/{table}/part_season=2024/part_game_date=2024-10-22/part-<uuid>-0.parquet
+Other tables are stored as a single databases/{table}.parquet file.
+"""
+import os
+import shutil
+import uuid
+from typing import Iterable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from common.constants import local_compaction_max_files
+from common.utils import normalize_game_ids
+
+# Hidden partition columns (added on write, dropped on read)
+SEASON_PARTITION: str = "part_season"
+DATE_PARTITION: str = "part_game_date"
+PARTITIONING = ds.partitioning(
+    pa.schema([(SEASON_PARTITION, pa.int32()), (DATE_PARTITION, pa.string())]),
+    flavor="hive",
+)
+# Friendly names accepted in read filters
+_FILTER_ALIASES: dict = {"season": SEASON_PARTITION, "game_date": DATE_PARTITION}
+
+
+def _dataset_path(databases_path: str, table_name: str) -> str:
+    return os.path.join(databases_path, table_name)
+
+
+def _file_path(databases_path: str, table_name: str) -> str:
+    return os.path.join(databases_path, f"{table_name}.parquet")
+
+
+def _backup_paths(databases_path: str, table_name: str) -> list:
+    prefix: str = f".{table_name}.old-"
+    if not os.path.isdir(databases_path):
+        return []
+    return [os.path.join(databases_path, name) for name in os.listdir(databases_path) if name.startswith(prefix)]
+
+
+def _restore_interrupted_swap(databases_path: str, table_name: str) -> None:
+    """
+    Put back the previous dataset of a table if a WRITE_TRUNCATE was interrupted between
+    moving it aside and moving the new one into place (see _replace_dataset).
+    """
+    path = _dataset_path(databases_path, table_name)
+    backups = _backup_paths(databases_path, table_name)
+    if backups and not os.path.isdir(path):
+        os.rename(backups[0], path)
+        print(f"♻️ Restored {path} from an interrupted write")
+
+
+def _replace_dataset(new_path: str, path: str, databases_path: str, table_name: str) -> None:
+    """
+    Move a fully written dataset into place: the old one is renamed aside first and deleted last,
+    so a crash never leaves the table without its rows.
+    """
+    backup_path: Optional[str] = None
+    if os.path.isdir(path):
+        backup_path = os.path.join(databases_path, f".{table_name}.old-{uuid.uuid4().hex}")
+        os.rename(path, backup_path)
+    os.rename(new_path, path)
+    if backup_path is not None:
+        shutil.rmtree(backup_path, ignore_errors=True)
+
+
+def table_exists(databases_path: str, table_name: str) -> bool:
+    _restore_interrupted_swap(databases_path, table_name)
+    return (os.path.isdir(_dataset_path(databases_path, table_name))
+            or os.path.exists(_file_path(databases_path, table_name)))
+
+
+def add_partition_columns(df: pd.DataFrame, date_column: str) -> pd.DataFrame:
+    """
+    Add the season (from gameId) and game date (YYYY-MM-DD, "unknown" if missing) partition columns.
+    Args:
+        df (pd.DataFrame): Rows with a gameId column and a date column.
+        date_column (str): The column holding the game date.
+    Returns:
+        pd.DataFrame: A copy of df with the partition columns.
+    """
+    df = df.copy()
+    game_ids = normalize_game_ids(df["gameId"])
+    df["gameId"] = game_ids
+    df[SEASON_PARTITION] = (game_ids.str[3:5].astype(int) + 2000).astype("int32")
+    df[DATE_PARTITION] = pd.to_datetime(df[date_column]).dt.strftime("%Y-%m-%d").fillna("unknown")
+    return df
+
+
+def _to_expression(filters: Optional[Iterable[tuple]]) -> Optional[pc.Expression]:
+    """
+    Convert [(column, op, value), ...] (AND-ed) into a pyarrow expression.
+    Ops: =, ==, !=, <, <=, >, >=, in, not in. 'season' / 'game_date' map to the partitions.
+    """
+    expression = None
+    for column, op, value in filters or []:
+        field = pc.field(_FILTER_ALIASES.get(column, column))
+        if op in ("=", "=="):
+            condition = field == value
+        elif op == "!=":
+            condition = field != value
+        elif op == "<":
+            condition = field < value
+        elif op == "<=":
+            condition = field <= value
+        elif op == ">":
+            condition = field > value
+        elif op == ">=":
+            condition = field >= value
+        elif op == "in":
+            condition = field.isin(list(value))
+        elif op == "not in":
+            condition = ~field.isin(list(value))
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _unify_schemas(schemas: list) -> pa.Schema:
+    """
+    Merge the schemas of the files of a table: null / int / float promote permissively,
+    columns with incompatible types (e.g. an all-NaN float batch of a text column) are read as text.
+    """
+    try:
+        return pa.unify_schemas(schemas, promote_options="permissive")
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        pass
+    fields: dict = {}
+    for schema in schemas:
+        for field in schema:
+            fields.setdefault(field.name, []).append(field)
+    unified: list = []
+    for name, same_name_fields in fields.items():
+        try:
+            unified.append(pa.unify_schemas([pa.schema([f]) for f in same_name_fields],
+                                            promote_options="permissive").field(name))
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            unified.append(pa.field(name, pa.large_string()))
+    return pa.schema(unified)
+
+
+def open_dataset(databases_path: str, table_name: str) -> Optional[ds.Dataset]:
+    """
+    Open a partitioned table, unifying the schemas of all its files
+    (a column that was all null in one batch must not break the read).
+    """
+    _restore_interrupted_swap(databases_path, table_name)
+    path = _dataset_path(databases_path, table_name)
+    if not os.path.isdir(path):
+        return None
+    dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    if not schemas:
+        return None
+    schema = _unify_schemas(schemas + [PARTITIONING.schema])
+    return ds.dataset(path, schema=schema, format="parquet", partitioning=PARTITIONING)
+
+
+def read_table(databases_path: str, table_name: str,
+               columns: Optional[list] = None,
+               filters: Optional[Iterable[tuple]] = None) -> Optional[pd.DataFrame]:
+    """
+    Read a local Parquet table with column projection and filters
+    (partition filters on season / game_date only open the matching folders).
+    Args:
+        databases_path (str): The databases folder.
+        table_name (str): The table to read.
+        columns (list, optional): Columns to read (default: all).
+        filters (Iterable[tuple], optional): [(column, op, value), ...] AND-ed together.
+    Returns:
+        pd.DataFrame: The rows, or None if the table does not exist.
+    """
+    expression = _to_expression(filters)
+    dataset = open_dataset(databases_path, table_name)
+    if dataset is not None:
+        read_columns = None
+        if columns is not None:
+            read_columns = [c for c in columns if c in dataset.schema.names]
+        table = dataset.to_table(columns=read_columns, filter=expression)
+        hidden = [c for c in (SEASON_PARTITION, DATE_PARTITION) if c in table.column_names]
+        return table.drop_columns(hidden).to_pandas()
+
+    path = _file_path(databases_path, table_name)
+    if os.path.exists(path):
+        if columns is not None:
+            columns = [c for c in columns if c in pq.read_schema(path).names]
+        return pq.read_table(path, columns=columns, filters=expression).to_pandas()
+    return None
+
+
+def _write_partitions(table: pa.Table, path: str) -> None:
+    ds.write_dataset(
+        table,
+        path,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def _partition_dir(path: str, season: int, game_date: str) -> str:
+    return os.path.join(path, f"{SEASON_PARTITION}={season}", f"{DATE_PARTITION}={game_date}")
+
+
+def _partition_files(partition_dir: str) -> list:
+    if not os.path.isdir(partition_dir):
+        return []
+    return [os.path.join(partition_dir, name) for name in os.listdir(partition_dir)
+            if name.endswith(".parquet") and not name.startswith(".")]
+
+
+def _rewrite_partition(partition_dir: str, table: pa.Table) -> None:
+    """
+    Replace all the files of a partition by a single file holding `table`.
+    The new file is written under a hidden name first, so readers never see a partial file.
+    """
+    old_files = _partition_files(partition_dir)
+    table = table.drop_columns([c for c in (SEASON_PARTITION, DATE_PARTITION) if c in table.column_names])
+    if table.num_rows:
+        name = f"part-{uuid.uuid4().hex}-0.parquet"
+        tmp_path = os.path.join(partition_dir, f".{name}")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(partition_dir, name))
+    for old_file in old_files:
+        os.remove(old_file)
+    if not table.num_rows:
+        shutil.rmtree(partition_dir, ignore_errors=True)
+
+
+def write_table(df: pd.DataFrame, databases_path: str, table_name: str,
+                date_column: Optional[str], write_disposition: str,
+                compact_above: int = local_compaction_max_files) -> None:
+    """
+    Write a DataFrame to the local Parquet store.
+    - Partitioned tables (date_column set) + WRITE_APPEND: the new rows are written as new files
+      (nothing else is rewritten). Rows already stored for the incoming gameIds are deleted first,
+      looking only into the seasons of those gameIds. Touched partitions holding more than
+      `compact_above` files are compacted.
+    - Otherwise the table is replaced: the new dataset is written to a hidden directory and
+      swapped in once complete (the old rows stay readable until then).
+    Args:
+        df (pd.DataFrame): The rows to write.
+        databases_path (str): The databases folder.
+        table_name (str): The table to write.
+        date_column (str, optional): Date column used for partitioning (None = single file).
+        write_disposition (str): 'WRITE_APPEND' or 'WRITE_TRUNCATE'.
+        compact_above (int): Files per partition above which a touched partition is compacted.
+    """
+    os.makedirs(databases_path, exist_ok=True)
+
+    if date_column is None:
+        path = _file_path(databases_path, table_name)
+        df = df.copy()
+        if "gameId" in df.columns:
+            df["gameId"] = normalize_game_ids(df["gameId"])
+        if write_disposition == "WRITE_APPEND" and os.path.exists(path):
+            existing_df = pq.read_table(path).to_pandas()
+            if "gameId" in df.columns and "gameId" in existing_df.columns:
+                existing_df = existing_df[~existing_df["gameId"].isin(set(df["gameId"]))]
+            df = pd.concat([existing_df, df], ignore_index=True)
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        return
+
+    path = _dataset_path(databases_path, table_name)
+    df = add_partition_columns(df, date_column)
+
+    if write_disposition != "WRITE_APPEND":
+        _restore_interrupted_swap(databases_path, table_name)
+        new_path = os.path.join(databases_path, f".{table_name}.new-{uuid.uuid4().hex}")
+        os.makedirs(new_path)
+        try:
+            _write_partitions(pa.Table.from_pandas(df, preserve_index=False), new_path)
+            _replace_dataset(new_path, path, databases_path, table_name)
+        finally:
+            shutil.rmtree(new_path, ignore_errors=True)
+        return
+
+    delete_game_ids(databases_path, table_name, set(df["gameId"]))
+    _write_partitions(pa.Table.from_pandas(df, preserve_index=False), path)
+
+    if write_disposition == "WRITE_APPEND":
+        touched = df[[SEASON_PARTITION, DATE_PARTITION]].drop_duplicates().itertuples(index=False)
+        compact_table(databases_path, table_name, partitions=list(touched), min_files=compact_above + 1)
+
+
+def delete_game_ids(databases_path: str, table_name: str, game_ids: set) -> int:
+    """
+    Remove the rows of the given gameIds, rewriting only the partitions that hold them.
+    A gameId encodes its season, so only the gameId column of those seasons is scanned.
+    Returns:
+        int: The number of rows deleted.
+    """
+    dataset = open_dataset(databases_path, table_name)
+    if dataset is None or not game_ids:
+        return 0
+    path = _dataset_path(databases_path, table_name)
+    game_ids = list(game_ids)
+    seasons = sorted({int(gid[3:5]) + 2000 for gid in game_ids})
+    hits = dataset.to_table(columns=["gameId", SEASON_PARTITION, DATE_PARTITION],
+                            filter=pc.field(SEASON_PARTITION).isin(seasons)
+                            & pc.field("gameId").isin(game_ids)).to_pandas()
+    if hits.empty:
+        return 0
+
+    for (season, game_date), _ in hits.groupby([SEASON_PARTITION, DATE_PARTITION]):
+        kept = dataset.to_table(filter=(pc.field(SEASON_PARTITION) == season)
+                                & (pc.field(DATE_PARTITION) == game_date)
+                                & ~pc.field("gameId").isin(game_ids))
+        _rewrite_partition(_partition_dir(path, season, game_date), kept)
+    return len(hits)
+
+
+def compact_table(databases_path: str, table_name: str,
+                  partitions: Optional[list] = None, min_files: int = 2) -> int:
+    """
+    Merge the small files of each partition into a single file.
+    Args:
+        databases_path (str): The databases folder.
+        table_name (str): The partitioned table to compact.
+        partitions (list, optional): (season, game_date) pairs to look at (default: all).
+        min_files (int): Only compact partitions holding at least this many files.
+    Returns:
+        int: The number of compacted partitions.
+    """
+    path = _dataset_path(databases_path, table_name)
+    if partitions is None:
+        partitions = []
+        for season_dir in sorted(os.listdir(path)) if os.path.isdir(path) else []:
+            season_path = os.path.join(path, season_dir)
+            if os.path.isdir(season_path) and season_dir.startswith(f"{SEASON_PARTITION}="):
+                for date_dir in sorted(os.listdir(season_path)):
+                    if date_dir.startswith(f"{DATE_PARTITION}="):
+                        partitions.append((int(season_dir.split("=", 1)[1]), date_dir.split("=", 1)[1]))
+
+    to_compact = [(season, game_date) for season, game_date in partitions
+                  if len(_partition_files(_partition_dir(path, season, game_date))) >= min_files]
+    if not to_compact:
+        return 0
+    dataset = open_dataset(databases_path, table_name)
+    for season, game_date in to_compact:
+        partition_table = dataset.to_table(filter=(pc.field(SEASON_PARTITION) == season)
+                                           & (pc.field(DATE_PARTITION) == game_date))
+        _rewrite_partition(_partition_dir(path, season, game_date), partition_table)
+    print(f"🗜️ Compacted {len(to_compact)} partition(s) of {table_name}")
+    return len(to_compact)
+
+
+def drop_table(databases_path: str, table_name: str) -> None:
+    shutil.rmtree(_dataset_path(databases_path, table_name), ignore_errors=True)
+    if os.path.exists(_file_path(databases_path, table_name)):
+        os.remove(_file_path(databases_path, table_name))
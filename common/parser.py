@@ -9,14 +9,31 @@ def build_parser(parser:argparse.ArgumentParser):
             str: The name of the process to run
             str: The current season to run the process for
             str: The season type to run the process for
+            str: The save mode ('bq', 'local' or 'duckdb')
+            str: The date to run the process for
+            str: The model path for predictions
+            bool: Whether to rebuild the boxscore tables from the raw cache
+            bool: Whether to start loading the prediction inputs before the process checks
+            bool: Whether to load the model from its native LightGBM format
+            bool: Whether to read the player features from the player feature state
+            int: The number of last games of each player loaded by the predictions (None: all)
+            int: The number of last days of games loaded by the predictions (None: all)
+            int: The number of last seasons of boxscores loaded by the predictions (None: all)
     """
     # Add arguments to the parser
     parser.add_argument("-p", "--process", type=str, required=True, help="Name of the process to run")
     parser.add_argument("-s", "--season", type=str, default=None, help="Current season to run the process for")
-    parser.add_argument("-sm", "--save_mode", type=str, default="bq", choices=["bq", "local"], help="Where to save the output ('bq' or 'local')")
+    parser.add_argument("-sm", "--save_mode", type=str, default="bq", choices=["bq", "local", "duckdb"], help="Where to save the output ('bq', 'local' or 'duckdb')")
     parser.add_argument("-st","--season_type", type=str, default=None, help="Type of season to run the process for")
     parser.add_argument("-d","--date", type=str, default=None, help="Date to run the process for (optional)")
     parser.add_argument("-m","--model_path", type=str, default=None, help="Path to the model for predictions (optional)")
+    parser.add_argument("-rb","--rebuild", action="store_true", help="Re-ingest every final boxscore from the raw response cache (optional)")
+    parser.add_argument("-pf","--prefetch", action="store_true", help="Start loading the model and tables of the predictions right after parsing (optional)")
+    parser.add_argument("-nm","--native_model", action="store_true", help="Load the LightGBM model from its cached native format instead of the pickle (optional)")
+    parser.add_argument("-fs","--feature_state", action="store_true", help="Read the player features of the predictions from the player feature state (optional)")
+    parser.add_argument("-lg","--lookback_games", type=int, default=None, help="Only load the last N played games of each player for the predictions, N >= 20 (optional)")
+    parser.add_argument("-ld","--lookback_days", type=int, default=None, help="Only load the last N days of games for the predictions, at least the last 20 games of each player (optional)")
+    parser.add_argument("-hs","--history_seasons", type=int, default=None, help="Only load the boxscores of the last N seasons for the predictions (optional)")
     
     # Get the arguments from the parser
     args = parser.parse_args()
@@ -27,5 +44,13 @@ def build_parser(parser:argparse.ArgumentParser):
     season_type = args.season_type
     date = args.date
     model_path = args.model_path 
+    rebuild = args.rebuild
+    prefetch = args.prefetch
+    native_model = args.native_model
+    feature_state = args.feature_state
+    lookback_games = args.lookback_games
+    lookback_days = args.lookback_days
+    history_seasons = args.history_seasons
     
-    return process_name, current_season, save_mode, season_type, date, model_path
\ No newline at end of file
+    return (process_name, current_season, save_mode, season_type, date, model_path, rebuild, prefetch,
+            native_model, feature_state, lookback_games, lookback_days, history_seasons)
\ No newline at end of file
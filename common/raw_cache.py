@@ -0,0 +1,160 @@
+"""
+This module contains an on-disk cache of raw NBA API responses for finished games.
+A boxscore of a final game never changes, so it only has to go through the proxy once.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from typing import Optional
+
+from nba_api.stats.library.http import NBAStatsResponse
+
+from common.constants import raw_cache_path, raw_cache_max_bytes
+from common.singleton_meta import SingletonMeta
+
+
+class RawResponseCache(metaclass=SingletonMeta):
+    """
+    Gzip compressed JSON responses addressed by sha256(endpoint + key), with a total size budget.
+    When the budget is exceeded the least recently used files are evicted.
+    """
+
+    def __init__(self, cache_dir: str = raw_cache_path, max_bytes: int = raw_cache_max_bytes) -> None:
+        """
+        Args:
+            cache_dir (str): Root folder of the cache.
+            max_bytes (int): Maximum total size of the cached files.
+        """
+        self.cache_dir: str = cache_dir
+        self.max_bytes: int = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # computed lazily on the first write
+
+    def _path(self, endpoint: str, key: str) -> str:
+        digest: str = hashlib.sha256(f"{endpoint}:{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, endpoint.lower(), digest[:2], f"{digest}.json.gz")
+
+    def _files(self) -> list:
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def get(self, endpoint: str, key: str) -> Optional[str]:
+        """
+        Return the cached raw response, or None on a miss.
+        """
+        path = self._path(endpoint, key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                contents = f.read()
+        except (OSError, EOFError):
+            return None
+        # Refresh the mtime so eviction is least recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return contents
+
+    def put(self, endpoint: str, key: str, contents: str) -> None:
+        """
+        Store a raw response (atomic write) and evict old entries if over budget.
+        """
+        path = self._path(endpoint, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(contents)
+        new_size = os.path.getsize(tmp_path)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._files())
+            else:
+                self._size += new_size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, endpoint: str, key: str) -> None:
+        """
+        Remove a cached raw response (no-op on a miss).
+        """
+        path = self._path(endpoint, key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _evict(self) -> None:
+        # Drop the oldest files until we are back under 90% of the budget
+        target = int(self.max_bytes * 0.9)
+        files = sorted(self._files())
+        self._size = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in files:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            evicted += 1
+        print(f"🧹 Raw cache: evicted {evicted} file(s), {self._size / 1e6:.1f} MB left")
+
+
+def load_cached_endpoint(endpoint_cls, game_id: str):
+    """
+    Build an nba_api endpoint from the raw cache without any network call.
+    Args:
+        endpoint_cls: The nba_api endpoint class, e.g. BoxScoreTraditionalV3.
+        game_id (str): The game ID.
+    Returns:
+        The loaded endpoint instance, or None if the game is not cached.
+    """
+    contents = RawResponseCache().get(endpoint_cls.endpoint, game_id)
+    if contents is None:
+        return None
+    endpoint = endpoint_cls(game_id=game_id, get_request=False)
+    endpoint.nba_response = NBAStatsResponse(response=contents, status_code=200, url=None)
+    try:
+        endpoint.load_response()
+    except Exception as e:
+        print(f"⚠️ Evicting unreadable cache entry for {endpoint_cls.endpoint} {game_id}: {e}")
+        evict_cached_endpoint(endpoint_cls, game_id)
+        return None
+    return endpoint
+
+
+def evict_cached_endpoint(endpoint_cls, game_id: str) -> None:
+    """
+    Remove a game from the raw cache, so the next run fetches it from the API again.
+    Args:
+        endpoint_cls: The nba_api endpoint class, e.g. BoxScoreTraditionalV3.
+        game_id (str): The game ID.
+    """
+    RawResponseCache().delete(endpoint_cls.endpoint, game_id)
+
+
+def store_endpoint_response(endpoint, game_id: str) -> None:
+    """
+    Store the raw JSON of a loaded nba_api endpoint in the cache.
+    Only call it for finished games (game_status == "3") whose response was checked
+    (see check_boxscore): their boxscore never changes.
+    """
+    RawResponseCache().put(endpoint.endpoint, game_id, endpoint.nba_response.get_response())
@@ -0,0 +1,231 @@
+"""
+This module contains the vectorized rolling window engine of the feature pipeline.
+All the columns and windows are computed together on a NumPy block sorted once by player and
+game date, instead of one pandas groupby / rolling loop per column and window.
+"""
+import numpy as np
+import pandas as pd
+
+
+def sort_order(df: pd.DataFrame, group_column: str, order_column: str) -> np.ndarray:
+    """
+    Positions of the rows sorted by group then order column (stable: ties keep the table order,
+    missing dates are last).
+    """
+    keys = df[[group_column, order_column]].reset_index(drop=True)
+    return keys.sort_values([group_column, order_column], kind="mergesort", na_position="last").index.to_numpy()
+
+
+def position_in_group(groups: np.ndarray) -> np.ndarray:
+    """
+    0-based position of every row in its group, for group keys already sorted
+    (a missing key is a group of its own).
+    """
+    row = np.arange(len(groups))
+    starts = np.ones(len(groups), dtype=bool)
+    if len(groups) > 1:
+        same = groups[1:] == groups[:-1]
+        starts[1:] = ~same
+    return row - np.maximum.accumulate(np.where(starts, row, 0))
+
+
+def _kahan_add(sums: np.ndarray, compensation: np.ndarray, values: np.ndarray, valid) -> None:
+    """
+    sums += values in place with Kahan compensation, as the pandas rolling mean adds (and removes,
+    with -values) a value. Only the positions where valid is True are updated (all when valid is None).
+    """
+    y: np.ndarray = values - compensation
+    t: np.ndarray = sums + y
+    if valid is None:
+        np.subtract(t, sums, out=compensation)
+        compensation -= y
+        sums[...] = t
+    else:
+        np.copyto(compensation, t - sums - y, where=valid)
+        np.copyto(sums, t, where=valid)
+
+
+def grouped_rolling_mean(df: pd.DataFrame, columns: list, windows: list,
+                         group_column: str = "personId", order_column: str = "game_date") -> pd.DataFrame:
+    """
+    Rolling means over the last N rows of each group, in order_column order: the values of
+    df.sort_values([group_column, order_column]).groupby(group_column)[column]
+      .transform(lambda x: x.rolling(N, min_periods=1).mean())
+    for every column and window, bit for bit (NaN / inf values are skipped, as pandas does).
+    pandas walks each group row by row, removing the value leaving the window then adding the new one
+    to a running sum with Kahan compensation, and fixes the sign of the mean / repeats a constant value.
+    The same steps are run here in lockstep over all the groups, columns and windows: step k updates
+    the k-th row of every group at once, so the Python loop is over the longest group, not the rows.
+    Args:
+        df (pd.DataFrame): The rows (any order).
+        columns (list): The numeric columns to roll.
+        windows (list): The window sizes, e.g. [5, 10, 20].
+        group_column (str): The group column (e.g. the player).
+        order_column (str): The column ordering the rows of a group (e.g. the game date).
+    Returns:
+        pd.DataFrame: The columns "{column}_rolling_{window}", aligned on df.index.
+    """
+    windows = sorted(windows)
+    names: list = [f"{column}_rolling_{window}" for window in windows for column in columns]
+    if df.empty:
+        return pd.DataFrame({name: pd.Series(dtype="float64") for name in names}, index=df.index)
+
+    order: np.ndarray = sort_order(df, group_column, order_column)
+    groups: np.ndarray = df[group_column].to_numpy()[order]
+    position: np.ndarray = position_in_group(groups)
+    block: np.ndarray = df[columns].to_numpy(dtype="float64")[order]
+
+    # Step order: by position in the group, then the longest groups first, so that the rows of step k
+    # are a contiguous slice and the groups still running at step k are the first ones of the state
+    group_number: np.ndarray = np.cumsum(position == 0) - 1
+    lengths: np.ndarray = np.bincount(group_number)
+    rank: np.ndarray = np.empty(len(lengths), dtype="int64")
+    rank[np.argsort(-lengths, kind="stable")] = np.arange(len(lengths))
+    step_order: np.ndarray = np.lexsort((rank[group_number], position))
+    bounds: np.ndarray = np.searchsorted(position[step_order], np.arange(lengths.max() + 1))
+    values: np.ndarray = np.where(np.isinf(block), np.nan, block)[step_order]
+
+    # Running state of every (group, window, column), as in the pandas roll_mean loop
+    shape: tuple = (len(lengths), len(windows), len(columns))
+    sums: np.ndarray = np.zeros(shape)
+    compensation_add: np.ndarray = np.zeros(shape)
+    compensation_remove: np.ndarray = np.zeros(shape)
+    nobs: np.ndarray = np.zeros(shape)
+    negatives: np.ndarray = np.zeros(shape)
+    same_count: np.ndarray = np.zeros(shape)
+    previous: np.ndarray = np.full(shape, np.nan)
+    means: np.ndarray = np.empty((len(block), len(windows), len(columns)))
+
+    for step in range(lengths.max()):
+        first, last = bounds[step], bounds[step + 1]
+        n: int = last - first
+        # Remove the value leaving each window
+        for i, window in enumerate(windows):
+            if step < window:
+                continue
+            leaving = values[bounds[step - window]:bounds[step - window] + n]
+            valid = ~np.isnan(leaving)
+            _kahan_add(sums[:n, i], compensation_remove[:n, i], -leaving, None if valid.all() else valid)
+            nobs[:n, i] -= valid
+            negatives[:n, i] -= valid & np.signbit(leaving)
+
+        # Add the new value to every window
+        entering = values[first:last][:, None, :]
+        valid = ~np.isnan(entering)
+        all_valid: bool = bool(valid.all())
+        step_sums, step_nobs, step_count, step_previous = sums[:n], nobs[:n], same_count[:n], previous[:n]
+        valid_state = None if all_valid else np.broadcast_to(valid, step_sums.shape)
+        _kahan_add(step_sums, compensation_add[:n], np.broadcast_to(entering, step_sums.shape), valid_state)
+        step_nobs += valid
+        negatives[:n] += valid & np.signbit(entering)
+        same: np.ndarray = entering == step_previous
+        if all_valid:
+            # count + 1 after the same value, else 1
+            np.multiply(step_count, same, out=step_count)
+            step_count += 1
+            step_previous[...] = entering
+        else:
+            np.copyto(step_count, np.where(same, step_count + 1, 1), where=valid_state)
+            np.copyto(step_previous, np.broadcast_to(entering, step_sums.shape), where=valid_state)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean: np.ndarray = step_sums / step_nobs
+        mean[(negatives[:n] == 0) & (mean < 0)] = 0.0
+        mean[(negatives[:n] == step_nobs) & (mean > 0)] = 0.0
+        np.copyto(mean, step_previous, where=step_count >= step_nobs)
+        mean[step_nobs == 0] = np.nan
+        means[first:last] = mean
+
+    sorted_means: np.ndarray = np.empty_like(means)
+    sorted_means[step_order] = means
+    # Rows without a group (missing key) are dropped by groupby
+    sorted_means[pd.isna(groups)] = np.nan
+    unsorted: np.ndarray = np.empty_like(means)
+    unsorted[order] = sorted_means
+    result: dict = {f"{column}_rolling_{window}": unsorted[:, i, j]
+                    for i, window in enumerate(windows) for j, column in enumerate(columns)}
+    return pd.DataFrame(result, index=df.index)
+
+
+def opponent_position_daily(df: pd.DataFrame, value_column: str = "points") -> pd.DataFrame:
+    """
+    Average of value_column allowed by each opponent to each position group on each game date.
+    Args:
+        df (pd.DataFrame): Rows with position_group, opponent, game_date and value_column.
+        value_column (str): The column to average.
+    Returns:
+        pd.DataFrame: position_group, opponent, game_date and avg_points, sorted by these keys.
+    """
+    return (df.groupby(["position_group", "opponent", "game_date"], sort=True)[value_column]
+            .mean().reset_index(name="avg_points"))
+
+
+def opponent_position_aggregates(per_date: pd.DataFrame, windows: tuple = (10, 20),
+                                 as_of_date: bool = False) -> pd.DataFrame:
+    """
+    Mean of the per-date averages (see opponent_position_daily) of each (position_group, opponent)
+    over every date and over the last N dates. Vectorized: a rank within each (position_group,
+    opponent) and masked bincount reductions (linear in the number of dates).
+    Args:
+        per_date (pd.DataFrame): position_group, opponent, game_date and avg_points.
+        windows (tuple): The numbers of last dates, e.g. (10, 20).
+        as_of_date (bool): Also compute the averages as of each game date (the dates up to and
+            including it), instead of only the latest ones.
+    Returns:
+        pd.DataFrame: position_group, opponent (and game_date with as_of_date),
+            avg_pts_opp_position_last_{N} for each window and avg_pts_opp_position_all.
+    """
+    keys: list = ["position_group", "opponent"]
+    per_date = per_date.sort_values(keys + ["game_date"], kind="mergesort").reset_index(drop=True)
+    dtype = per_date["avg_points"].dtype
+    group: np.ndarray = per_date.groupby(keys, sort=True).ngroup().to_numpy()
+    position: np.ndarray = position_in_group(group)
+    values: np.ndarray = per_date["avg_points"].to_numpy(dtype="float64")
+    valid: np.ndarray = ~np.isnan(values)
+
+    if as_of_date:
+        per_date["_group"] = group
+        out: pd.DataFrame = per_date[keys + ["game_date"]].copy()
+        rolling_df = grouped_rolling_mean(per_date, ["avg_points"], list(windows),
+                                          group_column="_group", order_column="game_date")
+        for window in windows:
+            out[f"avg_pts_opp_position_last_{window}"] = rolling_df[f"avg_points_rolling_{window}"].astype(dtype)
+        sums = pd.Series(np.where(valid, values, 0.0)).groupby(group).cumsum().to_numpy()
+        counts = pd.Series(valid.astype("float64")).groupby(group).cumsum().to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["avg_pts_opp_position_all"] = np.where(counts > 0, sums / counts, np.nan).astype(dtype)
+        return out
+
+    n_groups: int = int(group.max()) + 1 if len(group) else 0
+    rank_from_end: np.ndarray = np.bincount(group, minlength=n_groups)[group] - 1 - position
+    out = per_date.loc[position == 0, keys].reset_index(drop=True)
+
+    def masked_mean(mask: np.ndarray) -> np.ndarray:
+        sums = np.bincount(group, weights=np.where(mask, values, 0.0), minlength=n_groups)
+        counts = np.bincount(group, weights=mask.astype("float64"), minlength=n_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan).astype(dtype)
+
+    for window in windows:
+        out[f"avg_pts_opp_position_last_{window}"] = masked_mean(valid & (rank_from_end < window))
+    out["avg_pts_opp_position_all"] = masked_mean(valid)
+    return out
+
+
+def opponent_position_averages(df: pd.DataFrame, value_column: str = "points", windows: tuple = (10, 20),
+                               as_of_date: bool = False) -> pd.DataFrame:
+    """
+    Average of value_column allowed by each opponent to each position group: one average per
+    (position_group, opponent, game_date) first, then the mean over every date and over the last
+    N dates (opponent_position_daily then opponent_position_aggregates).
+    Args:
+        df (pd.DataFrame): Rows with position_group, opponent, game_date and value_column.
+        value_column (str): The column to average.
+        windows (tuple): The numbers of last dates, e.g. (10, 20).
+        as_of_date (bool): Also compute the averages as of each game date (the dates up to and
+            including it), instead of only the latest ones.
+    Returns:
+        pd.DataFrame: position_group, opponent (and game_date with as_of_date),
+            avg_pts_opp_position_last_{N} for each window and avg_pts_opp_position_all.
+    """
+    return opponent_position_aggregates(opponent_position_daily(df, value_column), windows, as_of_date)
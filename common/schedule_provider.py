@@ -0,0 +1,174 @@
+"""
+This module contains the single schedule source shared by every ingestion stage.
+The ScheduleLeagueV2 response is cached on disk with a TTL and revalidated with
+ETag / Last-Modified conditional requests, so a pipeline run downloads it at most once.
+"""
+import gzip
+import json
+import os
+import time
+from typing import Optional
+
+import pandas as pd
+from nba_api.stats.endpoints import scheduleleaguev2
+from nba_api.stats.library.http import NBAStatsHTTP, NBAStatsResponse
+from nba_api.stats.library.parameters import LeagueID
+
+from common.constants import nba_api_timeout, schedule_cache_path, schedule_cache_ttl_seconds
+from common.fetch_engine import NbaApiError, call_with_retry
+from common.proxy_pool import ProxyPool, call_through_proxy
+from common.singleton_meta import SingletonMeta
+
+
+class ScheduleProvider(metaclass=SingletonMeta):
+    """
+    Cached access to the league schedule of a season.
+    """
+
+    def __init__(self, cache_dir: str = schedule_cache_path,
+                 ttl_seconds: int = schedule_cache_ttl_seconds) -> None:
+        """
+        Args:
+            cache_dir (str): Folder where the raw schedule and its validators are stored.
+            ttl_seconds (int): Age under which the cached schedule is used without any request.
+        """
+        self.cache_dir: str = cache_dir
+        self.ttl_seconds: int = ttl_seconds
+        self._schedules: dict = {}  # season -> DataFrame, for the lifetime of the process
+
+    def _paths(self, season: str) -> tuple[str, str]:
+        base = os.path.join(self.cache_dir, f"schedule_{season}")
+        return f"{base}.json.gz", f"{base}.meta.json"
+
+    def _read_cache(self, season: str) -> tuple[Optional[str], dict]:
+        body_path, meta_path = self._paths(season)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta: dict = json.load(f)
+            with gzip.open(body_path, "rt", encoding="utf-8") as f:
+                return f.read(), meta
+        except (OSError, EOFError, ValueError):
+            return None, {}
+
+    def _write_cache(self, season: str, contents: str, meta: dict) -> None:
+        body_path, meta_path = self._paths(season)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with gzip.open(f"{body_path}.tmp", "wt", encoding="utf-8") as f:
+            f.write(contents)
+        os.replace(f"{body_path}.tmp", body_path)
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @staticmethod
+    def _new_endpoint(season: str) -> scheduleleaguev2.ScheduleLeagueV2:
+        return scheduleleaguev2.ScheduleLeagueV2(league_id=LeagueID.nba, season=season, get_request=False)
+
+    def _conditional_request(self, season: str, meta: dict, proxy: Optional[str]):
+        """
+        Send the ScheduleLeagueV2 request with the cached validators.
+        Returns the requests.Response (status 200 or 304).
+        """
+        endpoint = self._new_endpoint(season)
+        headers: dict = dict(NBAStatsHTTP.headers)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        response = NBAStatsHTTP.get_session().get(
+            url=NBAStatsHTTP.base_url.format(endpoint=endpoint.endpoint),
+            params=sorted(endpoint.parameters.items()),
+            headers=headers,
+            proxies={"http": proxy, "https": proxy} if proxy else None,
+            timeout=nba_api_timeout,
+        )
+        if response.status_code not in (200, 304):
+            raise NbaApiError(f"ScheduleLeagueV2 failed (status={response.status_code})",
+                              status_code=response.status_code)
+        return response
+
+    def _load_raw(self, season: str, proxy_pool: Optional[ProxyPool]) -> str:
+        contents, meta = self._read_cache(season)
+        age = time.time() - meta.get("fetched_at", 0)
+        if contents is not None and age < self.ttl_seconds:
+            print(f"📅 Schedule {season} served from cache (age {age:.0f}s)")
+            return contents
+
+        response = call_with_retry(call_through_proxy, proxy_pool,
+                                   self._conditional_request, season, meta if contents else {})
+        if response.status_code == 304:
+            print(f"📅 Schedule {season} not modified (304), using cache")
+        else:
+            print(f"📅 Schedule {season} downloaded ({len(response.content) / 1e3:.0f} kB)")
+            contents = response.text
+        meta = {
+            "etag": response.headers.get("ETag", meta.get("etag")),
+            "last_modified": response.headers.get("Last-Modified", meta.get("last_modified")),
+            "fetched_at": time.time(),
+        }
+        self._write_cache(season, contents, meta)
+        return contents
+
+    def get_league_schedule(self, season: str, proxy_pool: Optional[ProxyPool] = None) -> pd.DataFrame:
+        """
+        Get the ScheduleLeagueV2 "SeasonGames" DataFrame of a season.
+        Args:
+            season (str): The season in the format "YYYY-YY".
+            proxy_pool (ProxyPool, optional): The proxy pool (None = direct connection).
+        Returns:
+            pd.DataFrame: One row per game, as returned by ScheduleLeagueV2.
+        """
+        if season not in self._schedules:
+            endpoint = self._new_endpoint(season)
+            endpoint.nba_response = NBAStatsResponse(response=self._load_raw(season, proxy_pool),
+                                                     status_code=200, url=None)
+            endpoint.load_response()
+            self._schedules[season] = endpoint.get_data_frames()[0]
+        return self._schedules[season].copy()
+
+    def get_games_schedule(self, season: str, proxy_pool: Optional[ProxyPool] = None) -> pd.DataFrame:
+        """
+        Get the schedule used by the boxscore processes: regular season & playoffs only.
+        Args:
+            season (str): The season in the format "YYYY-YY".
+            proxy_pool (ProxyPool, optional): The proxy pool (None = direct connection).
+        Returns:
+            pd.DataFrame: Processed schedule data
+        """
+        league_df: pd.DataFrame = self.get_league_schedule(season, proxy_pool)
+
+        games_df = pd.DataFrame({
+            "game_id": league_df["gameId"].astype(str),
+            "playoffs_desc": league_df["seriesText"].fillna(""),
+            "game_date": pd.to_datetime(league_df["gameDate"]).dt.strftime("%Y-%m-%d"),
+            "home_team_id": league_df["homeTeam_teamId"],
+            "home_team_tricode": league_df["homeTeam_teamTricode"],
+            "visitor_team_id": league_df["awayTeam_teamId"],
+            "visitor_team_tricode": league_df["awayTeam_teamTricode"],
+            "game_status": league_df["gameStatus"].astype(str),
+            "game_status_text": league_df["gameStatusText"].str.strip(),
+        })
+
+        # Flag if games are in the playoffs
+        games_df['is_playoffs'] = games_df['game_id'].str.startswith('004')
+
+        # Flag if games are in the Regular Season
+        games_df['is_regular_season'] = games_df['game_id'].str.startswith('002')
+
+        # Remove games not in regular season or playoffs
+        games_df = games_df[games_df['is_playoffs'] | games_df['is_regular_season']]
+
+        # Select and order columns
+        return games_df[[
+            "game_id",
+            "is_regular_season",
+            "is_playoffs",
+            "playoffs_desc",
+            "game_date",
+            "home_team_id",
+            "home_team_tricode",
+            "visitor_team_id",
+            "visitor_team_tricode",
+            "game_status",
+            "game_status_text"
+        ]]
@@ -0,0 +1,176 @@
+"""
+This module contains the schema registry of the pipeline tables: one canonical, compact dtype
+per column, applied by common.io_utils on every load and save, whatever the storage backend.
+"""
+import pandas as pd
+
+from common.utils import normalize_game_ids
+
+# Logical column types -> pandas dtype (and BigQuery type)
+GAME_ID: str = "game_id"      # zero padded 10 characters string, e.g. "0022400123"
+ID: str = "id"                # int32 (float64 if the column holds nulls)
+COUNT: str = "count"          # float32 in pandas, INT64 in BigQuery
+STAT: str = "stat"            # float32
+CATEGORY: str = "category"    # pandas categorical (plain strings on disk)
+STRING: str = "string"
+BOOL: str = "bool"
+DATE: str = "date"            # datetime64 in pandas, DATE in BigQuery
+TIMESTAMP: str = "timestamp"
+
+BigQueryTypes: dict = {
+    GAME_ID: "STRING", ID: "INT64", COUNT: "INT64", STAT: "FLOAT64", CATEGORY: "STRING",
+    STRING: "STRING", BOOL: "BOOL", DATE: "DATE", TIMESTAMP: "TIMESTAMP",
+}
+
+_GAME_COLUMNS: dict = {
+    "is_regular_season": BOOL,
+    "is_playoffs": BOOL,
+    "playoffs_desc": CATEGORY,
+    "game_date": DATE,
+    "home_team_id": ID,
+    "visitor_team_id": ID,
+    "game_status_text": CATEGORY,
+    "aud_modification_date": TIMESTAMP,
+}
+
+_PLAYER_GAME_COLUMNS: dict = {
+    "gameId": GAME_ID,
+    "teamId": ID,
+    "teamTricode": CATEGORY,
+    "personId": ID,
+    "playerSlug": CATEGORY,
+    "position": CATEGORY,
+    "minutes": STRING,
+}
+
+BoxscoreColumns: dict = {
+    **_PLAYER_GAME_COLUMNS,
+    "fieldGoalsMade": COUNT,
+    "fieldGoalsAttempted": COUNT,
+    "fieldGoalsPercentage": STAT,
+    "threePointersMade": COUNT,
+    "threePointersAttempted": COUNT,
+    "threePointersPercentage": STAT,
+    "freeThrowsMade": COUNT,
+    "freeThrowsAttempted": COUNT,
+    "freeThrowsPercentage": STAT,
+    "reboundsOffensive": COUNT,
+    "reboundsDefensive": COUNT,
+    "reboundsTotal": COUNT,
+    "assists": COUNT,
+    "steals": COUNT,
+    "blocks": COUNT,
+    "turnovers": COUNT,
+    "foulsPersonal": COUNT,
+    "points": COUNT,
+    **_GAME_COLUMNS,
+}
+
+AdvancedBoxscoreColumns: dict = {
+    **_PLAYER_GAME_COLUMNS,
+    **{column: STAT for column in [
+        "estimatedOffensiveRating", "offensiveRating", "estimatedDefensiveRating", "defensiveRating",
+        "estimatedNetRating", "netRating", "assistPercentage", "assistToTurnover", "assistRatio",
+        "offensiveReboundPercentage", "defensiveReboundPercentage", "reboundPercentage",
+        "turnoverRatio", "effectiveFieldGoalPercentage", "trueShootingPercentage",
+        "usagePercentage", "estimatedUsagePercentage", "estimatedPace", "pace", "pacePer40",
+        "possessions", "PIE"]},
+    **_GAME_COLUMNS,
+}
+
+PlayersColumns: dict = {
+    "person_id": ID,
+    "player_last_name": STRING,
+    "player_first_name": STRING,
+    "player_slug": CATEGORY,
+    "team_id": ID,
+    "team_abbreviation": CATEGORY,
+    "jersey_number": STRING,
+    "position": CATEGORY,
+    "height": CATEGORY,
+    "college": CATEGORY,
+    "country": CATEGORY,
+    "aud_modification_date": TIMESTAMP,
+}
+
+ScheduleColumns: dict = {
+    "seasonYear": CATEGORY,
+    "gameDate": DATE,
+    "gameId": GAME_ID,
+    "gameStatus": ID,
+    "gameStatusText": CATEGORY,
+    "gameDateTimeUTC": TIMESTAMP,
+    "gameLabel": CATEGORY,
+    "gameSubLabel": CATEGORY,
+    "seriesText": CATEGORY,
+    "postponedStatus": CATEGORY,
+    "gameSubtype": CATEGORY,
+    "arenaName": CATEGORY,
+    "arenaState": CATEGORY,
+    "arenaCity": CATEGORY,
+    "homeTeam_teamId": ID,
+    "homeTeam_teamTricode": CATEGORY,
+    "awayTeam_teamId": ID,
+    "awayTeam_teamTricode": CATEGORY,
+    "nationalBroadcasters_broadcasterDisplay": CATEGORY,
+    "aud_modification_date": TIMESTAMP,
+}
+
+PredictionsColumns: dict = {
+    "gameId": GAME_ID,
+    "gameDate": DATE,
+    "teamId": ID,
+    "opponentId": ID,
+    "personId": ID,
+    "fullName": CATEGORY,
+    "predictedPoints": STAT,
+    "aud_modification_date": TIMESTAMP,
+}
+
+
+def _cast(values: pd.Series, column_type: str, categorical: bool) -> pd.Series:
+    if column_type == GAME_ID:
+        return normalize_game_ids(values).where(values.notna())
+    if column_type == ID:
+        values = pd.to_numeric(values, errors="coerce")
+        return values.astype("int32") if values.notna().all() else values.astype("float64")
+    if column_type in (COUNT, STAT):
+        return pd.to_numeric(values, errors="coerce").astype("float32")
+    if column_type == CATEGORY:
+        values = values.astype("object").where(values.notna())
+        return values.astype("category") if categorical else values.astype("str").where(values.notna())
+    if column_type == STRING:
+        return values.astype("object").where(values.notna()).astype("str").where(values.notna())
+    if column_type == BOOL:
+        return values.astype("bool") if values.notna().all() else values
+    if column_type == DATE:
+        return pd.to_datetime(values, format="ISO8601").astype("datetime64[ns]")
+    if column_type == TIMESTAMP:
+        return pd.to_datetime(values, utc=True, format="ISO8601")
+    raise ValueError(f"Unknown column type: {column_type}")
+
+
+def apply_schema(df: pd.DataFrame, columns: dict, categorical: bool = True) -> pd.DataFrame:
+    """
+    Cast the known columns of a DataFrame to their canonical compact dtypes
+    (columns missing from the registry are left untouched).
+    Args:
+        df (pd.DataFrame): The table rows.
+        columns (dict): The registry entry of the table, {column: logical type}.
+        categorical (bool): Use pandas categoricals (loads) or plain strings (saves: every
+            Parquet file / BigQuery load then has the same physical types).
+    Returns:
+        pd.DataFrame: A DataFrame with the canonical dtypes.
+    """
+    df = df.copy()
+    for column, column_type in columns.items():
+        if column in df.columns:
+            df[column] = _cast(df[column], column_type, categorical)
+    return df
+
+
+def bigquery_type(column_type: str) -> str:
+    """
+    The BigQuery type of a logical column type.
+    """
+    return BigQueryTypes[column_type]
@@ -48,4 +48,112 @@ def parse_minutes(val):
         else:
             return float(val)  # already numeric
     except Exception:
-        return 0.0  # fallback if unexpected format
\ No newline at end of file
+        return 0.0  # fallback if unexpected format
+
+# Apply a vectorized parser to the distinct values of a Series only
+def _map_distinct(values: pd.Series, vectorized_parser, parser) -> np.ndarray:
+    """
+    Parse the distinct values at once and broadcast the results with the factorize codes
+    (minutes strings and game ids repeat a lot: a few thousands distinct values per season).
+    vectorized_parser returns the parsed values and a mask of the values it handled; the other
+    (unusual) values go through the scalar parser, so the results are the scalar parser's.
+    The factorize dominates: on 20 seasons the parse of the distinct values is on par with the
+    scalar parser looped over them (scripts/benchmark_feature_utils.py).
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques)
+    parsed, handled = vectorized_parser(uniques)
+    if not handled.all():
+        parsed[~handled] = [parser(value) for value in uniques[~handled]]
+    # The last slot holds the result of a missing value (code -1)
+    return np.append(parsed, parser(np.nan))[codes]
+
+# Digits of the season in a game id: "22400123" (8 characters) or "0022400123"
+def _seasons_of(game_ids: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    extract_season on distinct non-null game ids, with string operations.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The seasons (float64) and the mask of the handled game ids.
+    """
+    kind: str = pd.api.types.infer_dtype(game_ids, skipna=True)
+    if kind not in ("string", "integer", "floating"):
+        return np.full(len(game_ids), np.nan), np.zeros(len(game_ids), dtype=bool)
+    strings = game_ids.astype(str)
+    eight_characters = (strings.str.len() == 8).to_numpy()
+    # Only str game ids have startswith (numbers of another length are not game ids)
+    zero_prefixed = strings.str.startswith("00").to_numpy() & (kind == "string")
+    digits = pd.Series(np.where(eight_characters, strings.str.slice(1, 3),
+                                np.where(zero_prefixed, strings.str.slice(3, 5), "")))
+    is_number = digits.str.fullmatch(r"[0-9]+").to_numpy()
+    seasons = np.where(is_number, pd.to_numeric(digits.where(is_number, "0")) + 2000, np.nan).astype("float64")
+    handled = is_number | ~(eight_characters | zero_prefixed)
+    return seasons, handled
+
+# Minutes of distinct values with string operations
+def _minutes_of(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    parse_minutes on distinct non-null values: numbers, '' and the 'MM:SS' strings returned by
+    the NBA API are handled here ('H:MM:SS' and unusual strings are left to parse_minutes).
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The minutes (float64) and the mask of the handled values.
+    """
+    kind: str = pd.api.types.infer_dtype(values, skipna=True)
+    if kind in ("integer", "floating"):
+        return values.astype("float64").to_numpy(), np.ones(len(values), dtype=bool)
+    minutes: np.ndarray = np.zeros(len(values))
+    if kind != "string":
+        return minutes, np.zeros(len(values), dtype=bool)
+    is_clock: np.ndarray = values.str.fullmatch(r"[0-9]+:[0-9]+").to_numpy()
+    if is_clock.any():
+        clock = values[is_clock].str.split(":", n=1, expand=True).astype("float64")
+        minutes[is_clock] = clock[0].to_numpy() + clock[1].to_numpy() / 60
+    return minutes, is_clock | (values == "").to_numpy()
+
+# Vectorized extract_season over a whole Series of game ids
+def extract_season_series(game_ids: pd.Series) -> pd.Series:
+    """
+    Extract the season year of every game_id (same rules as extract_season, on whole arrays).
+    Args:
+        game_ids (pd.Series): The game IDs (str or int).
+        Returns:
+            pd.Series: The season years (int64, float64 with NaN if a game_id is invalid).
+    """
+    seasons = pd.Series(_map_distinct(game_ids, _seasons_of, extract_season), index=game_ids.index)
+    return seasons.astype("int64") if seasons.notna().all() else seasons
+
+# Vectorized parse_minutes over a whole Series
+def parse_minutes_series(values: pd.Series) -> pd.Series:
+    """
+    Convert a Series of 'MM:SS' / 'H:MM:SS' strings (or numbers) to minutes (same rules as
+    parse_minutes: missing or unparsable values are 0.0).
+    Args:
+        values (pd.Series): The minutes strings or numeric values.
+        Returns:
+            pd.Series: The total minutes as floats.
+    """
+    return pd.Series(_map_distinct(values, _minutes_of, parse_minutes), index=values.index)
+
+# Position -> position group (G / F / C) lookup table
+PositionGroups: dict = {"G": "G", "G-F": "G", "F": "F", "F-G": "F", "F-C": "F", "C": "C", "C-F": "C"}
+
+# Vectorized position grouping
+def position_group_series(positions: pd.Series) -> pd.Series:
+    """
+    Map NBA positions to their group ('G-F' -> 'G', 'F-C' -> 'F', ...) with the PositionGroups table.
+    Args:
+        positions (pd.Series): The positions.
+        Returns:
+            pd.Series: The position groups (NaN for other values).
+    """
+    return positions.astype(object).map(PositionGroups)
+
+# Function to normalize game ids to their 10 characters string form
+def normalize_game_ids(game_ids: pd.Series) -> pd.Series:
+    """
+    Return game IDs as 10 characters strings (CSV round trips drop the leading zeros).
+    Args:
+        game_ids (pd.Series): The game IDs (str or int).
+        Returns:
+            pd.Series: The zero padded game IDs.
+    """
+    return game_ids.astype(str).str.split(".").str[0].str.zfill(10)
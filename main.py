@@ -10,7 +10,9 @@ from src.get_nba_teams import NbaTeamsData
 from src.get_nba_schedule import ScheduleData
 from src.get_nba_advanced_boxscore import AdvancedBoxscoreGames
 from src.get_predictions_stats_points import PredictionsStatsPoints 
+from src.update_player_feature_state import PlayerFeatureState
 from common.parser import build_parser
+from common.io_utils import compact_local_tables
 
 
 def main():
@@ -18,14 +20,24 @@ def main():
 
     parser:argparse.ArgumentParser = argparse.ArgumentParser(description="NBA Stats Data Pipeline")
 
-    process_name, current_season,save_mode,season_type, date, model_path = build_parser(parser)
+    (process_name, current_season, save_mode, season_type, date, model_path, rebuild, prefetch,
+     native_model, feature_state, lookback_games, lookback_days, history_seasons) = build_parser(parser)
+
+    # Start the I/O of the predictions (model download, table reads) while the process is set up
+    if prefetch and process_name.strip() == "get_predictions_stats_points":
+        PredictionsStatsPoints(save_mode=save_mode, date=date, model_path=model_path,
+                               native_model=native_model, feature_state=feature_state,
+                               lookback_games=lookback_games, lookback_days=lookback_days,
+                               history_seasons=history_seasons).start_loading()
 
     valid_processes: list[str] = ["get_nba_players",
                                   "get_nba_teams", 
                                   "get_nba_schedule",
                                   "get_nba_boxscore_basic",  
                                   "get_nba_advanced_boxscore",
-                                  "get_predictions_stats_points"]
+                                  "get_predictions_stats_points",
+                                  "update_player_feature_state",
+                                  "compact_local_databases"]
     
     # Debugging: Print received process_name and valid processes
     print(f"Received process_name: {process_name}")
@@ -57,7 +69,8 @@ def main():
         BoxscoreGames(  current_season, 
                         save_mode=save_mode,
                         proxy_user=os.getenv("NBA_PROXY_USER"),  
-                        proxy_pass=os.getenv("NBA_PROXY_PASS")
+                        proxy_pass=os.getenv("NBA_PROXY_PASS"),
+                        rebuild=rebuild
                         ).run()
     elif process_name == "get_nba_schedule":
         print(f"Running process: {process_name} with season: {current_season}")
@@ -72,12 +85,24 @@ def main():
         AdvancedBoxscoreGames(  current_season, 
                                 save_mode=save_mode,
                                 proxy_user=os.getenv("NBA_PROXY_USER"),  
-                                proxy_pass=os.getenv("NBA_PROXY_PASS") 
+                                proxy_pass=os.getenv("NBA_PROXY_PASS"),
+                                rebuild=rebuild
                                 ).run()
 
     elif process_name == "get_predictions_stats_points":
         print(f"Running process: {process_name} with date: {date} and model path:{model_path}")
-        PredictionsStatsPoints( save_mode=save_mode,date=date,model_path=model_path).run()
+        PredictionsStatsPoints( save_mode=save_mode,date=date,model_path=model_path,
+                                native_model=native_model, feature_state=feature_state,
+                                lookback_games=lookback_games, lookback_days=lookback_days,
+                                history_seasons=history_seasons).run()
+
+    elif process_name == "update_player_feature_state":
+        print(f"Running process: {process_name}")
+        PlayerFeatureState(save_mode=save_mode, rebuild=rebuild).run()
+
+    elif process_name == "compact_local_databases":
+        print(f"Running process: {process_name}")
+        compact_local_tables()
         
     # print the time taken to run the process    
     print(f"Process {process_name} completed in {datetime.today() - time_start}.")
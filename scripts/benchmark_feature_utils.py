@@ -0,0 +1,105 @@
+"""
+Benchmark the vectorized feature helpers of common/utils.py against the row-wise applies they
+replace, and the season / minutes parsers against the scalar parser applied once per distinct
+value, on synthetic multi-season boxscore rows (the results are checked to be equal).
+
+    python scripts/benchmark_feature_utils.py --seasons 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.utils import (extract_season, parse_minutes, extract_season_series,  # noqa: E402
+                          parse_minutes_series, position_group_series)
+
+# A regular season: 1230 games x ~26 players
+ROWS_PER_SEASON: int = 1230 * 26
+
+
+def build_rows(seasons: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic boxscore rows with the columns used by the helpers (DNPs, bench players,
+    unknown player positions included).
+    """
+    rng = np.random.default_rng(seed)
+    n: int = seasons * ROWS_PER_SEASON
+    season = 2024 - rng.integers(0, seasons, n)
+    minutes = pd.Series([f"{m}:{s:02d}" for m, s in zip(rng.integers(0, 48, n), rng.integers(0, 60, n))],
+                        dtype=object)
+    minutes[rng.random(n) < 0.1] = None
+    positions = np.array(["G", "F", "C", "bench"], dtype=object)
+    player_positions = np.array(["G", "G-F", "F", "F-G", "F-C", "C", "C-F", None], dtype=object)
+    return pd.DataFrame({
+        "gameId": [f"002{s % 100:02d}{g:05d}" for s, g in zip(season, rng.integers(1, 1231, n))],
+        "minutes": minutes,
+        "position": positions[rng.integers(0, len(positions), n)],
+        "position_player": player_positions[rng.integers(0, len(player_positions), n)],
+    })
+
+
+def row_wise_position_group(df: pd.DataFrame) -> pd.Series:
+    return df.apply(
+        lambda x: 'G' if x['position'] in ('G', 'bench') and x['position_player'] in ('G', 'G-F') else
+                  'F' if x['position'] in ('F', 'bench') and x['position_player'] in ('F', 'F-G', 'F-C') else
+                  'C' if x['position'] in ('C', 'bench') and x['position_player'] in ('C', 'C-F') else x['position'],
+        axis=1
+    )
+
+
+def vectorized_position_group(df: pd.DataFrame) -> pd.Series:
+    player_group = position_group_series(df['position_player'])
+    matches_player = player_group.notna() & ((df['position'] == player_group) | (df['position'] == 'bench'))
+    return player_group.where(matches_player, df['position'])
+
+
+def distinct_scalar(values: pd.Series, parser) -> pd.Series:
+    """
+    The scalar parser applied once per distinct value (factorize + Python loop).
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = np.array([parser(value) for value in uniques] + [parser(np.nan)], dtype="float64")
+    return pd.Series(parsed[codes], index=values.index)
+
+
+def timed(function, *args) -> tuple:
+    start: float = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized feature helpers")
+    parser.add_argument("--seasons", type=int, default=5, help="Number of seasons of synthetic rows")
+    args = parser.parse_args()
+
+    df: pd.DataFrame = build_rows(args.seasons)
+    print(f"📊 {len(df):,} rows ({args.seasons} seasons)")
+
+    benchmarks = [
+        ("parse_minutes", lambda: df['minutes'].apply(parse_minutes),
+         lambda: distinct_scalar(df['minutes'], parse_minutes), lambda: parse_minutes_series(df['minutes'])),
+        ("extract_season", lambda: df['gameId'].apply(extract_season),
+         lambda: distinct_scalar(df['gameId'], extract_season), lambda: extract_season_series(df['gameId'])),
+        ("position_group", lambda: row_wise_position_group(df), None, lambda: vectorized_position_group(df)),
+    ]
+    for name, row_wise, per_distinct, vectorized in benchmarks:
+        expected, row_wise_seconds = timed(row_wise)
+        result, vectorized_seconds = timed(vectorized)
+        pd.testing.assert_series_equal(result, expected, check_dtype=False, check_names=False)
+        message: str = f"⏱️ {name}: row-wise {row_wise_seconds:.2f}s"
+        if per_distinct is not None:
+            distinct_result, distinct_seconds = timed(per_distinct)
+            pd.testing.assert_series_equal(distinct_result, expected, check_dtype=False, check_names=False)
+            message += f", scalar per distinct value {distinct_seconds:.3f}s"
+        print(f"{message}, vectorized {vectorized_seconds:.3f}s "
+              f"(x{row_wise_seconds / vectorized_seconds:.0f}, same results)")
+
+
+if __name__ == "__main__":
+    main()
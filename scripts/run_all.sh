@@ -12,7 +12,9 @@ set -euo pipefail
 # Optional proxy creds (exported if present)
 : "${NBA_PROXY_USER:=}"
 : "${NBA_PROXY_PASS:=}"
-export NBA_PROXY_USER NBA_PROXY_PASS PYTHONUNBUFFERED=1
+: "${NBA_PROXY_ENDPOINTS:=}"              # comma separated host:port list (default gate.decodo.com:10001)
+: "${NBA_BQ_MIRROR_DIR:=}"                # local mirror of the BigQuery tables (empty = disabled)
+export NBA_PROXY_USER NBA_PROXY_PASS NBA_PROXY_ENDPOINTS NBA_BQ_MIRROR_DIR PYTHONUNBUFFERED=1
 
 # ---- helpers ----
 ts() { date -u +"%Y-%m-%dT%H:%M:%SZ"; }
@@ -54,8 +56,19 @@ log "➡️ Running get_nba_advanced_boxscore..."
 python main.py -p get_nba_advanced_boxscore -s "$SEASON" -st "$SEASON_TYPE" -sm "$SAVE_MODE"
 log "✅ Finished get_nba_advanced_boxscore"
 
+log "➡️ Running update_player_feature_state..."
+python main.py -p update_player_feature_state -sm "$SAVE_MODE"
+log "✅ Finished update_player_feature_state"
+
 log "➡️ Running get_predictions_stats_points..."
-python main.py -p get_predictions_stats_points -sm "$SAVE_MODE" -d "$DATE" -m "$MODEL_PATH"
+python main.py -p get_predictions_stats_points -sm "$SAVE_MODE" -d "$DATE" -m "$MODEL_PATH" --prefetch --feature_state
 log "✅ Finished get_predictions_stats_points"
 
+# Weekly compaction of the small files written by the daily local appends
+if [[ "$SAVE_MODE" == "local" && "$(date -u +%u)" == "1" ]]; then
+  log "➡️ Running compact_local_databases..."
+  python main.py -p compact_local_databases -sm "$SAVE_MODE"
+  log "✅ Finished compact_local_databases"
+fi
+
 log "✅ All processes completed.✅"
\ No newline at end of file
@@ -1,71 +1,459 @@
 import datetime
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
 import pandas as pd
 import numpy as np 
 
 from sklearn.preprocessing import OneHotEncoder
 
+from common import schemas
+from common.duckdb_store import DuckDBStore, filters_to_where
 from common.singleton_meta import SingletonMeta
 from common.io_utils import (BoxscoreFileName, AdvancedBoxscoreFileName, 
                           PlayersFileName, ScheduleFileName,
-                          PredictionsFileName, save_database,
-                          load_model_artifact)
-from common.utils import extract_season, parse_minutes
+                          PredictionsFileName, PlayerFeaturesFileName,
+                          PlayerFeatureStateFileName, OpponentPositionStatsFileName, save_database,
+                          load_data, load_distinct_values, load_last_rows, load_model_artifact)
+from common.rolling import grouped_rolling_mean, opponent_position_averages
+from common.utils import extract_season_series, parse_minutes_series, position_group_series
 
 class PredictionsStatsPoints(metaclass = SingletonMeta):
     """
     A class to fetch and update NBA player statistics for points predictions.
     """
 
-    def __init__(self, save_mode: str,  date: datetime.date, model_path: str) -> None:
+    # Per-game stats rolled over the last games of each player (per 36 minutes and per possession)
+    rolling_stats: list[str] = [
+        'usagePercentage',
+        'trueShootingPercentage',
+        'effectiveFieldGoalPercentage',
+        'offensiveRating',
+        'freeThrowsMade',
+        'threePointersMade',
+        'fieldGoalsMade',
+    ]
+    # Average points allowed by the opponent to the position group of the player
+    opponent_position_stats: list[str] = [
+        'avg_pts_opp_position_all',
+        'avg_pts_opp_position_last_10',
+        'avg_pts_opp_position_last_20'
+    ]
+    # Rolling windows, in games
+    rolling_periods: list[int] = [5, 10, 20]
+    # Columns read from each table (everything the features and the output need)
+    boxscore_columns: list[str] = [
+        'gameId', 'teamId', 'personId', 'position', 'minutes',
+        'fieldGoalsMade', 'threePointersMade', 'freeThrowsMade', 'points',
+        'game_date', 'home_team_id', 'visitor_team_id'
+    ]
+    advanced_boxscore_columns: list[str] = [
+        'gameId', 'teamId', 'personId', 'minutes',
+        'usagePercentage', 'trueShootingPercentage', 'effectiveFieldGoalPercentage',
+        'offensiveRating', 'possessions'
+    ]
+    players_columns: list[str] = ['person_id', 'player_slug', 'team_id', 'position', 'height', 'weight']
+    # Boxscore columns of the opponent position averages
+    opponent_position_columns: list[str] = [
+        'gameId', 'teamId', 'personId', 'position', 'minutes', 'points',
+        'game_date', 'home_team_id', 'visitor_team_id'
+    ]
+
+    def __init__(self, save_mode: str,  date: datetime.date, model_path: str,
+                 history_seasons: Optional[int] = None, native_model: bool = False,
+                 feature_state: bool = False, lookback_games: Optional[int] = None,
+                 lookback_days: Optional[int] = None) -> None:
         """
         Initialize the NBA player statistics data object.
             Args:
                 date (datetime.date): The date to start fetching stats from. Format: YYYY-MM-DD.
                 days_number (int): The number of days to fetch stats for.
-                save_mode (str): The mode to save data, either 'local' or 'bq' (google bigquery). 
+                save_mode (str): The mode to save data, either 'local', 'duckdb' or 'bq' (google bigquery). 
+                    With 'duckdb' the historical joins and the opponent position aggregates run in DuckDB.
+                model_path (str): The model path (local or gs://).
+                history_seasons (int, optional): Only load the boxscores of the last N seasons
+                    (default: all seasons, as the model was trained on).
+                native_model (bool): Load the model from its cached native LightGBM format.
+                feature_state (bool): Read the latest features of each player from the player feature
+                    state (see src/update_player_feature_state.py) instead of the full history.
+                lookback_games (int, optional): Only load the last N played games of each player
+                    (at least the largest rolling period: the features are the full history ones).
+                lookback_days (int, optional): Only load the games of the last N days before date
+                    (the window of a player goes back further when needed to cover the largest
+                    rolling period: the features are the full history ones).
         """
         self.date: datetime.date = datetime.datetime.strptime(date, "%Y-%m-%d").date()
         self.model_path: str = model_path
         self.SAVE_MODE: str = save_mode
-        self.keys_points_stats : list[str] = [
-            'usagePercentage',
-            'trueShootingPercentage',
-            'effectiveFieldGoalPercentage',
-            'offensiveRating',
-            'freeThrowsMade',
-            'threePointersMade',
-            'fieldGoalsMade',
-            'avg_pts_opp_position_all',
-            'avg_pts_opp_position_last_10',
-            'avg_pts_opp_position_last_20'
-        ]
-    
+        self.history_seasons: Optional[int] = history_seasons
+        self.native_model: bool = native_model
+        self.feature_state: bool = feature_state
+        if lookback_games is not None and lookback_games < max(self.rolling_periods):
+            raise ValueError(f"lookback_games must be at least {max(self.rolling_periods)} "
+                             f"(the largest rolling period), got {lookback_games}")
+        self.lookback_games: Optional[int] = lookback_games
+        self.lookback_days: Optional[int] = lookback_days
+        self.keys_points_stats : list[str] = self.rolling_stats + self.opponent_position_stats
+        self.schedule_columns: list[str] = ['gameId', 'gameDate', 'homeTeam_teamId', 'awayTeam_teamId']
+        # Inputs being loaded in the background (see start_loading)
+        self._input_futures: dict[str, Future] = {}
+        self._loading_started: Optional[float] = None
+
+    def _history_filters(self) -> list:
+        """
+        The filters of the boxscore rows (history_seasons: the last N seasons, partition pruning).
+        """
+        history_filters: list = []
+        if self.history_seasons:
+            # A season starts in July (e.g. 2024 = 2024-25)
+            current_season: int = self.date.year if self.date.month >= 7 else self.date.year - 1
+            history_filters.append(("season", ">=", current_season - self.history_seasons + 1))
+        return history_filters
+
+    def _lookback(self) -> tuple[Optional[int], Optional[str]]:
+        """
+        The games loaded for each player with a lookback: the last N played games (lookback_games,
+        at least the largest rolling period) plus every game since the first day of lookback_days.
+        Returns:
+            tuple: The number of last games (None without a lookback) and the first day (YYYY-MM-DD or None).
+        """
+        if not (self.lookback_games or self.lookback_days):
+            return None, None
+        first_day: Optional[str] = None
+        if self.lookback_days:
+            first_day = (self.date - datetime.timedelta(days=self.lookback_days)).strftime("%Y-%m-%d")
+        return self.lookback_games or max(self.rolling_periods), first_day
+
+    def _table_loaders(self) -> dict[str, Callable[[], pd.DataFrame]]:
+        """
+        The tables needed for predictions that do not depend on the slate, {data_map key: loader}:
+        the players, the schedule, the opponent position aggregates of the whole league and the
+        seasons of the history (the one-hot categories, the history itself is only loaded for the
+        players of the slate, see _slate_loaders).
+        Only the columns used by the features are read (and, with history_seasons, only the
+        last seasons of boxscores); the filters are pushed down to Parquet / BigQuery.
+        In DuckDB mode the opponent position aggregates are computed by DuckDB.
+        With feature_state they are read from the defense table of the player feature state
+        (full history: history_seasons does not apply), with a lookback see load_opponent_position_stats.
+        """
+        history_filters: list = self._history_filters()
+        loaders: dict = {
+            "players": lambda: load_data(PlayersFileName, mode=self.SAVE_MODE, columns=self.players_columns),
+            "schedule": lambda: load_data(ScheduleFileName, mode=self.SAVE_MODE, columns=self.schedule_columns),
+        }
+        if self.SAVE_MODE == "duckdb" and not self.feature_state:
+            loaders["opponent_position_stats"] = lambda: self.query_opponent_position_stats(history_filters)
+        elif self.feature_state:
+            loaders["opponent_position_stats"] = lambda: load_data(OpponentPositionStatsFileName,
+                                                                   mode=self.SAVE_MODE)
+        elif self.lookback_games or self.lookback_days:
+            loaders["opponent_position_stats"] = lambda: self.load_opponent_position_stats(history_filters)
+        else:
+            loaders["opponent_position_stats"] = lambda: self.compute_opponent_position_stats(history_filters)
+
+        if self.feature_state:
+            loaders["player_feature_state"] = lambda: load_data(PlayerFeatureStateFileName, mode=self.SAVE_MODE)
+        else:
+            loaders["seasons"] = lambda: self.load_seasons(history_filters)
+        return loaders
+
+    def _slate_loaders(self, player_ids: list) -> dict[str, Callable[[], pd.DataFrame]]:
+        """
+        The history of the players of the slate only, {data_map key: loader}
+        (the personId filter is pushed down with the others).
+        In DuckDB mode the boxscores are not loaded: the joined historical stats are computed by
+        DuckDB and loaded instead. With feature_state the latest features of the players are read
+        from the player feature state. With lookback_games / lookback_days only their recent games
+        are loaded (see _lookback).
+        Args:
+            player_ids (list): The personIds of the players of the slate.
+        """
+        filters: list = self._history_filters() + [("personId", "in", player_ids)]
+        if self.feature_state:
+            return {"player_features": lambda: load_data(PlayerFeaturesFileName, mode=self.SAVE_MODE,
+                                                         filters=[("personId", "in", player_ids)])}
+        if self.SAVE_MODE == "duckdb":
+            return {"historical_stats": lambda: self.query_historical_stats(filters)}
+        if self.lookback_games or self.lookback_days:
+            return {"recent_boxscores": lambda: self.load_recent_boxscores(filters)}
+        return {
+            "simple_boxscore": lambda: load_data(BoxscoreFileName, mode=self.SAVE_MODE,
+                                                 columns=self.boxscore_columns, filters=filters),
+            "advanced_boxscore": lambda: load_data(AdvancedBoxscoreFileName, mode=self.SAVE_MODE,
+                                                   columns=self.advanced_boxscore_columns, filters=filters),
+        }
+
+    def load_slate_history(self, players_future: Future, schedule_future: Future) -> dict:
+        """
+        Wait for the players and the schedule, compute the slate (the players scheduled on date),
+        then load the history of these players only (concurrently).
+        Args:
+            players_future (Future): The players table being loaded.
+            schedule_future (Future): The schedule being loaded.
+        Returns:
+            dict: The tables of _slate_loaders (empty without games on date).
+        """
+        schedule_df: pd.DataFrame = schedule_future.result().copy()
+        if not (pd.to_datetime(schedule_df["gameDate"]).dt.date == self.date).any():
+            return {}  # get_future_games_players ends the process
+        slate_df: pd.DataFrame = self.get_future_games_players({"schedule": schedule_df,
+                                                                "players": players_future.result()})
+        player_ids: list = sorted(int(person_id) for person_id in slate_df['person_id'].dropna().unique())
+        print(f"🎯 Slate of {self.date}: {slate_df['gameId'].nunique()} game(s), {len(player_ids)} player(s)\n", end="")
+        return self._collect(self._submit(self._slate_loaders(player_ids)), time.perf_counter())
+
+    def load_opponent_position_stats(self, filters: list) -> pd.DataFrame:
+        """
+        The opponent position aggregates of the whole league: the defense table of the player feature
+        state when it covers the same history (no history_seasons) and exists, computed from the
+        boxscores otherwise.
+        Args:
+            filters (list): The filters of the boxscore rows (e.g. last seasons).
+        Returns:
+            pd.DataFrame: One row per (position_group, opponent).
+        """
+        if not self.history_seasons:
+            opponent_position_df: pd.DataFrame = load_data(OpponentPositionStatsFileName, mode=self.SAVE_MODE)
+            if not opponent_position_df.empty:
+                return opponent_position_df
+            print("ℹ️ No opponent position defense table (run update_player_feature_state to build it): "
+                  "computing the aggregates from the boxscores.")
+        return self.compute_opponent_position_stats(filters)
+
+    def compute_opponent_position_stats(self, filters: list) -> pd.DataFrame:
+        """
+        Compute the opponent position aggregates of the whole league from the boxscores
+        (only the columns they need are read).
+        Args:
+            filters (list): The filters of the boxscore rows (e.g. last seasons).
+        Returns:
+            pd.DataFrame: One row per (position_group, opponent).
+        """
+        boxscore_df: pd.DataFrame = load_data(BoxscoreFileName, mode=self.SAVE_MODE,
+                                              columns=self.opponent_position_columns, filters=filters)
+        players_df: pd.DataFrame = load_data(PlayersFileName, mode=self.SAVE_MODE, columns=['person_id', 'position'])
+        if boxscore_df.empty:
+            return boxscore_df
+        # The played rows with the player position, as in join_historical_stats
+        played_df: pd.DataFrame = boxscore_df[boxscore_df['minutes'].notna()].merge(
+            players_df.rename(columns={'position': 'position_player'}),
+            left_on='personId', right_on='person_id', how='left')
+        return opponent_position_averages(self.prepare_rows(played_df), value_column='points', windows=(10, 20))
+
+    def load_recent_boxscores(self, filters: list) -> dict:
+        """
+        Load the recent played games of each player (see _lookback; window query on BigQuery / DuckDB,
+        partition pruning locally) and the advanced boxscores of these games only.
+        Args:
+            filters (list): The filters of the boxscore rows.
+        Returns:
+            dict: The simple_boxscore and advanced_boxscore DataFrames.
+        """
+        last_games, first_day = self._lookback()
+        boxscore_df: pd.DataFrame = load_last_rows(BoxscoreFileName, mode=self.SAVE_MODE, limit=last_games,
+                                                   columns=self.boxscore_columns, not_null_column='minutes',
+                                                   filters=filters, since=first_day)
+        if boxscore_df.empty:
+            return {"simple_boxscore": boxscore_df, "advanced_boxscore": pd.DataFrame()}
+        first_day: str = pd.Timestamp(boxscore_df['game_date'].min()).strftime("%Y-%m-%d")
+        advanced_boxscore_df: pd.DataFrame = load_data(
+            AdvancedBoxscoreFileName, mode=self.SAVE_MODE, columns=self.advanced_boxscore_columns,
+            filters=filters + [("game_date", ">=", first_day),
+                               ("gameId", "in", boxscore_df['gameId'].astype(str).unique().tolist())])
+        return {"simple_boxscore": boxscore_df, "advanced_boxscore": advanced_boxscore_df}
+
+    def load_seasons(self, filters: list) -> pd.DataFrame:
+        """
+        The seasons of the whole history (the one-hot categories of the season), from the distinct gameIds.
+        """
+        game_ids: pd.Series = load_distinct_values(BoxscoreFileName, "gameId", mode=self.SAVE_MODE, filters=filters)
+        seasons: pd.Series = extract_season_series(game_ids).dropna().astype(int)
+        return pd.DataFrame({"season": sorted(seasons.unique())})
+
+    @staticmethod
+    def _timed(name: str, loader: Callable):
+        start: float = time.perf_counter()
+        result = loader()
+        frames: list = list(result.values()) if isinstance(result, dict) else [result]
+        rows: str = (f" ({sum(len(frame) for frame in frames):,} rows)"
+                     if all(isinstance(frame, pd.DataFrame) for frame in frames) else "")
+        # A single write per line: the loaders print from several threads
+        print(f"⏱️ Loaded {name} in {time.perf_counter() - start:.2f}s{rows}\n", end="")
+        return result
+
+    def _submit(self, loaders: dict) -> dict[str, Future]:
+        executor = ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="predictions-input")
+        futures: dict = {name: executor.submit(self._timed, name, loader) for name, loader in loaders.items()}
+        executor.shutdown(wait=False)  # the threads finish on their own, results are read from the futures
+        return futures
+
+    def _submit_inputs(self, loaders: dict) -> dict[str, Future]:
+        """
+        Submit the loaders, then the history of the slate as soon as the players and the schedule are loaded.
+        """
+        futures: dict = self._submit(loaders)
+        futures.update(self._submit({
+            "slate_history": lambda: self.load_slate_history(futures["players"], futures["schedule"])}))
+        return futures
+
+    @staticmethod
+    def _collect(futures: dict[str, Future], started: float) -> dict:
+        """
+        Wait for every input and raise one error naming all the inputs that failed or came back empty.
+        """
+        results: dict = {}
+        errors: list[str] = []
+        for name, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(f"{name} ({type(e).__name__}: {e})")
+                continue
+            # A loader may return several tables
+            for key, value in (result.items() if isinstance(result, dict) else [(name, result)]):
+                if isinstance(value, pd.DataFrame) and value.empty:
+                    errors.append(f"{key} (no rows)")
+                results[key] = value
+        if errors:
+            raise RuntimeError(f"Failed to load the prediction input(s): {'; '.join(errors)}")
+        print(f"✅ Loaded {len(results)} input(s) in {time.perf_counter() - started:.2f}s")
+        return results
+
+    def start_loading(self) -> None:
+        """
+        Start loading the model and the tables concurrently in the background (they are
+        independent I/O), so that run() only waits for the slowest of them.
+        Calling it again before run() collected the inputs does nothing.
+        """
+        if self._input_futures:
+            return
+        self._loading_started = time.perf_counter()
+        self._input_futures = self._submit_inputs({
+            "model": lambda: load_model_artifact(self.model_path, mode=self.SAVE_MODE,
+                                                native=self.native_model),
+            **self._table_loaders(),
+        })
+
+    def load_inputs(self) -> tuple:
+        """
+        Wait for the inputs started by start_loading (started now if needed).
+        Returns:
+            tuple: The model and the data map of the loaded tables.
+        """
+        self.start_loading()
+        futures, self._input_futures = self._input_futures, {}
+        data_map: dict = self._collect(futures, self._loading_started)
+        model = data_map.pop("model")
+        return model, data_map
+
     def load_data(self) -> dict: 
         """
-        Load the necessary data for predictions.
-        This method should be implemented to fetch the required data.
-        """
-        if self.SAVE_MODE == "local":
-            boxscore_df = pd.read_csv(f"databases/{BoxscoreFileName}.csv", low_memory=False)
-            advanced_boxscore_df = pd.read_csv(f"databases/{AdvancedBoxscoreFileName}.csv", low_memory=False)
-            players_df = pd.read_csv(f"databases/{PlayersFileName}.csv")
-            scheduled_df = pd.read_csv(f"databases/{ScheduleFileName}.csv") 
-
-            return {"simple_boxscore" : boxscore_df,
-                    "advanced_boxscore" : advanced_boxscore_df,
-                    "players" : players_df,
-                    "schedule" : scheduled_df}
-        elif self.SAVE_MODE == "bq":
-            from common.io_utils import load_data
-            boxscore_df = load_data(BoxscoreFileName, mode=self.SAVE_MODE)
-            advanced_boxscore_df = load_data(AdvancedBoxscoreFileName, mode=self.SAVE_MODE)
-            players_df = load_data(PlayersFileName, mode=self.SAVE_MODE)
-            schedule_df = load_data(ScheduleFileName, mode=self.SAVE_MODE)
-
-            return {"simple_boxscore" : boxscore_df,
-                    "advanced_boxscore" : advanced_boxscore_df,
-                    "players" : players_df,
-                    "schedule" : schedule_df}
+        Load the necessary data for predictions (the tables are loaded concurrently).
+        """
+        return self._collect(self._submit_inputs(self._table_loaders()), time.perf_counter())
+
+    def _played_games_sql(self, history_filters: list, columns: list, last_games: Optional[int] = None,
+                          first_day: Optional[str] = None) -> tuple[str, list]:
+        """
+        SQL of the played boxscore rows (minutes not null) joined with the player metadata,
+        the same rows as get_historical_stats, in the order of the stored table.
+        Args:
+            history_filters (list): The filters of the boxscore rows.
+            columns (list): The boxscore columns to select.
+            last_games (int, optional): Only the last N played games of each player.
+            first_day (str, optional): With last_games, also every game since this day (YYYY-MM-DD).
+        Returns:
+            tuple[str, list]: The query and its parameters.
+        """
+        store = DuckDBStore()
+        players_columns: list = [c for c in ('height', 'weight') if c in (store.table_columns(PlayersFileName) or [])]
+        where, params = filters_to_where(history_filters)
+        sql = f"""
+            SELECT {', '.join(f'b."{c}"' for c in columns)},
+                   {''.join(f'p."{c}", ' for c in players_columns)}p.position AS position_player,
+                   b.row_order
+            FROM (SELECT *, rowid AS row_order FROM "{BoxscoreFileName}" {f"WHERE {where}" if where else ""}) b
+            LEFT JOIN "{PlayersFileName}" p ON p.person_id = b.personId
+            WHERE b.minutes IS NOT NULL
+            {f"QUALIFY ROW_NUMBER() OVER (PARTITION BY b.personId ORDER BY b.game_date DESC) <= {int(last_games)}"
+             if last_games else ""}
+            {f"OR b.game_date >= '{first_day}'" if last_games and first_day else ""}
+        """
+        return sql, params
+
+    def query_historical_stats(self, history_filters: list) -> pd.DataFrame:
+        """
+        Join the boxscores, the player metadata and the advanced boxscores in DuckDB
+        (the result of get_historical_stats, computed by the database).
+        Args:
+            history_filters (list): The filters of the boxscore rows (e.g. last seasons).
+        Returns:
+            pd.DataFrame: The historical stats, in table order (the rolling features depend on it).
+        """
+        store = DuckDBStore()
+        last_games, first_day = self._lookback()
+        played_sql, params = self._played_games_sql(history_filters, self.boxscore_columns,
+                                                    last_games=last_games, first_day=first_day)
+        merge_keys = ['gameId', 'personId', 'teamId']
+        adv_new_cols = [col for col in self.advanced_boxscore_columns if col not in self.boxscore_columns]
+        where, adv_params = filters_to_where(history_filters)
+        historical_stats_df: pd.DataFrame = store.query(f"""
+            SELECT h.* EXCLUDE (row_order), {', '.join(f'a."{c}"' for c in adv_new_cols)}
+            FROM ({played_sql}) h
+            LEFT JOIN (
+                SELECT {', '.join(f'"{c}"' for c in merge_keys + adv_new_cols)}
+                FROM "{AdvancedBoxscoreFileName}"
+                WHERE minutes IS NOT NULL {f"AND {where}" if where else ""}
+            ) a USING ({', '.join(merge_keys)})
+            -- Same row order as the partitioned local tables (by game date, then as stored)
+            ORDER BY h.game_date NULLS LAST, h.row_order
+        """, params + adv_params)
+        print(f"✅ Loaded {len(historical_stats_df):,} historical rows from DuckDB")
+        return schemas.apply_schema(historical_stats_df,
+                                    {**schemas.AdvancedBoxscoreColumns, **schemas.BoxscoreColumns})
+
+    def query_opponent_position_stats(self, history_filters: list) -> pd.DataFrame:
+        """
+        Compute the average points allowed by each opponent to each position group in DuckDB
+        (all games, last 10 and last 20 game dates), as prepare_data_model does in pandas.
+        Args:
+            history_filters (list): The filters of the boxscore rows (e.g. last seasons).
+        Returns:
+            pd.DataFrame: One row per (position_group, opponent).
+        """
+        played_sql, params = self._played_games_sql(
+            history_filters, ['teamId', 'position', 'points', 'game_date', 'home_team_id', 'visitor_team_id'])
+        opponent_position_df: pd.DataFrame = DuckDBStore().query(f"""
+            WITH played AS (
+                SELECT * REPLACE (COALESCE(position, 'bench') AS position) FROM ({played_sql})
+            ), per_date AS (
+                SELECT CASE
+                           WHEN position IN ('G', 'bench') AND position_player IN ('G', 'G-F') THEN 'G'
+                           WHEN position IN ('F', 'bench') AND position_player IN ('F', 'F-G', 'F-C') THEN 'F'
+                           WHEN position IN ('C', 'bench') AND position_player IN ('C', 'C-F') THEN 'C'
+                           ELSE position
+                       END AS position_group,
+                       CASE WHEN teamId = home_team_id THEN visitor_team_id ELSE home_team_id END AS opponent,
+                       game_date,
+                       AVG(points) AS avg_points
+                FROM played
+                GROUP BY ALL
+                HAVING opponent IS NOT NULL AND game_date IS NOT NULL
+            ), ranked AS (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY position_group, opponent
+                                             ORDER BY game_date DESC) AS recency
+                FROM per_date
+            )
+            SELECT position_group,
+                   opponent,
+                   AVG(avg_points) FILTER (WHERE recency <= 10) AS avg_pts_opp_position_last_10,
+                   AVG(avg_points) FILTER (WHERE recency <= 20) AS avg_pts_opp_position_last_20,
+                   AVG(avg_points) AS avg_pts_opp_position_all
+            FROM ranked
+            GROUP BY position_group, opponent
+        """, params)
+        return opponent_position_df
     
 
     def get_future_games_players(self, data_map : dict):
@@ -108,16 +496,13 @@ class PredictionsStatsPoints(metaclass = SingletonMeta):
         )
 
         # Add position group based on the player df 'POSITION' column
-        specific_games_df['position_group'] = specific_games_df['position'].map(lambda x: 'G' if x in ('G', 'G-F') 
-                                                                            else 'F' if x in ('F', 'F-G', 'F-C') 
-                                                                            else 'C' if x in ('C', 'C-F') 
-                                                                            else x 
-                                                                            )
+        specific_games_df['position_group'] = (position_group_series(specific_games_df['position'])
+                                               .fillna(specific_games_df['position'].astype(object)))
         
 
         # Add categorical features like is_home and season 
         specific_games_df['is_home']= specific_games_df['team_id'] == specific_games_df['homeTeam_teamId']
-        specific_games_df['season'] = specific_games_df['gameId'].astype(str).str[1:3].astype(int) + 2000
+        specific_games_df['season'] = extract_season_series(specific_games_df['gameId'])
 
         # Change column date type to datetime 
         specific_games_df['game_date'] = pd.to_datetime(specific_games_df['gameDate'])
@@ -135,17 +520,32 @@ class PredictionsStatsPoints(metaclass = SingletonMeta):
         Returns:
             pd.DataFrame: A DataFrame containing the player's historical stats.
         """
-        # Extract dataframes from the map 
-        boxscore_df: pd.DataFrame = df_map["simple_boxscore"]
-        advanced_boxscore_df: pd.DataFrame = df_map["advanced_boxscore"]
-        players_df: pd.DataFrame = df_map["players"]
+        # Already joined by DuckDB
+        if "historical_stats" in df_map:
+            return df_map["historical_stats"]
+
+        return self.join_historical_stats(df_map["simple_boxscore"], df_map["advanced_boxscore"],
+                                          df_map["players"])
 
+    @staticmethod
+    def join_historical_stats(boxscore_df: pd.DataFrame, advanced_boxscore_df: pd.DataFrame,
+                              players_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Join the played boxscore rows with the player metadata and the advanced boxscores.
+        Args:
+            boxscore_df (pd.DataFrame): The boxscore rows.
+            advanced_boxscore_df (pd.DataFrame): The advanced boxscore rows.
+            players_df (pd.DataFrame): The players metadata.
+        Returns:
+            pd.DataFrame: The historical stats.
+        """
         # From the boxscore remove rows with DNP or no minutes played
         boxscore_df: pd.DataFrame = boxscore_df[(boxscore_df['minutes'] == "0:00") | 
                                                         (boxscore_df['minutes'].notna())] 
         
         # From the Advanced boxscore remove rows with DNP or no minutes played
-        advanced_boxscore_df: pd.DataFrame = advanced_boxscore_df[(boxscore_df['minutes'] == "0:00") | 
+        # (its own minutes: a mask of the boxscore rows only lines up when both tables have the same rows)
+        advanced_boxscore_df: pd.DataFrame = advanced_boxscore_df[(advanced_boxscore_df['minutes'] == "0:00") | 
                                                         (advanced_boxscore_df['minutes'].notna())] 
         
         # Renam position column to avoid confusion with boxscore position column
@@ -170,119 +570,157 @@ class PredictionsStatsPoints(metaclass = SingletonMeta):
         )
 
         return full_df
-    
-    def prepare_data_model(self, historical_stats_df: pd.DataFrame):
+
+    @staticmethod
+    def prepare_rows(historical_stats_df: pd.DataFrame) -> pd.DataFrame:
         """
-        Prepare the historical statistics DataFrame for model input.
+        Add the per-game model columns to the historical stats: minutes (float), position_group,
+        game_date (datetime), season, is_home and opponent.
         Args:
             historical_stats_df (pd.DataFrame): The DataFrame containing historical stats.
         Returns:
-            pd.DataFrame: A DataFrame with the necessary features for the model.
+            pd.DataFrame: A copy of the rows with the model columns.
         """
-        
         #  Create a copy of the DataFrame for processing
         df_to_process = historical_stats_df.copy()
         
-        df_to_process['minutes'] = df_to_process['minutes'].apply(parse_minutes)
+        df_to_process['minutes'] = parse_minutes_series(df_to_process['minutes'])
         
         # fill NaN values in 'position' witch 'BENCH'
-        df_to_process['position'] = df_to_process['position'].fillna('bench')
+        df_to_process['position'] = df_to_process['position'].astype(object).fillna('bench')
         
-        # Create a new column 'position_group' based on 'POSITION' and 'position' 
-        df_to_process['position_group'] = df_to_process.apply(
-            lambda x: 'G' if x['position'] in ('G', 'bench') and x['position_player'] in ('G', 'G-F') else
-                    'F' if x['position'] in ('F', 'bench') and x['position_player'] in ('F', 'F-G', 'F-C') else
-                    'C' if x['position'] in ('C', 'bench') and x['position_player'] in ('C', 'C-F') else x['position'],
-            axis=1
-        )
+        # Create a new column 'position_group' based on 'POSITION' and 'position':
+        # the player group when the boxscore position is that group or 'bench', else the boxscore position
+        player_group: pd.Series = position_group_series(df_to_process['position_player'])
+        matches_player: pd.Series = player_group.notna() & ((df_to_process['position'] == player_group)
+                                                           | (df_to_process['position'] == 'bench'))
+        df_to_process['position_group'] = player_group.where(matches_player, df_to_process['position'])
         
         # Change column date type to datetime 
         df_to_process['game_date'] = pd.to_datetime(df_to_process['game_date'])
         
         # Add a season column based on the game_id using the common function
-        df_to_process['season'] = df_to_process['gameId'].apply(extract_season)
+        df_to_process['season'] = extract_season_series(df_to_process['gameId'])
         
         # Feature engineering is_home and opponent columns
         df_to_process['is_home'] = df_to_process['teamId'] == df_to_process['home_team_id']
         df_to_process['opponent'] = np.where(df_to_process['is_home'], df_to_process['visitor_team_id'], df_to_process['home_team_id'])
 
-        #  filter out bench players
-        df = df_to_process[df_to_process['position'] != 'BENCH']
+        return df_to_process
 
-        # Compute one avg_points per group/opponent/game_date
-        df_avg = (
-            df
-            .groupby(['position_group','opponent','game_date'])['points']
-            .mean()
-            .reset_index(name='avg_points')
-        )
-        # Sort so tail() really pulls the last N by date
-        df_avg = df_avg.sort_values(['position_group','opponent','game_date'])
-
-        # Aggregate per (position_group, opponent)
-        result = (
-            df_avg.groupby(['position_group', 'opponent'])
-            .agg(
-                avg_pts_opp_position_last_10=('avg_points', lambda x: x.tail(10).mean()),
-                avg_pts_opp_position_last_20=('avg_points', lambda x: x.tail(20).mean()),
-                avg_pts_opp_position_all=('avg_points', 'mean')
-            )
-            .reset_index()
-        )
+    @staticmethod
+    def attach_opponent_position_stats(df: pd.DataFrame, opponent_position_df: pd.DataFrame,
+                                       keys: Optional[list] = None) -> pd.DataFrame:
+        """
+        Put the opponent position aggregates on the rows with the same keys (NaN if none).
+        Args:
+            df (pd.DataFrame): The rows.
+            opponent_position_df (pd.DataFrame): The aggregates (see opponent_position_averages).
+            keys (list, optional): The join keys (default: position_group and opponent).
+        Returns:
+            pd.DataFrame: The rows (with a RangeIndex) and the aggregate columns.
+        """
+        keys = keys or ['position_group', 'opponent']
+        # Row of each key in the aggregates (-1, the trailing NaN, if none)
+        final_df: pd.DataFrame = df.reset_index(drop=True)
+        rows: np.ndarray = pd.MultiIndex.from_frame(opponent_position_df[keys]).get_indexer(
+            pd.MultiIndex.from_frame(final_df[keys]))
+        for column in ['avg_pts_opp_position_last_10', 'avg_pts_opp_position_last_20', 'avg_pts_opp_position_all']:
+            values: np.ndarray = np.append(opponent_position_df[column].to_numpy(dtype='float64'), np.nan)
+            final_df[column] = values[rows].astype(opponent_position_df[column].dtype)
+        return final_df
+
+    def prepare_data_model(self, historical_stats_df: pd.DataFrame,
+                           opponent_position_df: Optional[pd.DataFrame] = None, as_of_date: bool = False):
+        """
+        Prepare the historical statistics DataFrame for model input.
+        Args:
+            historical_stats_df (pd.DataFrame): The DataFrame containing historical stats.
+            opponent_position_df (pd.DataFrame, optional): The opponent position aggregates
+                already computed by DuckDB (default: computed here).
+            as_of_date (bool): Give each row the opponent position aggregates as of its game date
+                (the dates up to and including it) instead of the latest ones.
+        Returns:
+            pd.DataFrame: A DataFrame with the necessary features for the model.
+        """
+        df_to_process: pd.DataFrame = self.prepare_rows(historical_stats_df)
 
-        # Put these stats back on final_df 
-        final_df: pd.DataFrame = (
-            df_to_process
-            .merge(result[['position_group','opponent','avg_pts_opp_position_last_10','avg_pts_opp_position_last_20','avg_pts_opp_position_all']],
-                on=['position_group','opponent'],
-                how='left')
-        )
+        # Aggregates already computed by DuckDB (latest values only)
+        keys: list = ['position_group', 'opponent'] + (['game_date'] if as_of_date else [])
+        if opponent_position_df is not None and not as_of_date:
+            result = opponent_position_df
+        else:
+            # Average points per group/opponent/game_date, then over all / the last 10 / 20 dates
+            result = opponent_position_averages(df_to_process, value_column='points', windows=(10, 20),
+                                                as_of_date=as_of_date)
 
-        return final_df 
+        # Put these stats back on final_df
+        return self.attach_opponent_position_stats(df_to_process, result, keys)
 
-    def normalize_numerical_data(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def add_rate_columns(df: pd.DataFrame, stats: list) -> pd.DataFrame:
         """
-        Normalize the DataFrame by scaling numerical features.
-        
+        Add the per-36 minutes ("{stat}_per36") and per-possession ("{stat}_per_poss") columns of stats.
         Args:
-            df (pd.DataFrame): The DataFrame to normalize.
-        
+            df (pd.DataFrame): The rows, with minutes and possessions (modified in place).
+            stats (list): The stats columns.
         Returns:
-            pd.DataFrame: A normalized DataFrame.
+            pd.DataFrame: df.
         """
-        
         # First, compute per-36 metrics useful for player points production
-        for stat in self.keys_points_stats:
+        for stat in stats:
             per36 = f"{stat}_per36"
             df[per36] = df[stat] / df['minutes'] * 36
 
         # And per-possession metrics
-        for stat in self.keys_points_stats:
+        for stat in stats:
             ppp = f"{stat}_per_poss"
             df[ppp] = df[stat] / df['possessions']
 
-        # Rolling the per-36 and per-possesion metrics 
-        rolling_periods = [5, 10, 20]
+        return df
+
+    @classmethod
+    def rolling_features(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Rolling averages of the per-36 and per-possession rolling_stats over the last 5 / 10 / 20 games
+        of each player, in date order (one vectorized pass for every column and window).
+        Args:
+            df (pd.DataFrame): The rows, with the rate columns (see add_rate_columns).
+        Returns:
+            pd.DataFrame: The "{stat}_{per36|per_poss}_rolling_{period}" columns, aligned on df.index.
+        """
+        rolling_cols = [f"{stat}_{suffix}" for stat in cls.rolling_stats for suffix in ("per36", "per_poss")]
+        rolling_df: pd.DataFrame = grouped_rolling_mean(df, rolling_cols, cls.rolling_periods,
+                                                        group_column='personId', order_column='game_date')
+        return rolling_df[[f"{stat}_{suffix}_rolling_{rolling_period}"
+                           for stat in cls.rolling_stats
+                           for rolling_period in cls.rolling_periods
+                           for suffix in ("per36", "per_poss")]]
+
+    def normalize_numerical_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Normalize the DataFrame by scaling numerical features.
         
-        # remove avg_pts oppsition columns from rolling calculations 
-        feature_cols_rolling = [col for col in self.keys_points_stats if not col.startswith('avg_pts_opp_position')]
-
-        # Create rolling averages for the per-36 and per-possession metrics
-        for period in feature_cols_rolling:
-            for rolling_period in rolling_periods:
-                per36 = f"{period}_per36"
-                per_poss = f"{period}_per_poss"
-                df[f"{per36}_rolling_{rolling_period}"] = df.groupby('personId')[per36].transform(lambda x: x.rolling(rolling_period, min_periods=1).mean())
-                df[f"{per_poss}_rolling_{rolling_period}"] = df.groupby('personId')[per_poss].transform(lambda x: x.rolling(rolling_period, min_periods=1).mean())       
-            
-        return df    
+        Args:
+            df (pd.DataFrame): The DataFrame to normalize.
+        
+        Returns:
+            pd.DataFrame: A normalized DataFrame.
+        """
+        # Per-36 and per-possession metrics (opponent position averages included)
+        self.add_rate_columns(df, self.keys_points_stats)
+
+        # Rolling the per-36 and per-possesion metrics (without the opponent position averages)
+        return pd.concat([df, self.rolling_features(df)], axis=1)
 
     @staticmethod
-    def encode_categorical_data(df: pd.DataFrame) -> tuple[pd.DataFrame, list]:
+    def encode_categorical_data(df: pd.DataFrame, categories="auto") -> tuple[pd.DataFrame, list]:
         """
         Encode categorical features in the DataFrame. 
         Args:
             df (pd.DataFrame): The DataFrame to encode.
+            categories (list, optional): The categories of is_home and season
+                (default: the values found in df).
         Returns:
             pd.DataFrame: A DataFrame with encoded categorical features.
         """   
@@ -291,7 +729,7 @@ class PredictionsStatsPoints(metaclass = SingletonMeta):
 
         # Encode categorical features using one-hot encoding
             # prepare the encoder
-        encoder = OneHotEncoder(sparse_output=False, handle_unknown='ignore')
+        encoder = OneHotEncoder(categories=categories, sparse_output=False, handle_unknown='ignore')
             # fit and transform the data
         encoded_categorical = encoder.fit_transform(df[categorical_feats])
 
@@ -306,6 +744,25 @@ class PredictionsStatsPoints(metaclass = SingletonMeta):
     
         return df, encoded_feature_names
     
+    def get_state_features(self, data_map: dict) -> tuple[pd.DataFrame, list]:
+        """
+        The latest features of each player read from the player feature state, joined with the
+        opponent position defense table and encoded with the categories of the full history.
+        Args:
+            data_map (dict): A dictionary containing the loaded data.
+        Returns:
+            tuple: One row of features per player and the encoded feature names.
+        """
+        # Opponent position averages of the latest game of each player, per 36 minutes and per possession
+        features_df: pd.DataFrame = self.attach_opponent_position_stats(data_map["player_features"],
+                                                                        data_map["opponent_position_stats"])
+        self.add_rate_columns(features_df, self.opponent_position_stats)
+
+        # Same columns as an encoder fit on the history: every is_home value and every season seen
+        seasons: list = [int(season) for season in str(data_map["player_feature_state"]["seasons"].iloc[0]).split(",")
+                         if season]
+        return self.encode_categorical_data(features_df, categories=[[False, True], seasons])
+
     def prepare_future_games_data(self,future_games_players_df : pd.DataFrame, encoded_data: pd.DataFrame, 
                                    feature_encoded_names)-> tuple[pd.DataFrame, pd.DataFrame]:
         """
@@ -324,9 +781,8 @@ class PredictionsStatsPoints(metaclass = SingletonMeta):
 
         # Define feature columns to merge
         numeric_feats = []
-        rolling_periods = [5, 10, 20]
-        feature_cols_rolling = [col for col in self.keys_points_stats if not col.startswith('avg_pts_opp_position')]
-        for rolling_period in rolling_periods:  
+        feature_cols_rolling = self.rolling_stats
+        for rolling_period in self.rolling_periods:  
             numeric_feats.extend([
                 f"{s}_per36_rolling_{rolling_period}" for s in feature_cols_rolling
             ])
@@ -409,17 +865,25 @@ class PredictionsStatsPoints(metaclass = SingletonMeta):
         # Get the list of players who are playing in the future games 
         future_games_players: pd.DataFrame = self.get_future_games_players(data_map) 
 
-        # Get the historical statistics for the players
-        historical_stats_df: pd.DataFrame = self.get_historical_stats(data_map)
+        if "player_features" in data_map:
+            # Latest features of each player already computed by the player feature state
+            encoded_dataframe, feature_encoded_names = self.get_state_features(data_map)
+        else:
+            # Get the historical statistics for the players
+            historical_stats_df: pd.DataFrame = self.get_historical_stats(data_map)
 
-        # Feature engineering to prepare the data for the model
-        historical_data_model: pd.DataFrame = self.prepare_data_model(historical_stats_df)
+            # Feature engineering to prepare the data for the model
+            historical_data_model: pd.DataFrame = self.prepare_data_model(historical_stats_df,
+                                                                          data_map.get("opponent_position_stats"))
 
-        # Normalize numerical data
-        normalized_data: pd.DataFrame = self.normalize_numerical_data(historical_data_model)
-        
-        # Encode categorical features and prepare the final dataframe for predictions
-        encoded_dataframe, feature_encoded_names = self.encode_categorical_data(normalized_data)
+            # Normalize numerical data
+            normalized_data: pd.DataFrame = self.normalize_numerical_data(historical_data_model)
+            
+            # Encode categorical features and prepare the final dataframe for predictions
+            # (with a lookback, the seasons of the whole history are the categories)
+            categories = ([[False, True], data_map["seasons"]["season"].tolist()] if "seasons" in data_map
+                          else "auto")
+            encoded_dataframe, feature_encoded_names = self.encode_categorical_data(normalized_data, categories)
 
         # Prepared dataframe 
         future_games_long_df, X_pred_df = self.prepare_future_games_data(future_games_players,
@@ -434,11 +898,8 @@ class PredictionsStatsPoints(metaclass = SingletonMeta):
         Returns:
             pd.DataFrame: A DataFrame with player statistics ready for predictions.
         """
-        # Load the model
-        model = load_model_artifact(self.model_path, mode=self.SAVE_MODE)
-        
-        # Load the data
-        data_map = self.load_data()
+        # Load the model and the data concurrently (already started with --prefetch)
+        model, data_map = self.load_inputs()
         
         # Transform the data
         future_games_long_df, X_pred_df = self.transform_data(data_map)
@@ -449,6 +910,6 @@ class PredictionsStatsPoints(metaclass = SingletonMeta):
         # Save the predictions to a CSV file
         save_database(predictions_df,PredictionsFileName, 
                       mode=self.SAVE_MODE,
-                      write_disposition="WRITE_APPEND")
+                      write_disposition="WRITE_UPSERT")
         
         return predictions_df
\ No newline at end of file
@@ -0,0 +1,215 @@
+import time
+from typing import Optional
+
+import pandas as pd
+
+from common.constants import feature_state_overlap_seconds
+from common.io_utils import (BoxscoreFileName, AdvancedBoxscoreFileName, PlayersFileName,
+                             PlayerFeatureWindowFileName, PlayerFeaturesFileName, PlayerFeatureStateFileName,
+                             OpponentPositionDailyFileName, OpponentPositionStatsFileName,
+                             load_data, load_distinct_values, save_databases)
+from common.rolling import sort_order, opponent_position_daily, opponent_position_aggregates
+from common.singleton_meta import SingletonMeta
+from src.get_predictions_stats_points import PredictionsStatsPoints
+
+
+class PlayerFeatureState(metaclass=SingletonMeta):
+    """
+    A class to maintain the per-player feature state of the points predictions.
+    Five tables are stored:
+    - the window: the last 20 games of each player with their per-36 and per-possession stats,
+    - the features: one row per player, the latest game of the player and the rolling features as of that game
+      (the row the predictions used to keep from the full history),
+    - the opponent position daily table: the average points allowed by each opponent to each
+      position group on each game date,
+    - the opponent position stats: the last 10 / last 20 / all dates averages of each
+      (position_group, opponent), the defense table joined by the predictions,
+    - the state: the modification date of the last boxscore rows applied and the seasons seen.
+    An update only reads the boxscore rows of the games ingested since the last update, so its
+    cost depends on the new games and on the number of players, not on the seasons of history.
+    """
+
+    # Game metadata kept for each game of the window
+    game_columns: list[str] = ['personId', 'gameId', 'game_date', 'teamId', 'season', 'is_home',
+                               'opponent', 'position_group', 'minutes', 'possessions']
+
+    def __init__(self, save_mode: str, rebuild: bool = False) -> None:
+        """
+        Args:
+            save_mode (str): The storage of the boxscores and of the state ('local', 'duckdb' or 'bq').
+            rebuild (bool): Rebuild the state from the full history (e.g. after a players table change).
+        """
+        self.SAVE_MODE: str = save_mode
+        self.rebuild: bool = rebuild
+        self.window_size: int = max(PredictionsStatsPoints.rolling_periods)
+        self.rate_columns: list[str] = [f"{stat}_{suffix}" for suffix in ("per36", "per_poss")
+                                        for stat in PredictionsStatsPoints.rolling_stats]
+        self.window_columns: list[str] = self.game_columns + self.rate_columns
+
+    def load_played_rows(self, filters: list) -> tuple[pd.DataFrame, Optional[pd.Timestamp]]:
+        """
+        Load the played boxscore rows (joined with the advanced boxscores and the players) and
+        compute their per-game model columns.
+        Args:
+            filters (list): The filters of the boxscore rows, e.g. [("gameId", "in", [...])].
+        Returns:
+            tuple: The rows (window columns and points) and the latest modification date read.
+        """
+        audit_column: str = "aud_modification_date"
+        boxscore_df: pd.DataFrame = load_data(BoxscoreFileName, mode=self.SAVE_MODE, filters=filters,
+                                              columns=PredictionsStatsPoints.boxscore_columns + [audit_column])
+        advanced_boxscore_df: pd.DataFrame = load_data(
+            AdvancedBoxscoreFileName, mode=self.SAVE_MODE, filters=filters,
+            columns=PredictionsStatsPoints.advanced_boxscore_columns + [audit_column])
+        watermarks: list = [pd.to_datetime(df[audit_column], utc=True).max()
+                            for df in (boxscore_df, advanced_boxscore_df) if audit_column in df.columns]
+        watermarks = [w for w in watermarks if not pd.isna(w)]
+        watermark: Optional[pd.Timestamp] = max(watermarks) if watermarks else None
+
+        if boxscore_df.empty:
+            return pd.DataFrame(columns=self.window_columns + ['points']), watermark
+        if advanced_boxscore_df.empty:
+            advanced_boxscore_df = pd.DataFrame(columns=PredictionsStatsPoints.advanced_boxscore_columns)
+
+        players_df: pd.DataFrame = load_data(PlayersFileName, mode=self.SAVE_MODE,
+                                             columns=PredictionsStatsPoints.players_columns)
+        rows: pd.DataFrame = PredictionsStatsPoints.prepare_rows(PredictionsStatsPoints.join_historical_stats(
+            boxscore_df.drop(columns=[audit_column], errors="ignore"),
+            advanced_boxscore_df.drop(columns=[audit_column], errors="ignore"),
+            players_df))
+        PredictionsStatsPoints.add_rate_columns(rows, PredictionsStatsPoints.rolling_stats)
+        return rows[self.window_columns + ['points']], watermark
+
+    def last_games(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """
+        The last window_size games of each player, sorted by player and game date.
+        """
+        rows = rows[self.window_columns].reset_index(drop=True)
+        rows = rows.iloc[sort_order(rows, "personId", "game_date")]
+        return rows.groupby("personId", sort=False).tail(self.window_size).reset_index(drop=True)
+
+    def latest_features(self, window_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        The latest game of each player with the rolling features as of that game (the window holds
+        enough games for the largest rolling period, so they equal the full history ones).
+        Args:
+            window_df (pd.DataFrame): The window, sorted by player and game date (see last_games).
+        Returns:
+            pd.DataFrame: One row per player.
+        """
+        features_df: pd.DataFrame = pd.concat(
+            [window_df[self.game_columns], PredictionsStatsPoints.rolling_features(window_df)], axis=1)
+        return features_df.groupby("personId", sort=False).tail(1).reset_index(drop=True)
+
+    def changed_game_ids(self, watermark: pd.Timestamp) -> list:
+        """
+        The gameIds of the boxscore and advanced boxscore rows saved since the watermark
+        (minus feature_state_overlap_seconds: re-applying a game is harmless).
+        """
+        since: pd.Timestamp = watermark - pd.Timedelta(seconds=feature_state_overlap_seconds)
+        filters: list = [("aud_modification_date", ">", since)]
+        game_ids: set = set()
+        for table_name in (BoxscoreFileName, AdvancedBoxscoreFileName):
+            game_ids.update(load_distinct_values(table_name, "gameId", mode=self.SAVE_MODE, filters=filters))
+        return sorted(game_ids)
+
+    def save_state(self, window_df: pd.DataFrame, daily_df: pd.DataFrame,
+                   watermark: Optional[pd.Timestamp], seasons: set) -> None:
+        """
+        Save the window, the latest features, the opponent position tables and the state
+        (the tables are small: a few rows per player, per opponent and position group).
+        """
+        state_df: pd.DataFrame = pd.DataFrame({
+            "watermark": [watermark if watermark is not None else pd.NaT],
+            "seasons": [",".join(str(season) for season in sorted(seasons))],
+            "window_size": [self.window_size],
+        })
+        save_databases([
+            {"df": window_df, "table_name": PlayerFeatureWindowFileName, "write_disposition": "WRITE_TRUNCATE"},
+            {"df": self.latest_features(window_df), "table_name": PlayerFeaturesFileName,
+             "write_disposition": "WRITE_TRUNCATE"},
+            {"df": daily_df, "table_name": OpponentPositionDailyFileName, "write_disposition": "WRITE_TRUNCATE"},
+            {"df": opponent_position_aggregates(daily_df, windows=(10, 20)),
+             "table_name": OpponentPositionStatsFileName, "write_disposition": "WRITE_TRUNCATE"},
+            {"df": state_df, "table_name": PlayerFeatureStateFileName, "write_disposition": "WRITE_TRUNCATE"},
+        ], mode=self.SAVE_MODE)
+
+    @staticmethod
+    def stored_seasons(state_df: pd.DataFrame) -> list[int]:
+        """
+        The seasons of the games applied to the state (the categories of the season one-hot encoding).
+        """
+        seasons: str = state_df["seasons"].iloc[0] if not state_df.empty else ""
+        return [int(season) for season in str(seasons).split(",") if season]
+
+    def build(self) -> None:
+        """
+        Build the state from the full history.
+        """
+        rows, watermark = self.load_played_rows([])
+        if rows.empty:
+            print("⚠️ No boxscores found; player feature state not built.")
+            return
+        seasons: set = set(rows["season"].dropna().astype(int))
+        window_df: pd.DataFrame = self.last_games(rows)
+        self.save_state(window_df, opponent_position_daily(rows, value_column="points"), watermark, seasons)
+        print(f"✅ Player feature state built from {len(rows):,} games rows "
+              f"({window_df['personId'].nunique():,} players)")
+
+    def update(self, state_df: pd.DataFrame) -> None:
+        """
+        Apply the games saved since the last update: their rows replace the rows of the same gameIds
+        in the windows of their players, then only the last window_size games are kept.
+        Their per-date averages replace the (opponent, game_date) of the daily table (a team plays
+        once a day: all the rows of an opponent on a date come from the same game), then the
+        aggregates are recomputed from it.
+        Args:
+            state_df (pd.DataFrame): The stored state.
+        """
+        watermark: pd.Timestamp = pd.to_datetime(state_df["watermark"], utc=True).iloc[0]
+        game_ids: list = self.changed_game_ids(watermark)
+        if not game_ids:
+            print("✅ Player feature state is up to date.")
+            return
+
+        daily_df: pd.DataFrame = load_data(OpponentPositionDailyFileName, mode=self.SAVE_MODE,
+                                           columns=["position_group", "opponent", "game_date", "avg_points"])
+        if daily_df.empty:
+            # State saved before the opponent position tables existed
+            self.build()
+            return
+
+        rows, new_watermark = self.load_played_rows([("gameId", "in", game_ids)])
+        window_df: pd.DataFrame = load_data(PlayerFeatureWindowFileName, mode=self.SAVE_MODE,
+                                            columns=self.window_columns)
+        window_df = window_df[~window_df["gameId"].astype(str).isin(game_ids)]
+        window_df = self.last_games(pd.concat([window_df, rows], ignore_index=True))
+
+        new_daily_df: pd.DataFrame = opponent_position_daily(rows, value_column="points")
+        replaced = pd.MultiIndex.from_frame(daily_df[["opponent", "game_date"]]).isin(
+            pd.MultiIndex.from_frame(new_daily_df[["opponent", "game_date"]]))
+        daily_df = pd.concat([daily_df[~replaced], new_daily_df], ignore_index=True)
+
+        seasons: set = set(self.stored_seasons(state_df)) | set(rows["season"].dropna().astype(int))
+        if new_watermark is not None and new_watermark > watermark:
+            watermark = new_watermark
+        self.save_state(window_df, daily_df, watermark, seasons)
+        print(f"✅ Player feature state updated with {len(game_ids)} game(s) ({len(rows):,} rows)")
+
+    def run(self, create: bool = True) -> None:
+        """
+        Run the process to bring the player feature state up to date.
+        Args:
+            create (bool): Build the state if it does not exist yet (otherwise nothing is done).
+        """
+        started: float = time.perf_counter()
+        state_df: pd.DataFrame = pd.DataFrame() if self.rebuild else load_data(PlayerFeatureStateFileName,
+                                                                               mode=self.SAVE_MODE)
+        if state_df.empty or pd.isna(state_df["watermark"].iloc[0]):
+            if not create and not self.rebuild:
+                print("ℹ️ No player feature state to update (run update_player_feature_state to build it).")
+                return
+            self.build()
+        else:
+            self.update(state_df)
+        print(f"⏱️ Player feature state done in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,101 @@
+"""
+Shared fixtures of the test suite.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.singleton_meta import SingletonMeta
+
+
+@pytest.fixture(autouse=True)
+def reset_singletons():
+    """
+    Every test starts without the process-wide singletons (rate limiter, stores, processes).
+    """
+    SingletonMeta._instances.clear()
+    yield
+    SingletonMeta._instances.clear()
+
+
+@pytest.fixture
+def local_databases(tmp_path, monkeypatch):
+    """
+    Run the test from an empty folder: the local tables are written to tmp_path/databases/.
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "databases"
+
+
+# Date of the slate predicted by the tests (the history ends the day before)
+SlateDate: str = "2024-11-15"
+
+
+def build_league(mode: str, seasons: tuple = (2023, 2024), days: int = 25, teams: int = 10,
+                 players_per_team: int = 6, seed: int = 0) -> dict:
+    """
+    Save a small synthetic league (players, schedule, boxscores and advanced boxscores) and
+    a slate of 3 games on SlateDate.
+    Args:
+        mode (str): 'local' or 'duckdb'.
+    Returns:
+        dict: The saved DataFrames ("players", "schedule", "boxscore", "advanced_boxscore").
+    """
+    from common.io_utils import (save_database, PlayersFileName, ScheduleFileName, BoxscoreFileName,
+                                 AdvancedBoxscoreFileName)
+
+    rng = np.random.default_rng(seed)
+    team_ids: list = [1610612737 + i for i in range(teams)]
+    positions: list = ["G", "G-F", "F", "F-G", "F-C", "C", "C-F"]
+    players_df = pd.DataFrame([{"person_id": 1000 + i, "player_slug": f"player-{1000 + i}",
+                                "team_id": team_ids[i // players_per_team], "position": positions[i % len(positions)],
+                                "height": "6-6", "weight": "220"}
+                               for i in range(teams * players_per_team)])
+
+    schedule: list = []
+    boxscore: list = []
+    advanced: list = []
+    game_number: int = 0
+    for season in seasons:
+        first_day = pd.Timestamp(f"{season}-10-20") if season != seasons[-1] else pd.Timestamp(SlateDate) - pd.Timedelta(days=days)
+        for day in range(days):
+            game_date = first_day + pd.Timedelta(days=day)
+            order = rng.permutation(teams)
+            for home, visitor in zip(order[0::2], order[1::2]):
+                game_id = f"002{season % 100:02d}{game_number:05d}"
+                game_number += 1
+                schedule.append({"gameId": game_id, "gameDate": game_date, "homeTeam_teamId": team_ids[home],
+                                 "awayTeam_teamId": team_ids[visitor]})
+                for team in (home, visitor):
+                    for _, player in players_df[players_df["team_id"] == team_ids[team]].iterrows():
+                        played: bool = rng.random() > 0.1
+                        minutes = f"{rng.integers(5, 40)}:{rng.integers(0, 60):02d}" if played else None
+                        made = [int(x) for x in rng.integers(0, [12, 5, 8])]
+                        common = {"gameId": game_id, "teamId": team_ids[team], "personId": player["person_id"],
+                                  "position": None if rng.random() < 0.5 else player["position"][0],
+                                  "minutes": minutes, "game_date": game_date.strftime("%Y-%m-%d"),
+                                  "home_team_id": team_ids[home], "visitor_team_id": team_ids[visitor]}
+                        boxscore.append({**common, "fieldGoalsMade": made[0], "threePointersMade": made[1],
+                                         "freeThrowsMade": made[2], "points": 2 * made[0] + made[1] + made[2]})
+                        advanced.append({**common, "usagePercentage": rng.random(), "trueShootingPercentage": rng.random(),
+                                         "effectiveFieldGoalPercentage": rng.random(),
+                                         "offensiveRating": 100 * rng.random(), "possessions": float(rng.integers(20, 80))})
+    for number, (home, visitor) in enumerate([(0, 1), (2, 3), (4, 5)]):
+        schedule.append({"gameId": f"00224{90000 + number:05d}", "gameDate": pd.Timestamp(SlateDate),
+                         "homeTeam_teamId": team_ids[home], "awayTeam_teamId": team_ids[visitor]})
+
+    league: dict = {"players": players_df, "schedule": pd.DataFrame(schedule),
+                    "boxscore": pd.DataFrame(boxscore), "advanced_boxscore": pd.DataFrame(advanced)}
+    save_database(league["players"], PlayersFileName, mode=mode)
+    save_database(league["schedule"], ScheduleFileName, mode=mode)
+    save_database(league["boxscore"], BoxscoreFileName, mode=mode, write_disposition="WRITE_APPEND")
+    save_database(league["advanced_boxscore"], AdvancedBoxscoreFileName, mode=mode, write_disposition="WRITE_APPEND")
+    return league
+
+
+@pytest.fixture(params=["local", "duckdb"])
+def league(request, local_databases) -> tuple:
+    """
+    A synthetic league saved in each storage mode: (mode, saved DataFrames).
+    """
+    return request.param, build_league(request.param)
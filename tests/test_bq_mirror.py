@@ -0,0 +1,198 @@
+"""
+Tests of the local BigQuery mirror (common/bq_mirror.py) against a fake Storage Read API:
+watermark-based incremental syncs and the periodic reconciliation of deleted games.
+"""
+import json
+import re
+from types import SimpleNamespace
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from common import bq_mirror
+from common.bq_mirror import BigQueryMirror
+from common.singleton_meta import SingletonMeta
+
+TableName: str = "nba_boxscore_basic"
+
+
+class FakeBigQuery:
+    """
+    The remote tables ({table_name: DataFrame}) served by a fake bq_storage.read_table.
+    """
+
+    def __init__(self) -> None:
+        self.tables: dict = {}
+        self.reads: list = []
+        self.now: pd.Timestamp = pd.Timestamp("2024-11-01 12:00", tz="UTC")
+
+    def write(self, table_name: str, df: pd.DataFrame) -> None:
+        """
+        Replace the rows of the gameIds of df, stamped now (as save_database does).
+        """
+        self.now += pd.Timedelta(hours=1)
+        df = df.assign(aud_modification_date=self.now)
+        table_df = self.tables.get(table_name, pd.DataFrame(columns=df.columns))
+        self.tables[table_name] = pd.concat([table_df[~table_df["gameId"].isin(df["gameId"])], df],
+                                            ignore_index=True)
+
+    def read_table(self, project_id: str, dataset_id: str, table_name: str,
+                   columns: list = None, row_restriction: str = "") -> pa.Table:
+        self.reads.append({"columns": columns, "row_restriction": row_restriction})
+        df = self.tables[table_name]
+        since = re.fullmatch(r"`aud_modification_date` > '(.+)'", row_restriction)
+        if since:
+            df = df[df["aud_modification_date"] > pd.Timestamp(since.group(1))]
+        elif row_restriction:
+            raise AssertionError(f"unexpected row restriction {row_restriction}")
+        return pa.Table.from_pandas(df[columns] if columns else df, preserve_index=False)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now: float = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def remote(monkeypatch) -> FakeBigQuery:
+    fake_bigquery = FakeBigQuery()
+    monkeypatch.setattr(bq_mirror.bq_storage, "read_table", fake_bigquery.read_table)
+    return fake_bigquery
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake_clock = FakeClock()
+    monkeypatch.setattr(bq_mirror, "time", SimpleNamespace(time=fake_clock.time))
+    return fake_clock
+
+
+def game_rows(game_id: str, points: int, players: tuple = (1, 2), game_date: str = "2024-11-01") -> pd.DataFrame:
+    return pd.DataFrame({"gameId": game_id, "personId": list(players), "points": points, "game_date": game_date})
+
+
+def sync(tmp_path, reconcile_seconds: int = 3600, table_name: str = TableName,
+         date_column: str = "game_date") -> BigQueryMirror:
+    """
+    One process syncing the table (a new mirror instance: each process syncs once).
+    """
+    SingletonMeta._instances.clear()
+    mirror = BigQueryMirror(mirror_dir=str(tmp_path / "mirror"), overlap_seconds=600,
+                            reconcile_seconds=reconcile_seconds)
+    mirror.sync("project", "dataset", table_name, date_column=date_column)
+    return mirror
+
+
+def mirrored(mirror: BigQueryMirror, table_name: str = TableName) -> pd.DataFrame:
+    df = mirror.read(table_name, columns=["gameId", "personId", "points"])
+    return df.sort_values(["gameId", "personId"]).reset_index(drop=True)
+
+
+def meta(tmp_path, table_name: str = TableName) -> dict:
+    with open(tmp_path / "mirror" / f"{table_name}.sync.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def gameid_scans(remote: FakeBigQuery) -> int:
+    return sum(read["columns"] == ["gameId"] for read in remote.reads)
+
+
+def test_first_sync_downloads_the_table(tmp_path, remote, clock):
+    remote.write(TableName, game_rows("0022400001", 10))
+    mirror = sync(tmp_path)
+    assert mirrored(mirror)["points"].tolist() == [10, 10]
+    assert pd.Timestamp(meta(tmp_path)["watermark"]) == remote.now
+    assert remote.reads == [{"columns": None, "row_restriction": ""}]
+
+
+def test_incremental_sync_fetches_the_rows_changed_since_the_watermark(tmp_path, remote, clock):
+    remote.write(TableName, game_rows("0022400001", 10))
+    sync(tmp_path)
+    watermark = remote.now
+
+    remote.write(TableName, game_rows("0022400001", 11, players=(1,)))  # corrected: player 2 removed
+    remote.write(TableName, game_rows("0022400002", 20, game_date="2024-11-02"))
+    remote.reads.clear()
+    mirror = sync(tmp_path)
+
+    since = (watermark - pd.Timedelta(seconds=600)).isoformat()
+    assert remote.reads == [{"columns": None, "row_restriction": f"`aud_modification_date` > '{since}'"}]
+    assert mirrored(mirror)[["gameId", "personId", "points"]].values.tolist() == [
+        ["0022400001", 1, 11], ["0022400002", 1, 20], ["0022400002", 2, 20]]
+    assert pd.Timestamp(meta(tmp_path)["watermark"]) == remote.now
+
+
+def test_sync_without_changes_keeps_the_watermark(tmp_path, remote, clock):
+    remote.write(TableName, game_rows("0022400001", 10))
+    sync(tmp_path)
+    watermark = meta(tmp_path)["watermark"]
+    mirror = sync(tmp_path)
+    assert meta(tmp_path)["watermark"] == watermark
+    assert mirrored(mirror)["points"].tolist() == [10, 10]
+
+
+def test_deleted_games_are_dropped_by_the_periodic_reconciliation(tmp_path, remote, clock):
+    remote.write(TableName, game_rows("0022400001", 10))
+    remote.write(TableName, game_rows("0022400002", 20))
+    sync(tmp_path, reconcile_seconds=3600)
+    remote.tables[TableName] = remote.tables[TableName][lambda df: df["gameId"] != "0022400002"]
+
+    # Incremental syncs inside the period do not scan the remote gameIds
+    clock.now += 1800
+    mirror = sync(tmp_path, reconcile_seconds=3600)
+    assert gameid_scans(remote) == 0
+    assert set(mirrored(mirror)["gameId"]) == {"0022400001", "0022400002"}
+
+    clock.now += 1800
+    mirror = sync(tmp_path, reconcile_seconds=3600)
+    assert gameid_scans(remote) == 1
+    assert set(mirrored(mirror)["gameId"]) == {"0022400001"}
+    assert meta(tmp_path)["reconciled_at"] == clock.now
+
+    # The next period starts at the last reconciliation
+    clock.now += 1800
+    sync(tmp_path, reconcile_seconds=3600)
+    assert gameid_scans(remote) == 1
+
+
+def test_reconciliation_on_every_sync(tmp_path, remote, clock):
+    remote.write(TableName, game_rows("0022400001", 10))
+    sync(tmp_path, reconcile_seconds=0)
+    sync(tmp_path, reconcile_seconds=0)
+    sync(tmp_path, reconcile_seconds=0)
+    assert gameid_scans(remote) == 2
+
+
+def test_small_tables_are_downloaded_again_when_changed(tmp_path, remote, clock):
+    table_name = "nba_players_df"
+    remote.write(table_name, pd.DataFrame({"gameId": ["-"], "personId": [1], "points": [0]}))
+    sync(tmp_path, table_name=table_name, date_column=None)
+
+    # The overlap reads the rows of the last sync again: not a change
+    remote.reads.clear()
+    sync(tmp_path, table_name=table_name, date_column=None)
+    assert len(remote.reads) == 1
+
+    remote.tables[table_name] = pd.DataFrame({"gameId": ["-"], "personId": [2], "points": [0],
+                                              "aud_modification_date": remote.now + pd.Timedelta(hours=1)})
+    remote.reads.clear()
+    mirror = sync(tmp_path, table_name=table_name, date_column=None)
+    assert len(remote.reads) == 2
+    assert mirrored(mirror, table_name)["personId"].tolist() == [2]
+
+
+def test_small_tables_see_rows_committed_late_in_the_overlap(tmp_path, remote, clock):
+    table_name = "nba_players_df"
+    remote.write(table_name, pd.DataFrame({"gameId": ["-"], "personId": [1], "points": [0]}))
+    sync(tmp_path, table_name=table_name, date_column=None)
+
+    # Stamped before the watermark, committed after the sync
+    late_df = pd.DataFrame({"gameId": ["-"], "personId": [2], "points": [0],
+                            "aud_modification_date": remote.now - pd.Timedelta(seconds=60)})
+    remote.tables[table_name] = pd.concat([remote.tables[table_name], late_df], ignore_index=True)
+    mirror = sync(tmp_path, table_name=table_name, date_column=None)
+    assert mirrored(mirror, table_name)["personId"].tolist() == [1, 2]
@@ -0,0 +1,58 @@
+"""
+Tests of the translation of load_data filters into Storage Read API row restrictions
+(common/bq_storage.py).
+"""
+import datetime
+
+import pytest
+
+from common.bq_storage import filters_to_row_restriction
+
+
+@pytest.mark.parametrize("filters, expected", [
+    (None, ""),
+    ([], ""),
+    # A season S runs from S-07-01 to (S+1)-07-01
+    ([("season", "=", 2024)], "`game_date` >= '2024-07-01' AND `game_date` < '2025-07-01'"),
+    ([("season", "==", "2024")], "`game_date` >= '2024-07-01' AND `game_date` < '2025-07-01'"),
+    ([("season", "!=", 2024)], "(`game_date` < '2024-07-01' OR `game_date` >= '2025-07-01')"),
+    ([("season", ">=", 2023)], "`game_date` >= '2023-07-01'"),
+    ([("season", ">", 2023)], "`game_date` >= '2024-07-01'"),
+    ([("season", "<=", 2023)], "`game_date` < '2024-07-01'"),
+    ([("season", "<", 2023)], "`game_date` < '2023-07-01'"),
+    ([("season", "in", [2024, 2022])],
+     "((`game_date` >= '2022-07-01' AND `game_date` < '2023-07-01') OR "
+     "(`game_date` >= '2024-07-01' AND `game_date` < '2025-07-01'))"),
+    ([("season", "not in", [2024])], "NOT ((`game_date` >= '2024-07-01' AND `game_date` < '2025-07-01'))"),
+    ([("season", "in", [])], "FALSE"),
+    # Literals
+    ([("personId", "=", 203999)], "`personId` = 203999"),
+    ([("points", ">", 10.5)], "`points` > 10.5"),
+    ([("is_playoffs", "==", True)], "`is_playoffs` = TRUE"),
+    ([("game_date", "<", datetime.date(2025, 1, 1))], "`game_date` < '2025-01-01'"),
+    ([("playerSlug", "=", "de'aaron-fox")], "`playerSlug` = 'de\\'aaron-fox'"),
+    ([("path", "=", "a\\b")], "`path` = 'a\\\\b'"),
+    ([("gameId", "in", ["0022400001", "0022400002"])], "`gameId` IN ('0022400001', '0022400002')"),
+    ([("personId", "not in", [1, 2])], "NOT `personId` IN (1, 2)"),
+    ([("personId", "in", [])], "FALSE"),
+    # Filters are AND-ed
+    ([("season", ">=", 2024), ("personId", "in", [1])],
+     "`game_date` >= '2024-07-01' AND `personId` IN (1)"),
+])
+def test_filters_to_row_restriction(filters, expected):
+    assert filters_to_row_restriction(filters, date_column="game_date") == expected
+
+
+def test_season_filter_uses_the_table_date_column():
+    assert filters_to_row_restriction([("season", "=", 2024)], date_column="gameDate") == \
+        "`gameDate` >= '2024-07-01' AND `gameDate` < '2025-07-01'"
+
+
+@pytest.mark.parametrize("filters, date_column", [
+    ([("season", "=", 2024)], None),
+    ([("personId", "like", 1)], "game_date"),
+    ([("season", "~", 2024)], "game_date"),
+])
+def test_unsupported_filters_raise(filters, date_column):
+    with pytest.raises(ValueError):
+        filters_to_row_restriction(filters, date_column=date_column)
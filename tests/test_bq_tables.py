@@ -0,0 +1,144 @@
+"""
+Tests of the BigQuery table helpers (common/bq_tables.py): creation and in-place migration of the
+partitioned tables (mocked client), and the coercion of the rows to the table schema.
+"""
+import datetime
+import re
+from unittest import mock
+
+import pandas as pd
+import pytest
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from common import bq_tables
+from common.bq_tables import ensure_table, coerce_to_schema
+
+TableId: str = "project.dataset.nba_boxscore_basic"
+Spec: dict = {
+    "schema": [bigquery.SchemaField("gameId", "STRING"), bigquery.SchemaField("personId", "INT64"),
+               bigquery.SchemaField("points", "FLOAT64"), bigquery.SchemaField("game_date", "DATE")],
+    "partition_field": "game_date",
+    "clustering_fields": ["gameId", "personId"],
+}
+
+
+def existing_table(fields: list, partition_field: str = None, clustering_fields: list = None) -> bigquery.Table:
+    table = bigquery.Table(TableId, schema=[bigquery.SchemaField(name, field_type) for name, field_type in fields])
+    if partition_field:
+        table.time_partitioning = bigquery.TimePartitioning(field=partition_field)
+    table.clustering_fields = clustering_fields
+    return table
+
+
+def client_with(table: bigquery.Table = None, failed_counts: dict = None) -> mock.MagicMock:
+    """
+    A mocked client holding `table` (None = missing); the cast check query returns failed_counts.
+    """
+    client = mock.MagicMock()
+    client.get_table.side_effect = NotFound("missing") if table is None else None
+    client.get_table.return_value = table
+    client.query.return_value.to_dataframe.return_value = pd.DataFrame([failed_counts or {}])
+    return client
+
+
+def queries(client: mock.MagicMock) -> list:
+    return [re.sub(r"\s+", " ", call.args[0]).strip() for call in client.query.call_args_list]
+
+
+def test_missing_table_is_created_partitioned_and_clustered():
+    client = client_with(None)
+    ensure_table(client, TableId, Spec)
+    table: bigquery.Table = client.create_table.call_args.args[0]
+    assert table.time_partitioning.field == "game_date"
+    assert table.time_partitioning.type_ == bigquery.TimePartitioningType.DAY
+    assert table.clustering_fields == ["gameId", "personId"]
+    assert [field.name for field in table.schema] == ["gameId", "personId", "points", "game_date"]
+    client.query.assert_not_called()
+
+
+def test_partitioned_table_is_left_as_is():
+    client = client_with(existing_table([("gameId", "STRING")], "game_date", ["gameId", "personId"]))
+    ensure_table(client, TableId, Spec)
+    client.create_table.assert_not_called()
+    client.query.assert_not_called()
+
+
+def test_autodetected_table_is_migrated_in_place(capsys):
+    client = client_with(existing_table([("gameId", "INTEGER"), ("personId", "INTEGER"), ("points", "FLOAT"),
+                                         ("game_date", "TIMESTAMP"), ("old_column", "STRING")]),
+                         failed_counts={"gameId": 0, "game_date": 0})
+    ensure_table(client, TableId, Spec)
+
+    check, migration = queries(client)
+    # Only the columns whose type changes are checked (legacy INTEGER / FLOAT names are the same types)
+    assert check == (
+        "SELECT COUNTIF(`gameId` IS NOT NULL AND SAFE_CAST(`gameId` AS STRING) IS NULL) AS `gameId`, "
+        "COUNTIF(`game_date` IS NOT NULL AND SAFE_CAST(`game_date` AS DATE) IS NULL) AS `game_date` "
+        f"FROM `{TableId}`")
+    assert migration == (
+        f"CREATE OR REPLACE TABLE `{TableId}` PARTITION BY `game_date` CLUSTER BY `gameId`, `personId` "
+        "AS SELECT CAST(`gameId` AS STRING) AS `gameId`, CAST(`personId` AS INT64) AS `personId`, "
+        "CAST(`points` AS FLOAT64) AS `points`, CAST(`game_date` AS DATE) AS `game_date` "
+        f"FROM `{TableId}`")
+    assert "['old_column']" in capsys.readouterr().out
+    client.delete_table.assert_not_called()
+
+
+def test_missing_columns_are_added_as_nulls():
+    client = client_with(existing_table([("gameId", "STRING"), ("game_date", "DATE")]))
+    ensure_table(client, TableId, Spec)
+    (migration,) = queries(client)
+    assert "CAST(NULL AS INT64) AS `personId`, CAST(NULL AS FLOAT64) AS `points`" in migration
+
+
+def test_migration_with_lossy_casts_fails_before_rewriting():
+    client = client_with(existing_table([("gameId", "STRING"), ("personId", "STRING"), ("game_date", "DATE")]),
+                         failed_counts={"personId": 3})
+    with pytest.raises(ValueError, match="personId"):
+        ensure_table(client, TableId, Spec)
+    assert len(queries(client)) == 1
+
+
+@pytest.mark.parametrize("field_type, values, expected", [
+    ("INT64", ["1", 2.0, None], [1, 2, None]),
+    ("INT64", [1.4, 1.6], [1, 2]),
+    ("FLOAT64", ["1.5", 2, None], [1.5, 2.0, None]),
+    ("BOOL", [True, False, None], [True, False, None]),
+    ("DATE", ["2024-11-01", pd.Timestamp("2024-11-02 10:00")], [datetime.date(2024, 11, 1), datetime.date(2024, 11, 2)]),
+    ("STRING", ["a", 1, None], ["a", "1", None]),
+], ids=["int64", "int64_rounded", "float64", "bool", "date", "string"])
+def test_coerce_to_schema_casts(field_type, values, expected):
+    out = coerce_to_schema(pd.DataFrame({"column": values}), [bigquery.SchemaField("column", field_type)])
+    assert [None if pd.isna(value) else value for value in out["column"]] == expected
+
+
+def test_coerce_to_schema_normalizes_game_ids_and_timestamps():
+    schema = [bigquery.SchemaField("gameId", "STRING"), bigquery.SchemaField("aud_modification_date", "TIMESTAMP")]
+    out = coerce_to_schema(pd.DataFrame({"gameId": [22400001, "0022400002"],
+                                         "aud_modification_date": ["2024-11-01T10:00:00+01:00"] * 2}), schema)
+    assert out["gameId"].tolist() == ["0022400001", "0022400002"]
+    assert out["aud_modification_date"].iloc[0] == pd.Timestamp("2024-11-01 09:00", tz="UTC")
+
+
+def test_coerce_to_schema_keeps_exactly_the_schema_columns(capsys):
+    out = coerce_to_schema(pd.DataFrame({"gameId": ["0022400001"], "extra": [1]}), Spec["schema"])
+    assert list(out.columns) == ["gameId", "personId", "points", "game_date"]
+    assert out[["personId", "points", "game_date"]].isna().all().all()
+    assert "{'extra': 1}" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("field_type, values", [
+    ("INT64", ["1", "twelve"]),
+    ("FLOAT64", ["1.5", "n/a"]),
+], ids=["int64", "float64"])
+def test_coerce_to_schema_raises_on_values_becoming_null(field_type, values):
+    with pytest.raises(ValueError, match=r"'column': 1"):
+        coerce_to_schema(pd.DataFrame({"column": values}), [bigquery.SchemaField("column", field_type)])
+
+
+def test_schemas_follow_the_registry():
+    fields = {field.name: field.field_type for field in bq_tables.BoxscoreSchema}
+    assert (fields["gameId"], fields["personId"], fields["points"], fields["fieldGoalsPercentage"]) == \
+        ("STRING", "INT64", "INT64", "FLOAT64")
+    assert (fields["game_date"], fields["aud_modification_date"]) == ("DATE", "TIMESTAMP")
@@ -0,0 +1,46 @@
+"""
+Tests of the translation of load_data filters into DuckDB WHERE clauses (common/duckdb_store.py).
+"""
+import duckdb
+import pandas as pd
+import pytest
+
+from common.duckdb_store import filters_to_where, SEASON_EXPRESSION
+
+
+@pytest.mark.parametrize("filters, expected_where, expected_params", [
+    (None, "", []),
+    ([("personId", "=", 1)], '"personId" = ?', [1]),
+    ([("personId", "==", 1)], '"personId" = ?', [1]),
+    ([("game_date", ">=", "2024-11-01"), ("points", "<", 10)], '"game_date" >= ? AND "points" < ?',
+     ["2024-11-01", 10]),
+    ([("gameId", "in", ("0022400001", "0022400002"))], '"gameId" IN (?, ?)', ["0022400001", "0022400002"]),
+    ([("personId", "not in", [1])], '"personId" NOT IN (?)', [1]),
+    ([("personId", "in", [])], "FALSE", []),
+    ([("personId", "not in", [])], "TRUE", []),
+    ([("season", ">=", 2023)], f"{SEASON_EXPRESSION} >= ?", [2023]),
+    ([("playerSlug", "=", "de'aaron-fox")], '"playerSlug" = ?', ["de'aaron-fox"]),
+])
+def test_filters_to_where(filters, expected_where, expected_params):
+    assert filters_to_where(filters) == (expected_where, expected_params)
+
+
+def test_unsupported_operator_raises():
+    with pytest.raises(ValueError):
+        filters_to_where([("personId", "like", 1)])
+
+
+@pytest.mark.parametrize("filters, expected_ids", [
+    ([("season", "=", 2024)], ["0022400001", "0042400002"]),
+    ([("season", "in", [2023])], ["0022300001"]),
+    ([("season", "not in", [2023]), ("playerSlug", "=", "de'aaron-fox")], ["0022400001"]),
+    ([("gameId", "in", [])], []),
+])
+def test_where_selects_the_filtered_rows(filters, expected_ids):
+    df = pd.DataFrame({"gameId": ["0022300001", "0022400001", "0042400002"],
+                       "playerSlug": ["de'aaron-fox", "de'aaron-fox", "lebron-james"]})
+    connection = duckdb.connect()
+    connection.register("games", df)
+    where, params = filters_to_where(filters)
+    rows = connection.execute(f"SELECT gameId FROM games WHERE {where} ORDER BY gameId", params).fetchall()
+    assert [row[0] for row in rows] == expected_ids
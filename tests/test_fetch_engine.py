@@ -0,0 +1,177 @@
+"""
+Tests of the concurrent fetch engine (common/fetch_engine.py).
+"""
+import threading
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from common.fetch_engine import (TokenBucket, NbaApiError, fetch_games, is_retryable_error,
+                                 backoff_delay, call_with_retry)
+
+
+class CountingBucket(TokenBucket):
+    """
+    A token bucket counting the tokens taken.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.acquired: int = 0
+
+    def acquire(self) -> None:
+        super().acquire()
+        self.acquired += 1
+
+
+def test_token_bucket_rejects_invalid_settings():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, burst=1)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, burst=0)
+
+
+def test_token_bucket_serves_the_burst_then_the_rate():
+    bucket = TokenBucket(rate=50, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+
+    start = time.monotonic()
+    for _ in range(10):
+        bucket.acquire()
+    # 10 tokens at 50 per second once the burst is spent
+    assert time.monotonic() - start >= 0.15
+
+
+def test_token_bucket_is_shared_by_threads():
+    bucket = TokenBucket(rate=100, burst=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 20 tokens in total, 19 of them refilled at 100 per second
+    assert time.monotonic() - start >= 0.15
+
+
+def test_fetch_games_yields_every_game_and_reports_failures():
+    failures: dict = {}
+
+    def fetch(game_id: str) -> pd.DataFrame:
+        if game_id == "bad":
+            raise ValueError("unusable payload")
+        return pd.DataFrame({"gameId": [game_id]})
+
+    results = dict(fetch_games(["a", "bad", "b"], fetch, max_workers=2,
+                               rate_limiter=TokenBucket(rate=1000, burst=10),
+                               on_error=failures.__setitem__))
+    assert set(results) == {"a", "bad", "b"}
+    assert results["a"]["gameId"].tolist() == ["a"]
+    assert results["bad"].empty
+    assert list(failures) == ["bad"]
+
+
+def test_fetch_games_bounds_the_concurrent_requests():
+    lock = threading.Lock()
+    running: list = [0, 0]  # current, max
+
+    def fetch(game_id: str) -> pd.DataFrame:
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return pd.DataFrame({"gameId": [game_id]})
+
+    results = list(fetch_games([str(i) for i in range(30)], fetch, max_workers=3,
+                               rate_limiter=TokenBucket(rate=1000, burst=30)))
+    assert len(results) == 30
+    assert running[1] <= 3
+
+
+def test_fetch_games_cache_hits_skip_the_rate_limiter():
+    bucket = CountingBucket(rate=1000, burst=10)
+    cached = {"a": pd.DataFrame({"gameId": ["a"]})}
+    fetched: list = []
+
+    def fetch(game_id: str) -> pd.DataFrame:
+        fetched.append(game_id)
+        return pd.DataFrame({"gameId": [game_id]})
+
+    results = dict(fetch_games(["a", "b"], fetch, max_workers=2, rate_limiter=bucket, cache_fn=cached.get))
+    assert set(results) == {"a", "b"}
+    assert fetched == ["b"]
+    assert bucket.acquired == 1
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """
+    Record the backoff delays instead of sleeping.
+    """
+    delays: list = []
+    monkeypatch.setattr("common.fetch_engine.time.sleep", delays.append)
+    return delays
+
+
+def test_is_retryable_error_tells_transient_from_permanent_errors():
+    assert is_retryable_error(requests.exceptions.Timeout())
+    assert is_retryable_error(requests.exceptions.ConnectionError())
+    assert is_retryable_error(NbaApiError("throttled", status_code=429))
+    assert is_retryable_error(NbaApiError("server error", status_code=503))
+    assert not is_retryable_error(NbaApiError("not found", status_code=404))
+    assert not is_retryable_error(NbaApiError("unusable payload"))
+    assert is_retryable_error(NbaApiError("empty boxscore", status_code=200, retryable=True))
+    assert not is_retryable_error(ValueError("bad"))
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base_delay=1, max_delay=8) <= min(8, 2 ** attempt)
+
+
+def test_call_with_retry_retries_transient_errors(no_sleep):
+    calls: list = []
+
+    def flaky() -> str:
+        calls.append(1)
+        if len(calls) < 3:
+            raise requests.exceptions.Timeout()
+        return "ok"
+
+    attempts: list = []
+    assert call_with_retry(flaky, retries=3, base_delay=1, before_attempt=lambda: attempts.append(1)) == "ok"
+    assert len(calls) == 3
+    assert len(attempts) == 3
+    assert len(no_sleep) == 2
+
+
+def test_call_with_retry_gives_up_after_the_retries(no_sleep):
+    calls: list = []
+
+    def down() -> None:
+        calls.append(1)
+        raise NbaApiError("server error", status_code=500)
+
+    with pytest.raises(NbaApiError):
+        call_with_retry(down, retries=2, base_delay=1)
+    assert len(calls) == 3
+
+
+def test_call_with_retry_does_not_retry_permanent_errors(no_sleep):
+    calls: list = []
+
+    def missing() -> None:
+        calls.append(1)
+        raise NbaApiError("not found", status_code=404)
+
+    with pytest.raises(NbaApiError):
+        call_with_retry(missing, retries=3, base_delay=1)
+    assert len(calls) == 1
+    assert no_sleep == []
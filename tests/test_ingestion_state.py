@@ -0,0 +1,115 @@
+"""
+Tests of the ingestion state helpers (common/ingestion_state.py).
+"""
+import pandas as pd
+import requests
+
+from common.constants import dead_letter_max_failed_runs
+from common.fetch_engine import NbaApiError
+from common.ingestion_state import (load_dead_letter, save_dead_letter, order_with_dead_letter_first,
+                                    parked_game_ids, load_processed_game_ids, CheckpointWriter)
+from common.io_utils import save_database
+
+TableName: str = "nba_boxscore_basic"
+
+
+def run_ingestion(game_ids: list, failing: dict) -> list:
+    """
+    One ingestion run: order the games with the queue, fail the ones of `failing`, save the queue.
+    Returns:
+        list: The games fetched in this run.
+    """
+    queue_df = load_dead_letter(TableName, mode="local")
+    fetched: list = order_with_dead_letter_first(game_ids, queue_df)
+    save_dead_letter(TableName, {gid: failing[gid] for gid in fetched if gid in failing}, queue_df, mode="local")
+    return fetched
+
+
+def test_failed_games_are_retried_first(local_databases):
+    games = ["0022400001", "0022400002", "0022400003"]
+    run_ingestion(games, {"0022400003": requests.exceptions.Timeout("timeout")})
+
+    queue_df = load_dead_letter(TableName, mode="local")
+    assert queue_df["gameId"].tolist() == ["0022400003"]
+    assert bool(queue_df["retryable"].iloc[0])
+    assert order_with_dead_letter_first(games, queue_df) == ["0022400003", "0022400001", "0022400002"]
+
+
+def test_recovered_games_leave_the_queue(local_databases):
+    games = ["0022400001", "0022400002"]
+    run_ingestion(games, {"0022400002": requests.exceptions.Timeout("timeout")})
+    run_ingestion(games, {})
+    assert load_dead_letter(TableName, mode="local").empty
+
+
+def test_permanent_failures_are_not_fetched_again(local_databases):
+    games = ["0022400001", "0022400002"]
+    run_ingestion(games, {"0022400001": NbaApiError("not found", status_code=404)})
+
+    for _ in range(3):
+        assert run_ingestion(games, {}) == ["0022400002"]
+    # Kept in the queue for inspection
+    assert load_dead_letter(TableName, mode="local")["gameId"].tolist() == ["0022400001"]
+
+
+def test_retryable_failures_are_parked_after_the_max_failed_runs(local_databases):
+    games = ["0022400001"]
+    failing = {"0022400001": requests.exceptions.Timeout("timeout")}
+    runs = 0
+    while run_ingestion(games, failing):
+        runs += 1
+        assert runs <= dead_letter_max_failed_runs
+
+    assert runs == dead_letter_max_failed_runs
+    queue_df = load_dead_letter(TableName, mode="local")
+    assert int(queue_df["failed_runs"].iloc[0]) == dead_letter_max_failed_runs
+    assert parked_game_ids(queue_df) == {"0022400001"}
+
+
+def game(game_id: str) -> pd.DataFrame:
+    return pd.DataFrame({"gameId": [game_id, game_id], "personId": [1, 2],
+                         "game_date": pd.to_datetime(["2024-10-22", "2024-10-22"])})
+
+
+def test_checkpoint_flushes_every_n_games():
+    batches: list = []
+    checkpoint = CheckpointWriter(batches.append, every_games=2, every_seconds=3600)
+    for i in range(5):
+        checkpoint.add(game(f"002240000{i}"))
+    assert [batch["gameId"].nunique() for batch in batches] == [2, 2]
+
+    checkpoint.flush()
+    assert [batch["gameId"].nunique() for batch in batches] == [2, 2, 1]
+    assert checkpoint.games_flushed == 5
+
+    checkpoint.flush()
+    assert len(batches) == 3
+
+
+def test_checkpoint_flushes_after_t_seconds(monkeypatch):
+    now: list = [0.0]
+    monkeypatch.setattr("common.ingestion_state.time.monotonic", lambda: now[0])
+    batches: list = []
+    checkpoint = CheckpointWriter(batches.append, every_games=100, every_seconds=60)
+    checkpoint.add(game("0022400001"))
+    assert batches == []
+
+    now[0] = 61.0
+    checkpoint.add(game("0022400002"))
+    assert len(batches) == 1
+    assert checkpoint.games_flushed == 2
+
+
+def test_interrupted_run_resumes_from_the_last_checkpoint(local_databases):
+    def save(batch_df: pd.DataFrame) -> None:
+        save_database(batch_df, TableName, mode="local", write_disposition="WRITE_APPEND")
+
+    games = [f"002240000{i}" for i in range(1, 6)]
+    checkpoint = CheckpointWriter(save, every_games=2, every_seconds=3600)
+    for game_id in games[:3]:
+        checkpoint.add(game(game_id))
+    # The run stops here: the third game was not checkpointed yet
+
+    processed = load_processed_game_ids(TableName, mode="local", season=2024)
+    assert processed == set(games[:2])
+    assert [gid for gid in games if gid not in processed] == games[2:]
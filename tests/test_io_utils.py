@@ -0,0 +1,190 @@
+"""
+Tests of the storage helpers (common/io_utils.py): legacy CSV migration and WRITE_UPSERT
+(local, DuckDB, and the BigQuery MERGE against a mocked client).
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+from google.cloud import bigquery
+
+from common import io_utils
+from common.io_utils import BoxscoreFileName, load_data, save_database
+
+
+def legacy_boxscore_csv(rows: int = 600) -> pd.DataFrame:
+    """
+    Write a legacy databases/nba_boxscore_basic.csv (30 players per game, one game per day).
+    """
+    df = pd.DataFrame({
+        "gameId": [f"00224{i // 30:05d}" for i in range(rows)],
+        "personId": np.arange(rows) % 30,
+        "teamId": 1,
+        "points": np.arange(rows),
+        "game_date": pd.Timestamp("2024-10-22") + pd.to_timedelta(np.arange(rows) // 30, unit="D"),
+    })
+    os.makedirs(io_utils.databases_path, exist_ok=True)
+    df.to_csv(f"{io_utils.databases_path}{BoxscoreFileName}.csv", index=False)
+    return df
+
+
+def test_legacy_csv_is_migrated_on_first_access(local_databases):
+    csv_df = legacy_boxscore_csv()
+    df = load_data(BoxscoreFileName, mode="local")
+
+    assert len(df) == len(csv_df)
+    assert not os.path.exists(f"{io_utils.databases_path}{BoxscoreFileName}.csv")
+    assert os.path.isdir(f"{io_utils.databases_path}{BoxscoreFileName}")
+
+
+def test_concurrent_loaders_migrate_the_csv_once(local_databases):
+    csv_df = legacy_boxscore_csv()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        loaded = list(executor.map(lambda _: load_data(BoxscoreFileName, mode="local",
+                                                       columns=["gameId", "points"]), range(8)))
+
+    assert [len(df) for df in loaded] == [len(csv_df)] * 8
+    df = load_data(BoxscoreFileName, mode="local")
+    assert sorted(df["points"].tolist()) == csv_df["points"].tolist()
+    assert sorted(os.listdir(io_utils.databases_path)) == [BoxscoreFileName]
+
+
+def boxscore_rows(game_id: str, person_ids: list, points: int, game_date: str = "2024-11-01") -> pd.DataFrame:
+    return pd.DataFrame({"gameId": game_id, "personId": person_ids, "teamId": 1610612737,
+                         "points": points, "game_date": game_date})
+
+
+@pytest.mark.parametrize("mode", ["local", "duckdb"])
+def test_upsert_replaces_the_rows_of_the_incoming_games(local_databases, mode):
+    save_database(pd.concat([boxscore_rows("0022400001", [1, 2, 3], 10),
+                             boxscore_rows("0022400002", [1, 2, 3], 20, "2024-11-02")]),
+                  BoxscoreFileName, mode=mode, write_disposition="WRITE_UPSERT")
+    # Player 3 disappears from game 1 (e.g. a corrected boxscore)
+    save_database(boxscore_rows("0022400001", [1, 2], 11), BoxscoreFileName, mode=mode,
+                  write_disposition="WRITE_UPSERT")
+
+    df = load_data(BoxscoreFileName, mode=mode, columns=["gameId", "personId", "points"])
+    df = df.sort_values(["gameId", "personId"]).reset_index(drop=True)
+    assert df["gameId"].astype(str).tolist() == ["0022400001"] * 2 + ["0022400002"] * 3
+    assert df["personId"].astype(int).tolist() == [1, 2, 1, 2, 3]
+    assert df["points"].astype(int).tolist() == [11, 11, 20, 20, 20]
+
+
+@pytest.fixture
+def bq_client(monkeypatch) -> mock.MagicMock:
+    """
+    A mocked bigquery.Client where every table exists.
+    """
+    client = mock.MagicMock()
+    client.query.return_value.num_dml_affected_rows = 3
+    monkeypatch.setattr(io_utils.bigquery, "Client", lambda *args, **kwargs: client)
+    return client
+
+
+def merge_query(client: mock.MagicMock) -> tuple:
+    """
+    The last query sent to the client (whitespace collapsed) and its query parameters by name.
+    """
+    query: str = re.sub(r"\s+", " ", client.query.call_args.args[0]).strip()
+    parameters = client.query.call_args.kwargs["job_config"].query_parameters
+    return query, {parameter.name: parameter for parameter in parameters}
+
+
+def test_merge_upsert_sql(bq_client):
+    df = pd.DataFrame({"gameId": ["0022400001", "0022300002"], "personId": [1, 2], "points": [10, 20]})
+    affected: int = io_utils._merge_upsert(bq_client, df, "project.dataset.table", ["gameId", "personId"],
+                                           bigquery.LoadJobConfig(), partition_field="game_date")
+    assert affected == 3
+
+    staging_id: str = bq_client.load_table_from_dataframe.call_args.args[1]
+    assert staging_id.startswith("project.dataset.table_staging_")
+    query, parameters = merge_query(bq_client)
+    pruning = "T.`game_date` >= @first_day AND T.`game_date` < @end_day"
+    assert query == (
+        f"MERGE `project.dataset.table` T USING `{staging_id}` S "
+        f"ON T.`gameId` = S.`gameId` AND T.`personId` = S.`personId` AND {pruning} "
+        "WHEN MATCHED THEN UPDATE SET `points` = S.`points` "
+        "WHEN NOT MATCHED BY TARGET THEN INSERT (`gameId`, `personId`, `points`) "
+        "VALUES (`gameId`, `personId`, `points`) "
+        f"WHEN NOT MATCHED BY SOURCE AND T.gameId IN UNNEST(@game_ids) AND {pruning} THEN DELETE"
+    )
+    assert sorted(parameters["game_ids"].values) == ["0022300002", "0022400001"]
+    assert (str(parameters["first_day"].value), str(parameters["end_day"].value)) == ("2023-07-01", "2025-07-01")
+    bq_client.delete_table.assert_called_once_with(staging_id, not_found_ok=True)
+
+
+def test_merge_upsert_without_partition_field(bq_client):
+    df = pd.DataFrame({"gameId": ["0022400001"], "personId": [1], "points": [10]})
+    io_utils._merge_upsert(bq_client, df, "project.dataset.table", ["gameId", "personId"], bigquery.LoadJobConfig())
+    query, parameters = merge_query(bq_client)
+    assert "@first_day" not in query
+    assert "WHEN NOT MATCHED BY SOURCE AND T.gameId IN UNNEST(@game_ids) THEN DELETE" in query
+    assert list(parameters) == ["game_ids"]
+
+
+@pytest.mark.parametrize("failing_step", ["load", "merge"])
+def test_merge_upsert_drops_the_staging_table_on_failure(bq_client, failing_step):
+    if failing_step == "load":
+        bq_client.load_table_from_dataframe.return_value.result.side_effect = RuntimeError("load failed")
+    else:
+        bq_client.query.return_value.result.side_effect = RuntimeError("merge failed")
+    df = pd.DataFrame({"gameId": ["0022400001"], "personId": [1], "points": [10]})
+    with pytest.raises(RuntimeError):
+        io_utils._merge_upsert(bq_client, df, "project.dataset.table", ["gameId"], bigquery.LoadJobConfig())
+    staging_id: str = bq_client.load_table_from_dataframe.call_args.args[1]
+    bq_client.delete_table.assert_called_once_with(staging_id, not_found_ok=True)
+
+
+@pytest.mark.parametrize("key_columns, expected_on", [
+    (None, "T.`gameId` = S.`gameId` AND T.`personId` = S.`personId` AND T.`teamId` = S.`teamId`"),
+    (["gameId", "teamId"], "T.`gameId` = S.`gameId` AND T.`teamId` = S.`teamId`"),
+], ids=["upsert_key_columns", "explicit"])
+def test_save_database_upsert_keys(bq_client, key_columns, expected_on):
+    df = pd.DataFrame({"gameId": ["0022400001"], "personId": [1], "teamId": [1610612737], "points": [10]})
+    save_database(df, "nba_test_table", mode="bq", write_disposition="WRITE_UPSERT", key_columns=key_columns)
+    query, _ = merge_query(bq_client)
+    assert f"ON {expected_on} WHEN MATCHED" in query
+
+
+def test_save_database_upsert_key_columns_present_in_the_frame(bq_client):
+    df = pd.DataFrame({"gameId": ["0022400001"], "personId": [1], "points": [10]})
+    save_database(df, "nba_test_table", mode="bq", write_disposition="WRITE_UPSERT")
+    query, _ = merge_query(bq_client)
+    assert "ON T.`gameId` = S.`gameId` AND T.`personId` = S.`personId` WHEN MATCHED" in query
+    assert "`aud_modification_date` = S.`aud_modification_date`" in query
+
+
+def test_save_database_upsert_into_a_missing_table_is_a_plain_load(bq_client):
+    bq_client.get_table.side_effect = io_utils.NotFound("missing")
+    df = pd.DataFrame({"gameId": ["0022400001"], "personId": [1], "points": [10]})
+    save_database(df, "nba_test_table", mode="bq", write_disposition="WRITE_UPSERT")
+    bq_client.query.assert_not_called()
+    assert bq_client.load_table_from_dataframe.call_args.args[1] == "ml-nba-project.nba_dataset.nba_test_table"
+
+
+@pytest.mark.parametrize("mode", ["local", "duckdb"])
+def test_load_last_rows_since(local_databases, mode):
+    save_database(pd.concat([boxscore_rows(f"00224000{day:02d}", [1, 2], day, f"2024-11-{day:02d}")
+                             for day in range(1, 11)] + [boxscore_rows("0022400011", [3], 11, "2024-11-02")]),
+                  BoxscoreFileName, mode=mode, write_disposition="WRITE_APPEND")
+
+    df = io_utils.load_last_rows(BoxscoreFileName, mode=mode, limit=2, columns=["personId", "points"],
+                                 since="2024-11-08")
+    points = df.sort_values(["personId", "points"]).groupby("personId")["points"].apply(
+        lambda x: x.astype(int).tolist()).to_dict()
+    # The last 2 games of each player, or every game since 2024-11-08 when there are more
+    assert points == {1: [8, 9, 10], 2: [8, 9, 10], 3: [11]}
+
+
+def test_load_last_rows_passes_since_as_a_query_parameter(bq_client):
+    io_utils.load_last_rows(BoxscoreFileName, mode="bq", limit=20, columns=["personId", "points"],
+                            not_null_column="minutes", since="2024-11-08")
+    query, parameters = merge_query(bq_client)
+    assert "2024-11-08" not in query
+    assert query.endswith("ORDER BY `game_date` DESC) <= 20 OR `game_date` >= @since")
+    assert parameters["since"].type_ == "DATE"
+    assert str(parameters["since"].value) == "2024-11-08"
@@ -0,0 +1,154 @@
+"""
+Tests of the local Parquet store (common/parquet_store.py).
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from common import parquet_store
+
+TableName: str = "nba_boxscore_basic"
+
+
+def games(game_ids: list, points: int = 10, players: int = 2) -> pd.DataFrame:
+    """
+    Rows of the given games (gameId 00224000NN is played on 2024-10-NN).
+    """
+    rows: list = []
+    for game_id in game_ids:
+        for person_id in range(1, players + 1):
+            rows.append({"gameId": game_id, "personId": person_id, "points": points,
+                         "game_date": pd.Timestamp(f"2024-10-{game_id[-2:]}")})
+    return pd.DataFrame(rows)
+
+
+def write(path: str, df: pd.DataFrame, write_disposition: str, **kwargs) -> None:
+    parquet_store.write_table(df, path, TableName, date_column="game_date",
+                              write_disposition=write_disposition, **kwargs)
+
+
+def read(path: str, **kwargs) -> pd.DataFrame:
+    df = parquet_store.read_table(path, TableName, **kwargs)
+    return df.sort_values([c for c in ("gameId", "personId") if c in df.columns]).reset_index(drop=True)
+
+
+def partition_files(path: str, game_date: str) -> list:
+    return parquet_store._partition_files(parquet_store._partition_dir(os.path.join(path, TableName), 2024, game_date))
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    return str(tmp_path / "databases")
+
+
+def test_truncate_writes_partitions_and_reads_with_filters(path):
+    write(path, games(["0022400021", "0022400022"]), "WRITE_TRUNCATE")
+    assert os.path.isdir(os.path.join(path, TableName, "part_season=2024", "part_game_date=2024-10-21"))
+
+    df = read(path)
+    assert len(df) == 4
+    assert df["gameId"].tolist() == ["0022400021"] * 2 + ["0022400022"] * 2
+
+    filtered = read(path, columns=["gameId", "points"], filters=[("game_date", ">=", "2024-10-22")])
+    assert filtered.columns.tolist() == ["gameId", "points"]
+    assert filtered["gameId"].unique().tolist() == ["0022400022"]
+    assert read(path, filters=[("season", "=", 2023)]).empty
+
+
+def test_truncate_replaces_the_table(path):
+    write(path, games(["0022400021", "0022400022"]), "WRITE_TRUNCATE")
+    write(path, games(["0022400023"], points=30), "WRITE_TRUNCATE")
+
+    df = read(path)
+    assert df["gameId"].unique().tolist() == ["0022400023"]
+    assert df["points"].unique().tolist() == [30]
+    # No temporary or backup dataset left behind
+    assert sorted(os.listdir(path)) == [TableName]
+
+
+def test_failed_truncate_keeps_the_previous_rows(path, monkeypatch):
+    write(path, games(["0022400021"]), "WRITE_TRUNCATE")
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(parquet_store, "_write_partitions", crash)
+    with pytest.raises(OSError):
+        write(path, games(["0022400022"]), "WRITE_TRUNCATE")
+
+    assert read(path)["gameId"].unique().tolist() == ["0022400021"]
+    assert sorted(os.listdir(path)) == [TableName]
+
+
+def test_truncate_interrupted_between_the_renames_is_restored(path, monkeypatch):
+    write(path, games(["0022400021"]), "WRITE_TRUNCATE")
+    rename = os.rename
+
+    def crash_on_second_rename(src, dst):
+        if os.path.basename(src).startswith(f".{TableName}.new-"):
+            raise OSError("killed")
+        rename(src, dst)
+
+    monkeypatch.setattr(parquet_store.os, "rename", crash_on_second_rename)
+    with pytest.raises(OSError):
+        write(path, games(["0022400022"]), "WRITE_TRUNCATE")
+    monkeypatch.setattr(parquet_store.os, "rename", rename)
+
+    assert not os.path.isdir(os.path.join(path, TableName))
+    assert parquet_store.table_exists(path, TableName)
+    assert read(path)["gameId"].unique().tolist() == ["0022400021"]
+
+
+def test_append_adds_files_without_rewriting_the_others(path):
+    write(path, games(["0022400021"]), "WRITE_TRUNCATE")
+    before = partition_files(path, "2024-10-21")
+    write(path, games(["0022400022"]), "WRITE_APPEND")
+
+    assert partition_files(path, "2024-10-21") == before
+    assert len(partition_files(path, "2024-10-22")) == 1
+    assert read(path)["gameId"].unique().tolist() == ["0022400021", "0022400022"]
+
+
+def test_append_replaces_the_rows_of_the_incoming_games(path):
+    write(path, games(["0022400021", "0022400022"]), "WRITE_TRUNCATE")
+    write(path, games(["0022400022"], points=40, players=3), "WRITE_APPEND")
+
+    df = read(path)
+    assert len(df) == 5
+    assert df.loc[df["gameId"] == "0022400021", "points"].unique().tolist() == [10]
+    assert df.loc[df["gameId"] == "0022400022", "points"].tolist() == [40, 40, 40]
+
+
+def test_delete_game_ids_only_rewrites_their_partitions(path):
+    write(path, games(["0022400021", "0022400022"]), "WRITE_TRUNCATE")
+    untouched = partition_files(path, "2024-10-21")
+
+    assert parquet_store.delete_game_ids(path, TableName, {"0022400022"}) == 2
+    assert parquet_store.delete_game_ids(path, TableName, {"0022400099"}) == 0
+    assert partition_files(path, "2024-10-21") == untouched
+    # The emptied partition is removed
+    assert partition_files(path, "2024-10-22") == []
+    assert read(path)["gameId"].unique().tolist() == ["0022400021"]
+
+
+def test_compact_merges_the_small_files_of_a_partition(path):
+    # Several games on the same date: one file per append
+    for game_id in ("0022400121", "0022400221", "0022400321"):
+        write(path, games([game_id]).assign(game_date=pd.Timestamp("2024-10-21")), "WRITE_APPEND",
+              compact_above=10)
+    assert len(partition_files(path, "2024-10-21")) == 3
+    before = read(path)
+
+    assert parquet_store.compact_table(path, TableName) == 1
+    assert len(partition_files(path, "2024-10-21")) == 1
+    pd.testing.assert_frame_equal(read(path), before)
+    assert parquet_store.compact_table(path, TableName) == 0
+
+
+def test_append_compacts_partitions_above_the_threshold(path):
+    for game_id in ("0022400121", "0022400221", "0022400321"):
+        write(path, games([game_id]).assign(game_date=pd.Timestamp("2024-10-21")), "WRITE_APPEND",
+              compact_above=2)
+    assert len(partition_files(path, "2024-10-21")) == 1
+    assert len(read(path)) == 6
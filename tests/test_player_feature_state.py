@@ -0,0 +1,133 @@
+"""
+Tests of the incremental player feature state (src/update_player_feature_state.py):
+an update applying the new games must give the tables of a rebuild from the full history.
+"""
+import pandas as pd
+import pytest
+
+from common.io_utils import (load_data, save_database, BoxscoreFileName, AdvancedBoxscoreFileName, PlayersFileName,
+                             PlayerFeaturesFileName, PlayerFeatureWindowFileName, PlayerFeatureStateFileName,
+                             OpponentPositionDailyFileName, OpponentPositionStatsFileName)
+from common.rolling import opponent_position_averages
+from common.singleton_meta import SingletonMeta
+from src import update_player_feature_state
+from src.get_predictions_stats_points import PredictionsStatsPoints
+from src.update_player_feature_state import PlayerFeatureState
+
+# Sort keys of each state table (their row order is not part of the state)
+StateTables: dict = {
+    PlayerFeaturesFileName: ["personId"],
+    PlayerFeatureWindowFileName: ["personId", "game_date", "gameId"],
+    OpponentPositionDailyFileName: ["position_group", "opponent", "game_date"],
+    OpponentPositionStatsFileName: ["position_group", "opponent"],
+}
+
+
+@pytest.fixture(autouse=True)
+def no_overlap(monkeypatch):
+    """
+    Only the rows saved after the watermark are read again (the tests save them right after).
+    """
+    monkeypatch.setattr(update_player_feature_state, "feature_state_overlap_seconds", 0)
+
+
+def run_state(mode: str, rebuild: bool = False, create: bool = True) -> None:
+    SingletonMeta._instances.clear()
+    PlayerFeatureState(save_mode=mode, rebuild=rebuild).run(create=create)
+
+
+def state_tables(mode: str) -> dict:
+    tables: dict = {}
+    for table_name, keys in StateTables.items():
+        df = load_data(table_name, mode=mode)
+        df = df.drop(columns=["aud_modification_date"], errors="ignore")
+        tables[table_name] = df.sort_values(keys).reset_index(drop=True)
+    return tables
+
+
+def assert_same_tables(actual: dict, expected: dict) -> None:
+    for table_name, expected_df in expected.items():
+        pd.testing.assert_frame_equal(actual[table_name][expected_df.columns], expected_df,
+                                      check_dtype=False, rtol=1e-9, obj=table_name)
+
+
+def save_games(mode: str, df: pd.DataFrame, table_name: str) -> None:
+    save_database(df.copy(), table_name, mode=mode, write_disposition="WRITE_UPSERT")
+
+
+def test_build_keeps_the_last_games_of_each_player(league):
+    mode, saved = league
+    run_state(mode)
+    window_df = load_data(PlayerFeatureWindowFileName, mode=mode)
+    features_df = load_data(PlayerFeaturesFileName, mode=mode)
+
+    assert window_df.groupby("personId").size().max() == 20
+    assert features_df["personId"].is_unique
+    assert set(features_df["personId"]) == set(saved["boxscore"].dropna(subset=["minutes"])["personId"])
+    seasons = load_data(PlayerFeatureStateFileName, mode=mode)["seasons"].iloc[0]
+    assert seasons == "2023,2024"
+
+
+def test_update_with_new_games_matches_a_rebuild(league):
+    mode, saved = league
+    run_state(mode, rebuild=True)
+    expected = state_tables(mode)
+
+    # Remove the games of the last 3 dates, build the state without them, then ingest them again
+    last_dates = sorted(saved["boxscore"]["game_date"].unique())[-3:]
+    new_games = saved["boxscore"].loc[saved["boxscore"]["game_date"].isin(last_dates), "gameId"].unique()
+    for table_name, key in ((BoxscoreFileName, "boxscore"), (AdvancedBoxscoreFileName, "advanced_boxscore")):
+        save_database(saved[key][~saved[key]["gameId"].isin(new_games)].copy(), table_name, mode=mode,
+                      write_disposition="WRITE_TRUNCATE")
+    run_state(mode, rebuild=True)
+
+    # The daily ingestion saves the boxscores first, then the advanced boxscores
+    save_games(mode, saved["boxscore"][saved["boxscore"]["gameId"].isin(new_games)], BoxscoreFileName)
+    run_state(mode, create=False)
+    save_games(mode, saved["advanced_boxscore"][saved["advanced_boxscore"]["gameId"].isin(new_games)],
+               AdvancedBoxscoreFileName)
+    run_state(mode, create=False)
+
+    assert_same_tables(state_tables(mode), expected)
+
+
+def test_update_with_corrected_games_matches_a_rebuild(league):
+    mode, saved = league
+    run_state(mode, rebuild=True)
+
+    # A stat correction of already applied games
+    corrected_games = saved["boxscore"]["gameId"].unique()[-4:]
+    corrected_df = saved["boxscore"][saved["boxscore"]["gameId"].isin(corrected_games)].copy()
+    corrected_df["points"] = corrected_df["points"] + 7
+    corrected_df["fieldGoalsMade"] = corrected_df["fieldGoalsMade"] + 1
+    save_games(mode, corrected_df, BoxscoreFileName)
+    run_state(mode, create=False)
+    updated = state_tables(mode)
+
+    run_state(mode, rebuild=True)
+    assert_same_tables(updated, state_tables(mode))
+
+
+def test_update_without_new_games_changes_nothing(league):
+    mode, _ = league
+    run_state(mode)
+    before = state_tables(mode)
+    run_state(mode, create=False)
+    assert_same_tables(state_tables(mode), before)
+
+
+def test_defense_table_matches_the_full_history_aggregates(league):
+    mode, _ = league
+    run_state(mode)
+    # The stored tables (compact dtypes), as the predictions read them
+    played_df = PredictionsStatsPoints.prepare_rows(PredictionsStatsPoints.join_historical_stats(
+        load_data(BoxscoreFileName, mode=mode), load_data(AdvancedBoxscoreFileName, mode=mode),
+        load_data(PlayersFileName, mode=mode)))
+    expected = opponent_position_averages(played_df, value_column="points", windows=(10, 20))
+
+    keys = ["position_group", "opponent"]
+    defense_df = load_data(OpponentPositionStatsFileName, mode=mode)
+    defense_df = defense_df.drop(columns=["aud_modification_date"], errors="ignore")
+    pd.testing.assert_frame_equal(defense_df.sort_values(keys).reset_index(drop=True)[expected.columns],
+                                  expected.sort_values(keys).reset_index(drop=True),
+                                  check_dtype=False, rtol=1e-9)
@@ -0,0 +1,125 @@
+"""
+Tests of the features of the points predictions (src/get_predictions_stats_points.py): the
+optimized loading paths must give the features of the full history of the whole league.
+"""
+import pandas as pd
+import pytest
+
+from common.io_utils import (load_data, BoxscoreFileName, AdvancedBoxscoreFileName, PlayersFileName,
+                             ScheduleFileName)
+from common.singleton_meta import SingletonMeta
+from src.get_predictions_stats_points import PredictionsStatsPoints
+from src.update_player_feature_state import PlayerFeatureState
+from tests.conftest import SlateDate
+
+
+def keyed_features(future_games_df: pd.DataFrame, X_pred: pd.DataFrame) -> pd.DataFrame:
+    """
+    The model inputs with their (gameId, person_id), in a stable order.
+    """
+    features_df = X_pred.reset_index(drop=True).copy()
+    features_df.insert(0, "person_id", future_games_df["person_id"].to_numpy())
+    features_df.insert(0, "gameId", future_games_df["gameId"].astype(str).to_numpy())
+    return features_df.sort_values(["gameId", "person_id"]).reset_index(drop=True)
+
+
+def predicted_features(mode: str, **kwargs) -> pd.DataFrame:
+    """
+    The model inputs of the slate, loaded as the predictions process does.
+    """
+    SingletonMeta._instances.clear()
+    predictions = PredictionsStatsPoints(save_mode=mode, date=SlateDate, model_path="model.pkl", **kwargs)
+    return keyed_features(*predictions.transform_data(predictions.load_data()))
+
+
+def full_history_features(mode: str) -> pd.DataFrame:
+    """
+    The reference: every boxscore of the league joined and rolled in pandas (no pushdown,
+    no lookback, no slate restriction).
+    """
+    SingletonMeta._instances.clear()
+    predictions = PredictionsStatsPoints(save_mode=mode, date=SlateDate, model_path="model.pkl")
+    data_map: dict = {
+        "players": load_data(PlayersFileName, mode=mode, columns=predictions.players_columns),
+        "schedule": load_data(ScheduleFileName, mode=mode, columns=predictions.schedule_columns),
+        "simple_boxscore": load_data(BoxscoreFileName, mode=mode, columns=predictions.boxscore_columns),
+        "advanced_boxscore": load_data(AdvancedBoxscoreFileName, mode=mode,
+                                       columns=predictions.advanced_boxscore_columns),
+    }
+    return keyed_features(*predictions.transform_data(data_map))
+
+
+def assert_same_features(actual: pd.DataFrame, expected: pd.DataFrame, rtol: float = 1e-9) -> None:
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=rtol)
+
+
+def reference_rtol(mode: str) -> float:
+    """
+    DuckDB computes the opponent position aggregates in SQL, summing the float32 stats in DOUBLE,
+    where pandas sums them in float32: the two only agree to float32 precision.
+    """
+    return 1e-9 if mode == "local" else 1e-6
+
+
+@pytest.mark.parametrize("lookback", [
+    {"lookback_games": 20},
+    {"lookback_games": 30},
+    # Fewer games in the window than the largest rolling period: extended per player
+    {"lookback_days": 5},
+    {"lookback_days": 5, "lookback_games": 25},
+], ids=["games_20", "games_30", "days_5", "days_5_games_25"])
+def test_lookback_features_match_the_full_history(league, lookback):
+    mode, _ = league
+    features_df: pd.DataFrame = predicted_features(mode, **lookback)
+    assert_same_features(features_df, full_history_features(mode), rtol=reference_rtol(mode))
+    assert_same_features(features_df, predicted_features(mode))
+
+
+def test_lookback_without_the_defense_table(league, capsys):
+    mode, _ = league
+    features_df = predicted_features(mode, lookback_games=20)
+    if mode == "local":
+        assert "No opponent position defense table" in capsys.readouterr().out
+    assert_same_features(features_df, full_history_features(mode), rtol=reference_rtol(mode))
+
+
+def test_lookback_games_below_the_largest_rolling_period_is_rejected():
+    with pytest.raises(ValueError):
+        PredictionsStatsPoints(save_mode="local", date=SlateDate, model_path="model.pkl", lookback_games=10)
+
+
+def test_only_the_history_of_the_slate_players_is_loaded(league):
+    mode, saved = league
+    SingletonMeta._instances.clear()
+    predictions = PredictionsStatsPoints(save_mode=mode, date=SlateDate, model_path="model.pkl")
+    data_map: dict = predictions.load_data()
+    schedule_df: pd.DataFrame = saved["schedule"]
+    slate_df: pd.DataFrame = schedule_df[schedule_df["gameDate"] == pd.Timestamp(SlateDate)]
+    slate_teams: set = set(slate_df["homeTeam_teamId"]) | set(slate_df["awayTeam_teamId"])
+    players_df: pd.DataFrame = saved["players"]
+    slate_players: set = set(players_df.loc[players_df["team_id"].isin(slate_teams), "person_id"].astype(int))
+    history_keys: list = [key for key in ("simple_boxscore", "advanced_boxscore", "historical_stats") if key in data_map]
+    assert history_keys
+    for key in history_keys:
+        person_ids: pd.Series = data_map[key]["personId"].astype(int)
+        assert set(person_ids) == slate_players
+        assert len(person_ids) < len(saved["boxscore"])
+
+
+def test_slate_features_match_the_whole_league(league):
+    mode, _ = league
+    assert_same_features(predicted_features(mode), full_history_features(mode), rtol=reference_rtol(mode))
+
+
+def build_feature_state(mode: str) -> None:
+    SingletonMeta._instances.clear()
+    PlayerFeatureState(save_mode=mode).run(create=True)
+
+
+@pytest.mark.parametrize("options", [{"feature_state": True}, {"lookback_games": 20}, {"lookback_days": 5}],
+                         ids=["feature_state", "lookback_games", "lookback_days"])
+def test_features_with_the_feature_state_tables_match_the_full_history(league, options):
+    mode, _ = league
+    build_feature_state(mode)
+    assert_same_features(predicted_features(mode, **options), full_history_features(mode), rtol=reference_rtol(mode))
@@ -0,0 +1,157 @@
+"""
+Tests of the raw NBA API response cache (common/raw_cache.py) and of the boxscore checks
+deciding what gets cached.
+"""
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from nba_api.stats.endpoints import boxscoretraditionalv3
+from nba_api.stats.library.http import NBAStatsHTTP, NBAStatsResponse
+
+from common.fetch_engine import NbaApiError, request_endpoint, check_boxscore
+from common.ingestion_state import load_dead_letter
+from common.io_utils import BoxscoreFileName
+from common.raw_cache import RawResponseCache, load_cached_endpoint, store_endpoint_response
+from src.get_nba_boxscore_basic import BoxscoreGames
+
+Endpoint = boxscoretraditionalv3.BoxScoreTraditionalV3
+GameId: str = "0022400001"
+
+
+def boxscore_payload(game_id: str, players: dict) -> str:
+    """
+    A BoxScoreTraditionalV3 response: players is {teamId: [personId, ...]} (home team first).
+    """
+    def team(team_id: int, person_ids: list) -> dict:
+        return {"teamId": team_id, "teamCity": "City", "teamName": "Team", "teamTricode": "TEA", "teamSlug": "team",
+                "statistics": {"points": 10 * len(person_ids)},
+                "players": [{"personId": person_id, "firstName": "First", "familyName": "Last", "nameI": "F. Last",
+                             "playerSlug": f"player-{person_id}", "position": "G", "comment": "", "jerseyNum": "1",
+                             "statistics": {"minutes": "24:00", "points": 10, "fieldGoalsMade": 4}}
+                            for person_id in person_ids]}
+
+    (home_id, home_players), (away_id, away_players) = list(players.items()) + [(None, [])] * (2 - len(players))
+    return json.dumps({"boxScoreTraditional": {"gameId": game_id, "homeTeamId": home_id, "awayTeamId": away_id,
+                                               "homeTeam": team(home_id, home_players),
+                                               "awayTeam": team(away_id, away_players)}})
+
+
+@pytest.fixture
+def cache(tmp_path) -> RawResponseCache:
+    """
+    The process-wide cache, in tmp_path.
+    """
+    return RawResponseCache(cache_dir=str(tmp_path / "raw_cache"), max_bytes=10 ** 9)
+
+
+@pytest.fixture
+def nba_api(monkeypatch) -> dict:
+    """
+    A fake NBA API: {game_id: payload} served by every endpoint, counting the requests.
+    """
+    responses: dict = {"requests": 0}
+
+    def send_api_request(self, endpoint, parameters, **kwargs):
+        responses["requests"] += 1
+        return NBAStatsResponse(response=responses[parameters["GameID"]], status_code=200, url=None)
+
+    monkeypatch.setattr(NBAStatsHTTP, "send_api_request", send_api_request)
+    return responses
+
+
+def test_round_trip(cache):
+    assert cache.get("endpoint", GameId) is None
+    cache.put("endpoint", GameId, '{"a": 1}')
+    assert cache.get("endpoint", GameId) == '{"a": 1}'
+    assert cache.get("other_endpoint", GameId) is None
+
+    cache.put("endpoint", GameId, '{"a": 2}')
+    assert cache.get("endpoint", GameId) == '{"a": 2}'
+    cache.delete("endpoint", GameId)
+    assert cache.get("endpoint", GameId) is None
+
+
+def test_eviction_drops_the_least_recently_used_down_to_90_percent(tmp_path):
+    contents: str = os.urandom(2000).hex()  # incompressible
+    cache = RawResponseCache(cache_dir=str(tmp_path / "raw_cache"), max_bytes=10 ** 9)
+    for i in range(10):
+        cache.put("endpoint", f"game-{i}", contents)
+        os.utime(cache._path("endpoint", f"game-{i}"), (1000 + i, 1000 + i))
+    entry_size: int = os.path.getsize(cache._path("endpoint", "game-0"))
+
+    # game-0 is the oldest write but was read last
+    cache.get("endpoint", "game-0")
+    cache.max_bytes = 10 * entry_size
+    cache.put("endpoint", "game-10", contents)
+
+    kept: list = [i for i in range(11) if cache.get("endpoint", f"game-{i}") is not None]
+    assert kept == [0, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert sum(size for _, size, _ in cache._files()) <= 0.9 * cache.max_bytes
+    assert cache._size == sum(size for _, size, _ in cache._files())
+
+
+def test_cached_endpoint_parses_like_the_live_one(cache, nba_api):
+    nba_api[GameId] = boxscore_payload(GameId, {1610612737: [1, 2], 1610612738: [3]})
+    live = request_endpoint(Endpoint, game_id=GameId)
+    store_endpoint_response(live, GameId)
+
+    cached = load_cached_endpoint(Endpoint, GameId)
+    assert nba_api["requests"] == 1
+    assert len(cached.get_data_frames()) == len(live.get_data_frames())
+    for cached_df, live_df in zip(cached.get_data_frames(), live.get_data_frames()):
+        pd.testing.assert_frame_equal(cached_df, live_df)
+
+
+def test_unreadable_cache_entry_is_evicted(cache):
+    cache.put(Endpoint.endpoint, GameId, "not json")
+    assert load_cached_endpoint(Endpoint, GameId) is None
+    assert cache.get(Endpoint.endpoint, GameId) is None
+
+
+@pytest.mark.parametrize("players", [{}, {1610612737: [1, 2]}, {1610612737: [], 1610612738: [3]}],
+                         ids=["empty", "one_team", "one_team_with_players"])
+def test_incomplete_boxscores_are_rejected(players):
+    endpoint = Endpoint(game_id=GameId, get_request=False)
+    endpoint.nba_response = NBAStatsResponse(response=boxscore_payload(GameId, players), status_code=200, url=None)
+    endpoint.load_response()
+    with pytest.raises(NbaApiError) as error:
+        check_boxscore(endpoint.get_data_frames()[0], GameId)
+    assert error.value.retryable
+
+
+def test_boxscore_of_another_game_is_rejected():
+    boxscore_df = pd.DataFrame({"gameId": ["0022400002"] * 2, "teamId": [1, 2], "personId": [1, 2]})
+    with pytest.raises(NbaApiError):
+        check_boxscore(boxscore_df, GameId)
+
+
+def test_empty_response_is_not_cached(cache, nba_api):
+    nba_api[GameId] = boxscore_payload(GameId, {})
+    with pytest.raises(NbaApiError):
+        BoxscoreGames.request_boxscore(GameId, None)
+    assert cache.get(Endpoint.endpoint, GameId) is None
+
+    nba_api[GameId] = boxscore_payload(GameId, {1610612737: [1, 2], 1610612738: [3]})
+    assert len(BoxscoreGames.request_boxscore(GameId, None)) == 3
+    assert len(BoxscoreGames.cached_boxscore(GameId)) == 3
+
+
+def test_empty_cache_entry_is_evicted(cache):
+    cache.put(Endpoint.endpoint, GameId, boxscore_payload(GameId, {}))
+    assert BoxscoreGames.cached_boxscore(GameId) is None
+    assert cache.get(Endpoint.endpoint, GameId) is None
+
+
+def test_empty_boxscore_goes_to_the_dead_letter(local_databases, cache, monkeypatch):
+    monkeypatch.setattr(BoxscoreGames, "request_boxscore", staticmethod(lambda game_id, proxy: pd.DataFrame()))
+    schedule_df = pd.DataFrame({"game_id": [GameId], "game_status": ["3"]})
+    games = BoxscoreGames(current_season="2024-25", save_mode="local")
+    assert games.get_boxscore_data(schedule_df) == 0
+
+    dead_letter_df = load_dead_letter(BoxscoreFileName, mode="local")
+    assert dead_letter_df["gameId"].tolist() == [GameId]
+    assert "empty boxscore" in dead_letter_df["error"].iloc[0]
+    assert bool(dead_letter_df["retryable"].iloc[0])
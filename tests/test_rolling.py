@@ -0,0 +1,131 @@
+"""
+Tests of the vectorized rolling engine (common/rolling.py) against the pandas references.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.rolling import (grouped_rolling_mean, opponent_position_daily, opponent_position_aggregates,
+                            opponent_position_averages)
+
+
+@pytest.fixture
+def history() -> pd.DataFrame:
+    """
+    Unsorted rows of 40 players: missing values, an infinite value, a missing player, values of mixed
+    magnitudes, repeated values and a column of negative values.
+    """
+    rng = np.random.default_rng(0)
+    rows = 3000
+    df = pd.DataFrame({
+        "personId": rng.integers(0, 40, rows).astype("float64"),
+        "game_date": pd.Timestamp("2023-10-01") + pd.to_timedelta(rng.permutation(rows), unit="h"),
+        "points_per36": rng.normal(15, 8, rows) * rng.choice([1.0, 1e3], rows),
+        "usage_per36": rng.random(rows),
+        "repeated": rng.choice([0.1, 0.3, -0.2], rows),
+        "negative": -rng.random(rows),
+    })
+    df.loc[rng.random(rows) < 0.05, "points_per36"] = np.nan
+    df.loc[7, "usage_per36"] = np.inf
+    df.loc[11, "personId"] = np.nan
+    return df
+
+
+def pandas_rolling_mean(df: pd.DataFrame, column: str, window: int) -> pd.Series:
+    """
+    The reference the engine replaces: one groupby / rolling per column and window.
+    """
+    ordered = df.sort_values(["personId", "game_date"], kind="mergesort")
+    return (ordered.groupby("personId")[column]
+            .transform(lambda x: x.rolling(window, min_periods=1).mean())
+            .reindex(df.index))
+
+
+@pytest.mark.parametrize("windows", [[5, 10, 20], [20, 1, 3]])
+def test_grouped_rolling_mean_is_identical_to_pandas(history, windows):
+    columns = ["points_per36", "usage_per36", "repeated", "negative"]
+    result = grouped_rolling_mean(history, columns, windows)
+
+    assert list(result.columns) == [f"{c}_rolling_{w}" for w in sorted(windows) for c in columns]
+    assert result.index.equals(history.index)
+    for column in columns:
+        for window in windows:
+            expected = pandas_rolling_mean(history, column, window)
+            # Bit for bit, not up to rounding
+            np.testing.assert_array_equal(result[f"{column}_rolling_{window}"].to_numpy(), expected.to_numpy())
+
+
+def test_grouped_rolling_mean_does_not_depend_on_the_row_order(history):
+    shuffled = history.sample(frac=1, random_state=1)
+    result = grouped_rolling_mean(shuffled, ["points_per36"], [10]).reindex(history.index)
+    expected = grouped_rolling_mean(history, ["points_per36"], [10])
+    np.testing.assert_array_equal(result.to_numpy(), expected.to_numpy())
+
+
+def test_grouped_rolling_mean_of_a_single_row():
+    df = pd.DataFrame({"personId": [1], "game_date": [pd.Timestamp("2024-10-22")], "points": [12.0]})
+    assert grouped_rolling_mean(df, ["points"], [5])["points_rolling_5"].tolist() == [12.0]
+
+
+def test_grouped_rolling_mean_of_no_rows():
+    df = pd.DataFrame({"personId": [], "game_date": pd.to_datetime([]), "points": []})
+    result = grouped_rolling_mean(df, ["points"], [5, 10])
+    assert list(result.columns) == ["points_rolling_5", "points_rolling_10"]
+    assert result.empty
+
+
+@pytest.fixture
+def league() -> pd.DataFrame:
+    """
+    Points of the players of 3 position groups against 6 opponents over 40 dates.
+    """
+    rng = np.random.default_rng(2)
+    rows = 4000
+    return pd.DataFrame({
+        "position_group": rng.choice(["G", "F", "C"], rows),
+        "opponent": rng.integers(1, 7, rows),
+        "game_date": pd.Timestamp("2024-10-22") + pd.to_timedelta(rng.integers(0, 40, rows), unit="D"),
+        "points": rng.integers(0, 40, rows).astype("float64"),
+    })
+
+
+def pandas_opponent_position_averages(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The reference the aggregates replace: a per-date mean, then tail(N).mean() per group.
+    """
+    per_date = (df.groupby(["position_group", "opponent", "game_date"])["points"].mean()
+                .reset_index(name="avg_points").sort_values("game_date"))
+    return (per_date.groupby(["position_group", "opponent"])
+            .agg(avg_pts_opp_position_last_10=("avg_points", lambda x: x.tail(10).mean()),
+                 avg_pts_opp_position_last_20=("avg_points", lambda x: x.tail(20).mean()),
+                 avg_pts_opp_position_all=("avg_points", "mean"))
+            .reset_index())
+
+
+def test_opponent_position_averages_match_the_groupby_reference(league):
+    result = opponent_position_averages(league, value_column="points", windows=(10, 20))
+    expected = pandas_opponent_position_averages(league)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, rtol=1e-12)
+
+
+def test_opponent_position_averages_as_of_each_date(league):
+    result = opponent_position_averages(league, value_column="points", windows=(10, 20), as_of_date=True)
+    keys = ["position_group", "opponent", "game_date"]
+    assert len(result) == len(league[keys].drop_duplicates())
+
+    for game_date in sorted(league["game_date"].unique())[::7]:
+        expected = pandas_opponent_position_averages(league[league["game_date"] <= game_date])
+        as_of = result[result["game_date"] <= game_date].groupby(["position_group", "opponent"]).tail(1)
+        merged = expected.merge(as_of, on=["position_group", "opponent"], suffixes=("", "_as_of"))
+        assert len(merged) == len(expected)
+        for column in ("avg_pts_opp_position_last_10", "avg_pts_opp_position_last_20", "avg_pts_opp_position_all"):
+            np.testing.assert_allclose(merged[f"{column}_as_of"], merged[column], rtol=1e-12)
+
+
+def test_opponent_position_daily_tables_can_be_updated_by_date(league):
+    # The daily table of the old dates plus the one of the new dates gives the same aggregates
+    cutoff = pd.Timestamp("2024-11-20")
+    daily_df = pd.concat([opponent_position_daily(league[league["game_date"] < cutoff]),
+                          opponent_position_daily(league[league["game_date"] >= cutoff])])
+    pd.testing.assert_frame_equal(opponent_position_aggregates(daily_df),
+                                  opponent_position_averages(league), rtol=1e-12)
@@ -0,0 +1,45 @@
+"""
+Tests of the vectorized feature helpers (common/utils.py): same results as the scalar parsers.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.utils import extract_season, parse_minutes, extract_season_series, parse_minutes_series
+
+
+def scalar_results(values: list, parser) -> list:
+    return [np.nan if result is None else result for result in map(parser, values)]
+
+
+@pytest.mark.parametrize("game_ids", [
+    ["0022400123", "0042300001", "22400123", "0022400123", None, np.nan],
+    ["002", "0021", "00ab12345", "1234567a", "abc", "", " 0022400001", "0022400123.0"],
+    [22400123, 22300001, 123],
+    [22400123.0, np.nan],
+    [22400123, "0022400001", None],
+], ids=["strings", "malformed_strings", "integers", "floats", "mixed"])
+def test_extract_season_series_matches_extract_season(game_ids):
+    seasons = extract_season_series(pd.Series(game_ids, dtype=object if None in game_ids else None))
+    np.testing.assert_array_equal(seasons.to_numpy(dtype="float64"), scalar_results(game_ids, extract_season))
+
+
+def test_extract_season_series_is_int64_without_invalid_game_ids():
+    assert extract_season_series(pd.Series(["0022400123", "22300001"])).dtype == "int64"
+
+
+@pytest.mark.parametrize("values", [
+    ["12:30", "05:07", "0:00", "12:30", "", None, np.nan],
+    ["1:02:03", "12.5", "7", "nan", "ab", "1:2:3:4", " 5:00", "-3:00", "99999999999999999999:30"],
+    [12.0, 1.5, np.nan],
+    [12, 0],
+    ["12:30", 12.0, None],
+], ids=["clock", "other_strings", "floats", "integers", "mixed"])
+def test_parse_minutes_series_matches_parse_minutes(values):
+    minutes = parse_minutes_series(pd.Series(values, dtype=object))
+    np.testing.assert_array_equal(minutes.to_numpy(), scalar_results(values, parse_minutes))
+
+
+def test_parse_minutes_series_keeps_the_index():
+    values = pd.Series(["12:30", None], index=[10, 20])
+    pd.testing.assert_series_equal(parse_minutes_series(values), pd.Series([12.5, 0.0], index=[10, 20]))